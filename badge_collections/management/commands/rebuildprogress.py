@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ... import queries
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the collection progress of every App User'
+
+    def handle(self, *args, **options):
+
+        # Recomputing every progress from the redeemed badges
+        with transaction.atomic():
+            progresses = queries.rebuild_collections_progress()
+
+        self.stdout.write(f'Rebuilt {len(progresses)} collection progresses')
@@ -0,0 +1,49 @@
+# Generated by Django 3.1.2 on 2026-10-18 09:49
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def build_collection_progress(apps, schema_editor):
+    CollectionBadge = apps.get_model('badge_collections', 'CollectionBadge')
+    CollectionProgress = apps.get_model('badge_collections', 'CollectionProgress')
+    RedeemedBadge = apps.get_model('badges', 'RedeemedBadge')
+
+    totals = dict(CollectionBadge.objects.values('collection').annotate(total=Count('id'))
+                  .values_list('collection', 'total'))
+    collected = RedeemedBadge.objects.filter(badge__collectionbadge__isnull=False) \
+        .values('app_user', 'badge__collectionbadge__collection').annotate(collected=Count('id')) \
+        .values_list('app_user', 'badge__collectionbadge__collection', 'collected')
+
+    CollectionProgress.objects.bulk_create([
+        CollectionProgress(app_user_id=app_user_id, collection_id=collection_id,
+                           collected=count, total=totals[collection_id])
+        for app_user_id, collection_id, count in collected.iterator()], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('badges', '0007_redeemedbadge_unique_redeemed_badge'),
+        ('badge_collections', '0006_auto_20210106_0920'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CollectionProgress',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('collected', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('app_user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users.appuser')),
+                ('collection', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='badge_collections.collection')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='collectionprogress',
+            constraint=models.UniqueConstraint(fields=('app_user', 'collection'), name='unique_collection_progress'),
+        ),
+        migrations.RunPython(build_collection_progress, migrations.RunPython.noop),
+    ]
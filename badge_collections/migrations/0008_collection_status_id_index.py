@@ -0,0 +1,17 @@
+# Generated by Django 3.1.2 on 2026-10-18 10:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('badge_collections', '0007_collectionprogress'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='collection',
+            index=models.Index(fields=['status', 'id'], name='badge_colle_status_fb41df_idx'),
+        ),
+    ]
@@ -2,9 +2,11 @@ import uuid
 
 import django_filters
 from django.db import models
+from django.db.models import Exists, F, Q
 from django.utils import timezone
 
-from badges.models import Badge, RedeemedBadge
+from badges.models import Badge
+from images.models import Image
 from rewards.models import Reward
 from users.models import PromoterUser, AppUser
 
@@ -19,7 +21,7 @@ class Collection(models.Model):
     uuid = models.UUIDField(unique=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=255)
     description = models.TextField()
-    image = models.TextField(null=True)
+    image = models.ForeignKey(Image, on_delete=models.PROTECT, null=True)
     status = models.CharField(max_length=255, choices=Status.choices, default=Status.PENDING)
     start_date = models.DateTimeField(default=timezone.now)
     end_date = models.DateTimeField(null=True)
@@ -34,6 +36,9 @@ class Collection(models.Model):
             ('check_collection_status', 'Can check completion status of a Collection'),
             ('view_stats', 'Can view statistics for a Collection'),
         )
+        indexes = [
+            models.Index(fields=['status', 'id']),  # Pages of the list
+        ]
 
 
 class CollectionFilter(django_filters.FilterSet):
@@ -57,25 +62,14 @@ class CollectionFilter(django_filters.FilterSet):
 
     def completed_filter(self, queryset, name, value):
 
-        # Getting app user that's redeeming the badge
-        try:
-            apper = AppUser.objects.get(email__exact=value)
-        except AppUser.DoesNotExist:
-            return queryset.none()
+        # Getting collections completed by the app user
+        collections_completed = CollectionProgress.objects.filter(app_user__email__exact=value,
+                                                                  collected=F('total')).values('collection')
+        # Collections without badges are completed by every app user
+        collections_with_badges = CollectionBadge.objects.values('collection')
 
-        collections_completed = []
-        # Getting collection with UUID
-        for collection in Collection.objects.all():
-            badges_in_collection = CollectionBadge.objects.filter(collection=collection).values_list('badge', flat=True)
-            badges_in_collection_collected = RedeemedBadge.objects.\
-                filter(badge__in=badges_in_collection, app_user=apper)
-
-            if badges_in_collection.count() == badges_in_collection_collected.count():
-                collections_completed += [collection.uuid]
-
-        return queryset.filter(**{
-            'uuid__in': collections_completed,
-        })
+        return queryset.filter(Exists(AppUser.objects.filter(email__exact=value)),
+                               Q(id__in=collections_completed) | ~Q(id__in=collections_with_badges))
 
     completed_by = django_filters.CharFilter(method='completed_filter')
     location = django_filters.UUIDFilter(method='localtion_filter')
@@ -94,3 +88,15 @@ class CollectionFilter(django_filters.FilterSet):
 class CollectionBadge(models.Model):
     collection = models.ForeignKey(Collection, on_delete=models.CASCADE)
     badge = models.ForeignKey(Badge, on_delete=models.CASCADE)
+
+
+class CollectionProgress(models.Model):
+    app_user = models.ForeignKey(AppUser, on_delete=models.CASCADE)
+    collection = models.ForeignKey(Collection, on_delete=models.CASCADE)
+    collected = models.PositiveIntegerField(default=0)  # Badges of the collection redeemed by the App User
+    total = models.PositiveIntegerField(default=0)  # Badges in the collection
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['app_user', 'collection'], name='unique_collection_progress'),
+        ]
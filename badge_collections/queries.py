@@ -1,17 +1,20 @@
-import copy
-from datetime import datetime, timedelta
-
-from django.db.models import Q
+from django.db.models import Case, Count, F, IntegerField, Q, Value, When
 
 from badges import queries as badges_queries
 from badges.models import RedeemedBadge, Badge
 from badges.models import Status as BadgeStatus
+from images import queries as images_queries
 from rewards import queries as rewards_queries
 from rewards.models import Reward, RedeemedReward
 from rewards.models import Status as RewardStatus
+from stats import cache as stats_cache
+from stats import engine as stats_engine
+from stats import queries as stats_queries
+from stats.models import BadgeRollup
 from users.models import PromoterUser, AppUser
-from . import utils
-from .models import Collection, CollectionBadge, Status
+from .models import Collection, CollectionBadge, CollectionProgress, Status
+
+PROGRESS_BATCH_SIZE = 1000
 
 
 def create_collection(collection, user_id):
@@ -33,10 +36,8 @@ def create_collection(collection, user_id):
     collection_created.status = collection.get("status")
 
     if collection.get("image"):
-        # Attempting to decode image from base64 to check if image is valid
-        _, _ = utils.decode_image_from_base64(collection.get("image"), str(collection_created.uuid))
-        # Storing base64 string in the DB
-        collection_created.image = collection.get("image")
+        # Storing the image (if valid) in the image store
+        collection_created.image = images_queries.create_image_from_base64(collection.get("image"))
 
     # Checking if every badge provided exists
     badges = []
@@ -60,6 +61,9 @@ def create_collection(collection, user_id):
     for badge in badges:
         CollectionBadge(collection=collection_created, badge=badge).save()
 
+    # Tracking the progress of users that already redeemed some of the badges
+    rebuild_collections_progress([collection_created.id])
+
     return collection_created
 
 
@@ -68,12 +72,22 @@ def get_collections():
 
 
 def get_collection_by_uuid(collection_uuid):
-    return Collection.objects.get(uuid=collection_uuid)
+    return Collection.objects.select_related('promoter', 'reward').get(uuid=collection_uuid)
 
 
-def get_collection_badges_uuids_by_collection_uuid(collection_uuid):
-    collection = get_collection_by_uuid(collection_uuid)
-    return [collection_badge.badge.uuid for collection_badge in CollectionBadge.objects.filter(collection=collection)]
+def get_badges_uuids_by_collections(collections):
+    badges_uuids = {}
+
+    collection_badges = CollectionBadge.objects.filter(collection__in=[collection.id for collection in collections]) \
+        .order_by('id').values_list('collection', 'badge__uuid')
+    for collection_id, badge_uuid in collection_badges:
+        badges_uuids.setdefault(collection_id, []).append(badge_uuid)
+
+    return badges_uuids
+
+
+def get_collection_ids_by_badge(badge):
+    return CollectionBadge.objects.filter(badge=badge).values_list('collection', flat=True)
 
 
 def get_str_by_pk(pk):
@@ -120,10 +134,8 @@ def patch_collection_by_uuid(collection_uuid, collection):
             # Setting field to null
             collection_update.image = None
         else:
-            # Attempting to decode image from base64 to check if image is valid
-            _, _ = utils.decode_image_from_base64(collection.get("image"), str(collection_update.uuid))
-            # Storing base64 string in the DB
-            collection_update.image = collection.get("image")
+            # Storing the image (if valid) in the image store
+            collection_update.image = images_queries.create_image_from_base64(collection.get("image"))
 
     if 'badges' in collection:
         badge_uuids = []
@@ -152,6 +164,10 @@ def patch_collection_by_uuid(collection_uuid, collection):
             except CollectionBadge.DoesNotExist:
                 CollectionBadge(collection=collection_update, badge=badge).save()
 
+        # Recomputing the progress of every user with the new set of badges
+        rebuild_collections_progress([collection_update.id])
+        stats_cache.invalidate('collection', [collection_update.id])
+
     # Checking if the reward field was sent
     if "reward" in collection:
         # Deleting previous entry
@@ -190,19 +206,15 @@ def get_collection_status(collection_uuid, user_id):
     # Getting collection with UUID
     collection = get_collection_by_uuid(collection_uuid)
 
-    # Getting every badge in the collection
-    badges_in_collection = CollectionBadge.objects.filter(collection=collection).values_list('badge', flat=True)
-
-    # Counting the number of badges in  in the collection
-    badges_in_collection_collected = RedeemedBadge.objects.filter(badge__in=badges_in_collection, app_user=apper)
-
     # Get UUID of collected badges
-    collected_badges_uuid = [collected_badge.badge.uuid for collected_badge in badges_in_collection_collected]
+    collected_badges_uuid = list(RedeemedBadge.objects.filter(badge__collectionbadge__collection=collection,
+                                                              app_user=apper).values_list('badge__uuid', flat=True))
 
     # Collection status
-    if len(badges_in_collection):
-        collection_status = len(badges_in_collection_collected) / len(badges_in_collection)
-    else:
+    try:
+        progress = CollectionProgress.objects.get(app_user=apper, collection=collection)
+        collection_status = progress.collected / progress.total if progress.total else 0
+    except CollectionProgress.DoesNotExist:
         collection_status = 0
 
     if collection_status != 1:
@@ -217,243 +229,108 @@ def get_collection_status(collection_uuid, user_id):
     return collected_badges_uuid, collection_status, redeemable_reward
 
 
-def redeem_collections_by_badge(badge, user_id):
-    # Creating reward codes for every collection completed
-    for collection_id in CollectionBadge.objects.filter(badge=badge).values_list('collection', flat=True):
-
-        collection = Collection.objects.get(id=collection_id)
-        _, collection_status, _ = get_collection_status(collection.uuid, user_id)
-
-        if collection_status == 1:
-            rewards_queries.award_reward_to_user(collection.uuid, user_id)
-
-
-def get_collection_stats(collection_uuid):
-    map_stats_chart_1 = {}
-    map_stats_chart_2 = {}
-    map_stats_table = {}
-    young = 'Young'
-    adult = 'Adult'
-    elder = 'Elder'
-    general = 'General'
-    countries = 'Countries'
-    map_stats_chart_1[general] = {}
-    map_stats_chart_1[young] = {}
-    map_stats_chart_1[adult] = {}
-    map_stats_chart_1[elder] = {}
-    map_stats_chart_1[countries] = {}
-    badge_uuids = []
-
-    map_stats_week = copy.deepcopy(map_stats_chart_1)
+def redeem_collections_by_badges(badges, user_id):
+    # Getting app user that's redeeming the badges
+    apper = AppUser.objects.get(user_id=user_id)
 
+    # Creating reward codes for every collection completed
+    for collection_uuid in update_collections_progress(apper, badges):
+        rewards_queries.award_reward_to_user(collection_uuid, user_id)
+
+
+def update_collections_progress(apper, badges):
+    # Counting the newly redeemed badges in every collection
+    badges_redeemed = dict(CollectionBadge.objects.filter(badge__in=badges)
+                           .values('collection').annotate(redeemed=Count('id'))
+                           .values_list('collection', 'redeemed'))
+    if not badges_redeemed:
+        return []
+
+    # Incrementing the progress the user already has in those collections
+    progresses = CollectionProgress.objects.filter(app_user=apper, collection__in=badges_redeemed)
+    collections_started = set(progresses.values_list('collection', flat=True))
+    progresses.update(collected=F('collected') + Case(
+        *[When(collection=collection_id, then=Value(redeemed)) for collection_id, redeemed in badges_redeemed.items()],
+        output_field=IntegerField()))
+
+    # Starting the progress in the remaining collections
+    collections_not_started = [collection_id for collection_id in badges_redeemed
+                               if collection_id not in collections_started]
+    if collections_not_started:
+        totals = dict(CollectionBadge.objects.filter(collection__in=collections_not_started)
+                      .values('collection').annotate(total=Count('id'))
+                      .values_list('collection', 'total'))
+        CollectionProgress.objects.bulk_create([
+            CollectionProgress(app_user=apper, collection_id=collection_id,
+                               collected=badges_redeemed[collection_id], total=totals[collection_id])
+            for collection_id in collections_not_started])
+
+    # Returning the collections that were completed by these badges
+    return list(CollectionProgress.objects.filter(app_user=apper, collection__in=badges_redeemed,
+                                                  collected=F('total')).values_list('collection__uuid', flat=True))
+
+
+def rebuild_collections_progress(collections=None):
+    # Getting the progress to rebuild (every collection if none are provided)
+    progresses = CollectionProgress.objects.all()
+    collection_badges = CollectionBadge.objects.all()
+    if collections is not None:
+        progresses = progresses.filter(collection__in=collections)
+        collection_badges = collection_badges.filter(collection__in=collections)
+
+    # Counting the badges in every collection
+    totals = dict(collection_badges.values('collection').annotate(total=Count('id'))
+                  .values_list('collection', 'total'))
+
+    # Counting the badges of every collection redeemed by every user
+    collected = RedeemedBadge.objects.filter(badge__collectionbadge__in=collection_badges) \
+        .values('app_user', 'badge__collectionbadge__collection').annotate(collected=Count('id')) \
+        .values_list('app_user', 'badge__collectionbadge__collection', 'collected')
+
+    progresses.delete()
+    return CollectionProgress.objects.bulk_create([
+        CollectionProgress(app_user_id=app_user_id, collection_id=collection_id,
+                           collected=count, total=totals[collection_id])
+        for app_user_id, collection_id, count in collected.iterator()], batch_size=PROGRESS_BATCH_SIZE)
+
+
+def get_collection_stats(collection_uuid, stats_range=None):
     collection = get_collection_by_uuid(collection_uuid)
-    collection_name = collection.name
+    stats_range = stats_range or stats_engine.get_stats_range()
 
-    for collection_badge in CollectionBadge.objects.filter(collection__uuid=collection_uuid):
-        badge_uuids.append(collection_badge.badge.uuid)
+    def get_stats():
+        redeemed_rewards = stats_engine.filter_week(RedeemedReward.objects.filter(Q(reward__collection=collection)),
+                                                    'time_awarded', stats_range).count()
 
-    stats_week = get_collection_weekly_report(collection_uuid, badge_uuids, map_stats_week)
-    stats_chart_1 = get_collection_main_chart(badge_uuids, map_stats_chart_1)
-    stats_chart_2 = get_collection_secondary_chart(badge_uuids, map_stats_chart_2)
-    stats_table = get_collection_table_data(badge_uuids, map_stats_table)
+        rollups = BadgeRollup.objects.filter(badge__collectionbadge__collection=collection)
 
-    return [collection_name, stats_week, stats_chart_1, stats_chart_2, stats_table]
+        # The charts and the table all come from the same groups of rollups
+        groups = stats_engine.get_rollup_groups(rollups, stats_range, 'badge__location__name')
 
+        stats = stats_engine.get_stats_by_groups(groups, redeemed_rewards=redeemed_rewards, stats_range=stats_range)
+        stats_table = get_collection_table_data(groups)
 
-def get_collection_weekly_report(collection_uuid, badge_uuids, map_stats):
-    last_week_date = (datetime.now() - timedelta(days=7)).date()
-    last_week_datetime = datetime.combine(last_week_date, datetime.max.time())
+        return [*stats, stats_table]
 
-    redeemed_rewards = 0
+    return [collection.name, *stats_cache.get_stats('collection', collection.id, get_stats, stats_range)]
 
-    weekly_redeemed_rewards = RedeemedReward.objects.filter(Q(reward__collection__uuid=collection_uuid),
-                                                            Q(time_awarded__gt=last_week_datetime)).order_by(
-        'time_awarded')
 
-    for redeemed_reward in weekly_redeemed_rewards:
-        redeemed_rewards += 1
-
-    for badge_uuid in badge_uuids:
-        weekly_redeemed_badges = RedeemedBadge.objects.filter(Q(badge__uuid=badge_uuid),
-                                                              Q(time_redeemed__gt=last_week_datetime)).order_by(
-            'time_redeemed')
-        for redeemed_badge in weekly_redeemed_badges:
-            date = redeemed_badge.time_redeemed
-            user = redeemed_badge.app_user
-            weekday = date.strftime('%A')
-            get_all_stats(user, weekday, map_stats)
-
-    map_stats['Redeemed_rewards'] = redeemed_rewards
-    weekly_stats = get_weekly_stats(map_stats)
-
-    return weekly_stats
-
-
-def get_collection_main_chart(badge_uuids, map_stats):
-    for badge_uuid in badge_uuids:
-        redeemed_badges = RedeemedBadge.objects.filter(Q(badge__uuid=badge_uuid)).order_by('time_redeemed')
-        for redeemed_badge in redeemed_badges:
-            date = redeemed_badge.time_redeemed
-            user = redeemed_badge.app_user
-
-            day = date.strftime('%Y-%m-%d')
-
-            get_all_stats(user, day, map_stats)
-
-    return map_stats
-
-
-def get_collection_table_data(badge_uuids, map_stats):
-    for badge_uuid in badge_uuids:
-        redeemed_badges = RedeemedBadge.objects.filter(Q(badge__uuid=badge_uuid)).order_by('time_redeemed')
-        for redeemed_badge in redeemed_badges:
-            badge = redeemed_badge.badge
-            location = badge.location.name
-            if location not in map_stats:
-                map_stats[location] = 1
-            else:
-                map_stats[location] += 1
-
-    # sorted_locations=sorted(map_stats.items(), key=lambda x: x[1], reverse=True)
-    dict(sorted(map_stats.items(), key=lambda item: item[1]))
-
-    return map_stats
-
-
-def get_collection_secondary_chart(badge_uuids, map_stats):
-    for badge_uuid in badge_uuids:
-        redeemed_badges = RedeemedBadge.objects.filter(Q(badge__uuid=badge_uuid)).order_by('time_redeemed')
-        for redeemed_badge in redeemed_badges:
-            date = redeemed_badge.time_redeemed
-
-            day = date.strftime('%Y-%m-%d')
-            hour = date.strftime('%H')
-
-            map_stats = get_secondary_chart_stats(day, hour, map_stats)
-
-    return map_stats
+def get_collection_redemptions(collection_uuid, stats_range):
+    collection = get_collection_by_uuid(collection_uuid)
 
+    return stats_queries.get_badge_redemptions(
+        RedeemedBadge.objects.filter(badge__collectionbadge__collection=collection), stats_range)
 
-def get_all_stats(user, date, map_stats):
-    young = 'Young'
-    adult = 'Adult'
-    elder = 'Elder'
-    general = 'General'
-    countries = 'Countries'
-    current_date = datetime.now()
 
-    if user.gender:
-        if user.gender not in map_stats:
-            map_stats[user.gender] = {}
-        if date not in map_stats[user.gender]:
-            map_stats[user.gender][date] = 0
-        map_stats[user.gender][date] += 1
+def get_collection_table_data(groups):
+    map_stats = {}
 
-    if user.country:
-        if user.country not in map_stats:
-            map_stats[user.country] = {}
-            map_stats[countries][user.country] = 0
-        if date not in map_stats[user.country]:
-            map_stats[user.country][date] = 0
-        map_stats[user.country][date] += 1
-        map_stats[countries][user.country] += 1
+    for group in groups:
+        location = group['badge__location__name']
+        map_stats[location] = map_stats.get(location, 0) + group['total']
 
-    if date not in map_stats[general]:
-        map_stats[general][date] = 0
-    map_stats[general][date] += 1
-
-    if user.date_birth:
-        datetime_birth = datetime.combine(user.date_birth, datetime.min.time())
-        delta = current_date - datetime_birth
-        delta_years = delta.days / 365.2425
-
-        if delta_years < 18:
-            if date not in map_stats[young]:
-                map_stats[young][date] = 0
-            map_stats[young][date] += 1
-        elif delta_years < 65:
-            if date not in map_stats[adult]:
-                map_stats[adult][date] = 0
-            map_stats[adult][date] += 1
-        else:
-            if date not in map_stats[elder]:
-                map_stats[elder][date] = 0
-            map_stats[elder][date] += 1
-
-
-def get_secondary_chart_stats(date, hour, map_stats):
-    total_hour_visitors = 'Total hour visitors'
-
-    if hour not in map_stats:
-        map_stats[hour] = {}
-    if date not in map_stats[hour]:
-        map_stats[hour][date] = 0
-    if total_hour_visitors not in map_stats[hour]:
-        map_stats[hour][total_hour_visitors] = 0
-    map_stats[hour][date] += 1
-    map_stats[hour][total_hour_visitors] += 1
-
-    return map_stats
-
-
-def get_weekly_stats(map_stats):
-    total_visitors = 0
-    young = 'Young'
-    adult = 'Adult'
-    elder = 'Elder'
-    general = 'General'
-    busiest_day = None
-    countries = 'Countries'
-    other_gender = 'Other'
-    female_gender = 'Female'
-    male_gender = 'Male'
-    most_common_country = None
-    stats = {}
-
-    for weekday in map_stats[general]:
-        stats[weekday] = map_stats[general][weekday]
-        total_visitors += map_stats[general][weekday]
-        if not busiest_day or map_stats[general][weekday] > map_stats[general][busiest_day]:
-            busiest_day = weekday
-
-    for country in map_stats[countries]:
-        if not most_common_country or map_stats[countries][country] > map_stats[countries][most_common_country]:
-            most_common_country = country
-
-    number_female_gender = len(map_stats[female_gender]) if female_gender in map_stats else 0
-    number_male_gender = len(map_stats[male_gender]) if male_gender in map_stats else 0
-    number_other_gender = len(map_stats[other_gender]) if other_gender in map_stats else 0
-
-    if number_male_gender > number_female_gender and number_male_gender > number_other_gender:
-        most_common_gender = male_gender
-    elif number_female_gender > number_male_gender and number_female_gender > number_other_gender:
-        most_common_gender = female_gender
-    elif number_other_gender != 0:
-        most_common_gender = other_gender
-    else:
-        most_common_gender = None
-
-    young_visitors = len(map_stats[young])
-    adult_visitors = len(map_stats[adult])
-    elder_visitors = len(map_stats[elder])
-
-    if young_visitors > adult_visitors and young_visitors > elder_visitors:
-        most_common_age_range = young
-    elif adult_visitors > young_visitors and adult_visitors > elder_visitors:
-        most_common_age_range = adult
-    elif elder_visitors != 0:
-        most_common_age_range = elder
-    else:
-        most_common_age_range = None
-
-    stats['Total_visitors'] = total_visitors
-    stats['Busiest_day'] = busiest_day
-    stats['Most_common_age_range'] = most_common_age_range
-    stats['Most_common_country'] = most_common_country
-    stats['Most_common_gender'] = most_common_gender
-    stats['Redeemed_rewards'] = map_stats['Redeemed_rewards']
-
-    return stats
+    # Locations with the most redemptions first
+    return dict(sorted(map_stats.items(), key=lambda location_total: location_total[1], reverse=True))
 
 
 class NotEveryBadgeExists(Exception):
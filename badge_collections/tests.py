@@ -3,8 +3,13 @@ from datetime import datetime, timedelta
 
 from django.test import Client, TestCase
 
+from badges.models import Badge
 from badges.tests import BadgeTestCase
+from locations.tests import create_locations
+from rewards.models import Reward
 from users.tests import UsersTestCase
+from . import utils
+from .models import Collection, CollectionBadge
 
 
 class CollectionTestCase(TestCase):
@@ -151,3 +156,29 @@ class CollectionTestCase(TestCase):
 
         # Logging out
         users.log_out()
+
+    def test_collection_encode(self):
+        """
+        Test: Encode a page of collections with a constant number of queries
+        """
+        _, promoter, [location] = create_locations()
+        reward = Reward.objects.create(name="Reward", description="Reward", location=location, promoter=promoter)
+        badges = [Badge.objects.create(name=f"Badge {i}", description="Badge", location=location,
+                                       promoter=promoter) for i in range(3)]
+
+        for i in range(10):
+            collection = Collection.objects.create(name=f"Collection {i}", description="Collection",
+                                                   promoter=promoter, reward=reward if i % 2 else None)
+            for badge in badges[:i % 3 + 1]:
+                CollectionBadge.objects.create(collection=collection, badge=badge)
+
+        # One query for the collections (with their promoter and reward) and another for their badges
+        with self.assertNumQueries(2):
+            data = utils.encode_collection_to_json(Collection.objects.select_related('promoter', 'reward')
+                                                   .order_by('id'))
+
+        self.assertEqual(len(data), 10)
+        self.assertEqual(data[0]['promoter'], "promoter@test.com")
+        self.assertEqual(data[0]['reward'], None)
+        self.assertEqual(data[1]['reward'], str(reward.uuid))
+        self.assertEqual(data[2]['badges'], [badge.uuid for badge in badges])
@@ -1,64 +1,43 @@
 import json
-from base64 import b64decode
 from datetime import datetime
-from mimetypes import guess_extension
 
-from django.core import serializers
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-
-from rewards import queries as reward_queries
+from lists import utils as lists_utils
 from rewards import utils as reward_utils
-from users import queries as user_queries
 from . import queries
 from .models import Status
 
 
-def decode_image_from_base64(base64_image, filename):
-    try:
-        # Accepted format: data:<mime_type>;base64,<encoding>
-        img_format, img_str = base64_image.split(';base64,')
-        _, mime_type = img_format.split(':')
-
-        # If MIME type is not image
-        if mime_type.split("/")[0] != "image":
-            raise NotAValidImage()
-
-        # Decoding image from base64
-        decoded_img = b64decode(img_str)
-        # Getting extension from MIME type
-        file_extension = guess_extension(mime_type)
-        # Storing image
-        return decoded_img, f'{filename}.{file_extension}'
-    except Exception as e:
-        raise NotAValidImage(e)
-
+# The fields of a collection in its JSON, with the columns that each of them reads
+FIELDS = {
+    'uuid': ['uuid'],
+    'name': ['name'],
+    'description': ['description'],
+    'image': ['image'],
+    'status': ['status'],
+    'start_date': ['start_date'],
+    'end_date': ['end_date'],
+    'promoter': ['promoter__email'],
+    'reward': ['reward__uuid'],
+    'badges': [],
+}
+# The fields that are related rows, identified by their string
+RELATED_FIELDS = ['promoter', 'reward']
 
-def encode_collection_to_json(collections):
-    serialized_collections = json.loads(serializers.serialize("json",
-                                                              collections,
-                                                              fields=[
-                                                                  'uuid', 'name',
-                                                                  'description',
-                                                                  'start_date', 'end_date',
-                                                                  'promoter', 'reward', 'status', 'image', ]))
 
-    image_serialized_collections = []
-    for serialized in serialized_collections:
+def encode_collection_to_json(collections, fields=tuple(FIELDS)):
+    # Getting the badges of every collection at once (if requested)
+    badges_uuids = queries.get_badges_uuids_by_collections(collections) if 'badges' in fields else {}
 
-        collection_fields = serialized["fields"]
+    # Building the dicts straight from the collections (select their promoter and reward, or each costs a query)
+    return [{field: encode_collection_field(collection, field, badges_uuids) for field in fields}
+            for collection in collections]
 
-        if collection_fields.get('promoter'):
-            collection_fields['promoter'] = user_queries.get_str_by_promoter_pk(collection_fields.get('promoter'))
 
-        if collection_fields.get('reward'):
-            collection_fields['reward'] = reward_queries.get_str_by_pk(collection_fields.get('reward'))
+def encode_collection_field(collection, field, badges_uuids):
+    if field == 'badges':
+        return badges_uuids.get(collection.id, [])
 
-        collection_fields['badges'] = \
-            queries.get_collection_badges_uuids_by_collection_uuid(collection_fields.get('uuid'))
-
-        image_serialized_collections.append(collection_fields)
-
-    return image_serialized_collections
+    return lists_utils.encode_field(collection, field, RELATED_FIELDS)
 
 
 def decode_collection_from_json(data, admin):
@@ -105,19 +84,11 @@ def encode_collection_status(collected_badges, collection_status, reward):
             'collected_badges': collected_badges
         }
 
-    serialized_reward = json.loads(serializers.serialize("json",
-                                                         [reward],
-                                                         fields=[
-                                                             'reward_code', 'time_awarded',
-                                                             'reward']))[0]
-
-    reward_fields = serialized_reward['fields']
-    if reward_fields.get('collection'):
-        reward_fields['collection'] = reward_queries.get_str_by_pk(reward_fields.get('collection'))
-
-    if reward_fields.get('reward'):
-        reward = reward_queries.get_reward_by_pk(reward_fields.get("reward"))
-        reward_fields['reward'] = reward_utils.encode_rewards_to_json([reward])[0]
+    # Selected along with the reward (see rewards.queries.get_redeemable_award_by_collection_user)
+    reward_fields = {
+        'time_awarded': reward.time_awarded,
+        'reward': reward_utils.encode_rewards_to_json([reward.reward])[0],
+    }
 
     reward_fields['collection_status'] = collection_status
     reward_fields['collected_badges'] = collected_badges
@@ -125,22 +96,6 @@ def encode_collection_status(collected_badges, collection_status, reward):
     return reward_fields
 
 
-def paginator(request, f):
-    page_size = request.GET.get('page_size')
-    f = f.order_by('status')
-    pager = Paginator(f, page_size) if page_size else Paginator(f, 50)
-
-    page = request.GET.get('page')
-    try:
-        response = pager.page(page)
-    except PageNotAnInteger:
-        response = pager.page(1)
-    except EmptyPage:
-        response = pager.page(pager.num_pages)
-
-    return response
-
-
 class NotAValidStartDate(Exception):
     pass
 
@@ -151,7 +106,3 @@ class NotAValidEndDate(Exception):
 
 class InvalidJSONData(Exception):
     pass
-
-
-class NotAValidImage(Exception):
-    pass
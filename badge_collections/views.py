@@ -2,9 +2,14 @@ from django.contrib.auth import authenticate
 from django.http import JsonResponse, HttpResponse, HttpResponseNotAllowed
 
 from firebase.auth import InvalidIdToken, NoTokenProvided, FirebaseUserDoesNotExist
+from images import utils as images_utils
+from lists import utils as lists_utils
+from lists import views as lists_views
+from stats import queries as stats_queries
+from stats import utils as stats_utils
+from stats import views as stats_views
 from . import utils, queries
 from .models import Collection, CollectionFilter
-from .utils import paginator
 
 # Views
 
@@ -110,7 +115,7 @@ def handle_create_collection(request, user):
             return HttpResponse(status=400, reason="Bad Request: A valid Location UUID must be provided")
         except queries.NotAValidReward:
             return HttpResponse(status=400, reason="Bad Request: Invalid Reward UUID provided.")
-        except utils.NotAValidImage:
+        except images_utils.NotAValidImage:
             return HttpResponse(status=400, reason="Bad Request: Invalid image provided")
         except queries.EndDateNotAfterStartDate:
             return HttpResponse(status=400, reason="Bad Request: Ending date must be later than Starting date")
@@ -131,11 +136,17 @@ def handle_get_collections(request, user):
     # Checking permissions (possibly needs the permission to see if the collection is related to this user)
     if user.has_perm('badge_collections.view_collection'):
 
-        f = CollectionFilter(request.GET, queryset=Collection.objects.all()).qs
+        try:
+            fields = lists_utils.decode_fields_from_query(request.GET, utils.FIELDS)
+        except lists_utils.InvalidFields:
+            return HttpResponse(status=400, reason="Bad Request: Unknown field provided")
 
-        response = paginator(request, f)
+        collections = lists_utils.select_fields(Collection.objects.all(), fields, utils.FIELDS, utils.RELATED_FIELDS,
+                                                'status')
+        f = CollectionFilter(request.GET, queryset=collections).qs
 
-        return JsonResponse(utils.encode_collection_to_json(response), safe=False)
+        return lists_views.get_list_response(request, f, 'status',
+                                             lambda response: utils.encode_collection_to_json(response, fields))
 
     else:
         return HttpResponse(status=403,
@@ -189,7 +200,7 @@ def handle_patch_collection(request, uuid, user):
     try:
         updated_collection = queries.patch_collection_by_uuid(uuid, unserialized_patch_collection)
 
-    except utils.NotAValidImage:
+    except images_utils.NotAValidImage:
         return HttpResponse(status=400, reason="Bad Request: Invalid image provided")
     except queries.NotAValidLocation:
         return HttpResponse(status=400, reason="Bad Request: A valid Location UUID must be provided")
@@ -261,7 +272,7 @@ def stats_collection(request, uuid):
         user = authenticate(request)
         if not user:
             raise NoTokenProvided()
-    except (InvalidIdToken, NoTokenProvided):
+    except (InvalidIdToken, NoTokenProvided, FirebaseUserDoesNotExist):
         return HttpResponse(status=401,
                             reason="Unauthorized: Operation needs authentication")
 
@@ -274,6 +285,25 @@ def stats_collection(request, uuid):
         return HttpResponseNotAllowed(['GET'])
 
 
+def export_collection(request, uuid):
+    # Authenticating user
+    try:
+        user = authenticate(request)
+        if not user:
+            raise NoTokenProvided()
+    except (InvalidIdToken, NoTokenProvided, FirebaseUserDoesNotExist):
+        return HttpResponse(status=401,
+                            reason="Unauthorized: Operation needs authentication")
+
+    if request.method == 'GET':
+
+        return handle_export_collection(request, uuid, user)
+
+    else:
+
+        return HttpResponseNotAllowed(['GET'])
+
+
 def handle_get_stats_collection(request, uuid, user):
     try:
         collection = queries.get_collection_by_uuid(uuid)
@@ -286,10 +316,33 @@ def handle_get_stats_collection(request, uuid, user):
                             reason="Forbidden: Current user does not have the permission"
                                    " required to view statistics about this collection")
 
+    # Decoding the date range and granularity requested
+    try:
+        stats_range = stats_utils.decode_stats_range_from_query(request.GET)
+    except stats_utils.InvalidStatsRange as e:
+        return HttpResponse(status=400, reason=f"Bad Request: {e}")
+
     # Executing the query
-    statistics = queries.get_collection_stats(uuid)
+    statistics = queries.get_collection_stats(uuid, stats_range)
 
     # Serializing
     # serialized_statistics = utils.encode_statistics_to_json(statistics)
 
     return JsonResponse(statistics, safe=False)
+
+
+def handle_export_collection(request, uuid, user):
+    try:
+        collection = queries.get_collection_by_uuid(uuid)
+    except Collection.DoesNotExist:
+        return HttpResponse(status=404, reason="Not Found: No Collection by that UUID")
+
+    # Checking if it's admin or the promoter that created the collection
+    if not user.has_perm('badges_collections.view_stats') and collection.promoter.user != user:
+        return HttpResponse(status=403,
+                            reason="Forbidden: Current user does not have the permission"
+                                   " required to export the redemptions of this collection")
+
+    return stats_views.get_export_response(
+        request, lambda stats_range: queries.get_collection_redemptions(uuid, stats_range),
+        stats_queries.BADGE_EXPORT_FIELDS, f'collection-{uuid}')
@@ -0,0 +1,32 @@
+# Generated by Django 3.1.2 on 2026-10-18 09:48
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def delete_duplicate_redeemed_badges(apps, schema_editor):
+    RedeemedBadge = apps.get_model('badges', 'RedeemedBadge')
+
+    # Keeping only the first redemption of every badge by every user
+    duplicates = RedeemedBadge.objects.values('app_user', 'badge') \
+        .annotate(first_id=Min('id'), redemptions=Count('id')) \
+        .filter(redemptions__gt=1)
+
+    for duplicate in duplicates:
+        RedeemedBadge.objects.filter(app_user=duplicate['app_user'], badge=duplicate['badge']) \
+            .exclude(id=duplicate['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('badges', '0006_auto_20210106_0920'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_redeemed_badges, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='redeemedbadge',
+            constraint=models.UniqueConstraint(fields=('app_user', 'badge'), name='unique_redeemed_badge'),
+        ),
+    ]
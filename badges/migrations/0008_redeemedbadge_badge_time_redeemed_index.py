@@ -0,0 +1,17 @@
+# Generated by Django 3.1.2 on 2026-10-18 09:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('badges', '0007_redeemedbadge_unique_redeemed_badge'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='redeemedbadge',
+            index=models.Index(fields=['badge', 'time_redeemed'], name='badges_rede_badge_i_b172ef_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.1.2 on 2026-10-18 10:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('badges', '0008_redeemedbadge_badge_time_redeemed_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='badge',
+            index=models.Index(fields=['status', 'id'], name='badges_badg_status_fdea27_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+from images import migration_helpers
+
+
+def move_images_to_store(apps, schema_editor):
+    migration_helpers.move_images_to_store(apps.get_model('badges', 'Badge'), apps.get_model('images', 'Image'))
+
+
+def move_images_from_store(apps, schema_editor):
+    migration_helpers.move_images_from_store(apps.get_model('badges', 'Badge'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0001_initial'),
+        ('badges', '0009_badge_status_id_index'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='badge',
+            old_name='image',
+            new_name='base64_image',
+        ),
+        migrations.AddField(
+            model_name='badge',
+            name='image',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='images.image'),
+        ),
+        migrations.RunPython(move_images_to_store, move_images_from_store),
+        migrations.RemoveField(
+            model_name='badge',
+            name='base64_image',
+        ),
+    ]
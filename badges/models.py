@@ -4,6 +4,7 @@ from django.db import models
 from django.utils import timezone
 
 import django_filters
+from images.models import Image
 from locations.models import Location
 from users.models import AppUser, PromoterUser
 
@@ -18,7 +19,7 @@ class Badge(models.Model):
     uuid = models.UUIDField(unique=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=255)
     description = models.TextField()
-    image = models.TextField(null=True)
+    image = models.ForeignKey(Image, on_delete=models.PROTECT, null=True)
     status = models.CharField(max_length=255, choices=Status.choices, default=Status.PENDING)
     start_date = models.DateTimeField(default=timezone.now)
     end_date = models.DateTimeField(null=True)
@@ -33,6 +34,9 @@ class Badge(models.Model):
             ('redeem_badge', 'Can redeem Badge'),
             ('view_stats', 'Can view statistics for a Badge'),
         )
+        indexes = [
+            models.Index(fields=['status', 'id']),  # Pages of the list
+        ]
 
 
 class RedeemedBadge(models.Model):
@@ -40,6 +44,14 @@ class RedeemedBadge(models.Model):
     time_redeemed = models.DateTimeField(auto_now_add=True)
     badge = models.ForeignKey(Badge, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['app_user', 'badge'], name='unique_redeemed_badge'),
+        ]
+        indexes = [
+            models.Index(fields=['badge', 'time_redeemed']),
+        ]
+
 
 class BadgeFilter(django_filters.FilterSet):
 
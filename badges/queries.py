@@ -1,14 +1,19 @@
-import copy
-from datetime import datetime, timedelta
+from datetime import datetime
 
+from django.db import transaction
 from django.db.models import Q
 
 from badge_collections import queries as badge_collections_queries
+from images import queries as images_queries
 from locations import queries as location_queries
+from stats import cache as stats_cache
+from stats import engine as stats_engine
+from stats import queries as stats_queries
+from stats.models import BadgeRollup, BadgeSketch
+from tags import queries as tags_queries
 from locations.models import Location
 from locations.models import Status as LocationStatus
 from users.models import PromoterUser, AppUser
-from . import utils
 from .models import Badge, RedeemedBadge
 from .models import Status
 
@@ -30,10 +35,8 @@ def create_badge(badge, user_id):
             raise EndDateNotAfterStartDate()
 
     if badge.get("image"):
-        # Attempting to decode image from base64 to check if image is valid
-        _, _ = utils.decode_image_from_base64(badge.get("image"), str(badge_created.uuid))
-        # Storing base64 string in the DB
-        badge_created.image = badge.get("image")
+        # Storing the image (if valid) in the image store
+        badge_created.image = images_queries.create_image_from_base64(badge.get("image"))
 
     try:
         badge_created.location = Location.objects.get(uuid=badge.get('location'))
@@ -54,36 +57,49 @@ def get_badges():
 
 def redeem_badges_by_location(location_id, user_id):
     location = location_queries.get_location_by_id(location_id)
-    # Getting app user that's redeeming the badge
-    apper = AppUser.objects.get(user_id=user_id)
-    # Getting all badges that are associated with a location and are "up"
-    redeemable_badges = Badge.objects.filter(Q(location=location),
-                                             Q(start_date__lte=datetime.now()),
-                                             Q(status=Status.APPROVED),
-                                             Q(end_date__isnull=True) | Q(end_date__gte=datetime.now())).exclude(
-        Q(id__in=RedeemedBadge.objects.filter(app_user=apper)
-          .values_list('badge', flat=True)))
-
-    badges_redeemed = []
-    # Linking the App User with the Badges
-    for redeemable_badge in redeemable_badges:
-        try:  # Checking if the user has already redeemed this badge (and if so do nothing)
-            RedeemedBadge.objects.get(app_user=apper, badge=redeemable_badge)
-        except RedeemedBadge.DoesNotExist:
-            # Redeeming Badge
-            redeemed_badge = RedeemedBadge(app_user=apper, badge=redeemable_badge)
-            redeemed_badge.save()
-            badges_redeemed.append(redeemed_badge.badge)
-
-    # Checking for collection completion
-    for badge in badges_redeemed:
-        badge_collections_queries.redeem_collections_by_badge(badge, user_id)
+
+    with transaction.atomic():
+        # Getting app user that's redeeming the badge (locked so that their redemptions are counted once)
+        apper = AppUser.objects.select_for_update().get(user_id=user_id)
+        # Getting all badges that are associated with a location and are "up"
+        redeemable_badges = list(Badge.objects.select_related('location', 'promoter')
+                                 .filter(Q(location=location),
+                                         Q(start_date__lte=datetime.now()),
+                                         Q(status=Status.APPROVED),
+                                         Q(end_date__isnull=True) | Q(end_date__gte=datetime.now()))
+                                 .exclude(Q(id__in=RedeemedBadge.objects.filter(app_user=apper)
+                                            .values_list('badge', flat=True))))
+
+        # Linking the App User with the Badges
+        redeemed_badges = RedeemedBadge.objects.bulk_create([RedeemedBadge(app_user=apper, badge=redeemable_badge)
+                                                             for redeemable_badge in redeemable_badges],
+                                                            ignore_conflicts=True)
+
+        # Counting the redemptions in the statistics
+        stats_queries.record_badge_redemptions(redeemed_badges)
+
+        # Checking for collection completion (once for every collection of the redeemed badges)
+        if redeemable_badges:
+            badge_collections_queries.redeem_collections_by_badges(redeemable_badges, user_id)
 
     return redeemable_badges
 
 
+def redeem_badges_by_scans(scans, user_id):
+    with transaction.atomic():
+        # Redeeming every tag scanned
+        results = tags_queries.redeem_tags(scans)
+
+        # Redeeming the badges of every location scanned (once per location)
+        badges_redeemed = []
+        for location_id in dict.fromkeys(result for result in results if result and not isinstance(result, Exception)):
+            badges_redeemed += redeem_badges_by_location(location_id, user_id)
+
+    return results, badges_redeemed
+
+
 def get_badge_by_uuid(badge_uuid):
-    return Badge.objects.get(uuid=badge_uuid)
+    return Badge.objects.select_related('location', 'promoter').get(uuid=badge_uuid)
 
 
 def get_str_by_pk(pk):
@@ -92,11 +108,18 @@ def get_str_by_pk(pk):
 
 def delete_badge_by_uuid(badge_uuid):
     badge = get_badge_by_uuid(badge_uuid)
+    # Getting the collections that will lose the badge
+    collections = list(badge_collections_queries.get_collection_ids_by_badge(badge))
     # Trying to delete badge
     try:
         badge.delete()
     except Exception:
         return False  # Couldn't delete
+    # Recomputing the progress of every user in those collections
+    badge_collections_queries.rebuild_collections_progress(collections)
+    # Invalidating the statistics that counted the badge
+    stats_cache.invalidate('location', [badge.location_id])
+    stats_cache.invalidate('collection', collections)
     return True
 
 
@@ -129,6 +152,8 @@ def patch_badge_by_uuid(badge_uuid, badge):
             location = Location.objects.get(uuid=badge.get('location'))
             if badge_update.status == Status.APPROVED and location.status != LocationStatus.APPROVED:
                 raise LocationMustBeApproved()
+            # Statistics of both locations change with the badge
+            stats_cache.invalidate('location', [badge_update.location_id, location.id])
             badge_update.location = location
         except Location.DoesNotExist:
             raise NotAValidLocation()
@@ -145,212 +170,34 @@ def patch_badge_by_uuid(badge_uuid, badge):
             # Setting field to null
             badge_update.image = None
         else:
-            # Attempting to decode image from base64 to check if image is valid
-            _, _ = utils.decode_image_from_base64(badge.get("image"), str(badge_update.uuid))
-            # Storing base64 string in the DB
-            badge_update.image = badge.get("image")
+            # Storing the image (if valid) in the image store
+            badge_update.image = images_queries.create_image_from_base64(badge.get("image"))
 
     badge_update.save()
 
     return badge_update
 
 
-def get_badge_stats(badge_uuid):
-    map_stats_chart_1 = {}
-    map_stats_chart_2 = {}
-    young = 'Young'
-    adult = 'Adult'
-    elder = 'Elder'
-    general = 'General'
-    countries = 'Countries'
-    map_stats_chart_1[general] = {}
-    map_stats_chart_1[young] = {}
-    map_stats_chart_1[adult] = {}
-    map_stats_chart_1[elder] = {}
-    map_stats_chart_1[countries] = {}
-
+def get_badge_stats(badge_uuid, stats_range=None):
     badge = get_badge_by_uuid(badge_uuid)
-    badge_name = badge.name
-
-    map_stats_week = copy.deepcopy(map_stats_chart_1)
-
-    stats_week = get_badge_weekly_report(badge_uuid, map_stats_week)
-    stats_chart_1 = get_badge_main_chart(badge_uuid, map_stats_chart_1)
-    stats_chart_2 = get_badge_secondary_chart(badge_uuid, map_stats_chart_2)
-
-    return [badge_name, stats_week, stats_chart_1, stats_chart_2]
-
-
-def get_badge_weekly_report(badge_uuid, map_stats):
-    last_week_date = (datetime.now() - timedelta(days=7)).date()
-    last_week_datetime = datetime.combine(last_week_date, datetime.max.time())
-
-    weekly_redeemed_badges = RedeemedBadge.objects.filter(Q(badge__uuid=badge_uuid),
-                                                          Q(time_redeemed__gt=last_week_datetime)).order_by(
-        'time_redeemed')
-
-    for redeemed_badge in weekly_redeemed_badges:
-        date = redeemed_badge.time_redeemed
-        user = redeemed_badge.app_user
-
-        weekday = date.strftime('%A')
-
-        get_all_stats(user, weekday, map_stats)
-
-    weekly_stats = get_weekly_stats(map_stats)
+    stats_range = stats_range or stats_engine.get_stats_range()
 
-    return weekly_stats
+    def get_stats():
+        rollups = BadgeRollup.objects.filter(badge=badge)
 
+        stats = stats_engine.get_stats(rollups, stats_range=stats_range)
+        unique_visitors = stats_engine.get_unique_visitors(BadgeSketch.objects.filter(badge=badge), stats_range)
+        heatmap = stats_engine.get_heatmap(rollups, stats_range)
 
-def get_badge_main_chart(badge_uuid, map_stats):
-    redeemed_badges = RedeemedBadge.objects.filter(Q(badge__uuid=badge_uuid)).order_by('time_redeemed')
+        return [*stats, unique_visitors, heatmap]
 
-    for redeemed_badge in redeemed_badges:
-        date = redeemed_badge.time_redeemed
-        user = redeemed_badge.app_user
+    return [badge.name, *stats_cache.get_stats('badge', badge.id, get_stats, stats_range)]
 
-        day = date.strftime('%Y-%m-%d')
 
-        get_all_stats(user, day, map_stats)
-
-    return map_stats
-
-
-def get_badge_secondary_chart(badge_uuid, map_stats):
-    redeemed_badges = RedeemedBadge.objects.filter(Q(badge__uuid=badge_uuid)).order_by('time_redeemed')
-
-    for redeemed_badge in redeemed_badges:
-        date = redeemed_badge.time_redeemed
-
-        day = date.strftime('%Y-%m-%d')
-        hour = date.strftime('%H')
-
-        map_stats = get_secondary_chart_stats(day, hour, map_stats)
-
-    return map_stats
-
-
-def get_all_stats(user, date, map_stats):
-    young = 'Young'
-    adult = 'Adult'
-    elder = 'Elder'
-    general = 'General'
-    countries = 'Countries'
-    current_date = datetime.now()
-
-    if user.gender:
-        if user.gender not in map_stats:
-            map_stats[user.gender] = {}
-        if date not in map_stats[user.gender]:
-            map_stats[user.gender][date] = 0
-        map_stats[user.gender][date] += 1
-
-    if user.country:
-        if user.country not in map_stats:
-            map_stats[user.country] = {}
-            map_stats[countries][user.country] = 0
-        if date not in map_stats[user.country]:
-            map_stats[user.country][date] = 0
-        map_stats[user.country][date] += 1
-        map_stats[countries][user.country] += 1
-
-    if date not in map_stats[general]:
-        map_stats[general][date] = 0
-    map_stats[general][date] += 1
-
-    if user.date_birth:
-        datetime_birth = datetime.combine(user.date_birth, datetime.min.time())
-        delta = current_date - datetime_birth
-        delta_years = delta.days / 365.2425
+def get_badge_redemptions(badge_uuid, stats_range):
+    badge = get_badge_by_uuid(badge_uuid)
 
-        if delta_years < 18:
-            if date not in map_stats[young]:
-                map_stats[young][date] = 0
-            map_stats[young][date] += 1
-        elif delta_years < 65:
-            if date not in map_stats[adult]:
-                map_stats[adult][date] = 0
-            map_stats[adult][date] += 1
-        else:
-            if date not in map_stats[elder]:
-                map_stats[elder][date] = 0
-            map_stats[elder][date] += 1
-
-
-def get_secondary_chart_stats(date, hour, map_stats):
-    total_hour_visitors = 'Total hour visitors'
-
-    if hour not in map_stats:
-        map_stats[hour] = {}
-    if date not in map_stats[hour]:
-        map_stats[hour][date] = 0
-    if total_hour_visitors not in map_stats[hour]:
-        map_stats[hour][total_hour_visitors] = 0
-    map_stats[hour][date] += 1
-    map_stats[hour][total_hour_visitors] += 1
-
-    return map_stats
-
-
-def get_weekly_stats(map_stats):
-    total_visitors = 0
-    redeemed_rewards = 0
-    young = 'Young'
-    adult = 'Adult'
-    elder = 'Elder'
-    general = 'General'
-    busiest_day = None
-    countries = 'Countries'
-    other_gender = 'Other'
-    female_gender = 'Female'
-    male_gender = 'Male'
-    most_common_country = None
-    stats = {}
-
-    for weekday in map_stats[general]:
-        stats[weekday] = map_stats[general][weekday]
-        total_visitors += map_stats[general][weekday]
-        if not busiest_day or map_stats[general][weekday] > map_stats[general][busiest_day]:
-            busiest_day = weekday
-
-    for country in map_stats[countries]:
-        if not most_common_country or map_stats[countries][country] > map_stats[countries][most_common_country]:
-            most_common_country = country
-
-    number_female_gender = len(map_stats[female_gender]) if female_gender in map_stats else 0
-    number_male_gender = len(map_stats[male_gender]) if male_gender in map_stats else 0
-    number_other_gender = len(map_stats[other_gender]) if other_gender in map_stats else 0
-
-    if number_male_gender > number_female_gender and number_male_gender > number_other_gender:
-        most_common_gender = male_gender
-    elif number_female_gender > number_male_gender and number_female_gender > number_other_gender:
-        most_common_gender = female_gender
-    elif number_other_gender != 0:
-        most_common_gender = other_gender
-    else:
-        most_common_gender = None
-
-    young_visitors = len(map_stats[young])
-    adult_visitors = len(map_stats[adult])
-    elder_visitors = len(map_stats[elder])
-
-    if young_visitors > adult_visitors and young_visitors > elder_visitors:
-        most_common_age_range = young
-    elif adult_visitors > young_visitors and adult_visitors > elder_visitors:
-        most_common_age_range = adult
-    elif elder_visitors != 0:
-        most_common_age_range = elder
-    else:
-        most_common_age_range = None
-
-    stats['Total_visitors'] = total_visitors
-    stats['Busiest_day'] = busiest_day
-    stats['Most_common_age_range'] = most_common_age_range
-    stats['Most_common_country'] = most_common_country
-    stats['Most_common_gender'] = most_common_gender
-    stats['Redeemed_rewards'] = redeemed_rewards
-
-    return stats
+    return stats_queries.get_badge_redemptions(RedeemedBadge.objects.filter(badge=badge), stats_range)
 
 
 class NotAValidLocation(Exception):
@@ -2,12 +2,14 @@ import binascii
 import json
 from datetime import datetime, timedelta
 
-from django.test import Client, TestCase
+from django.test import Client, RequestFactory, TestCase
 
-from locations.tests import LocationTestCase
+from lists import utils as lists_utils
+from locations.tests import LocationTestCase, create_locations
 from tags import crypto
 from tags.tests import TagTestCase
 from users.tests import UsersTestCase
+from .models import Badge, Status
 
 
 class BadgeTestCase(TestCase):
@@ -220,6 +222,66 @@ class BadgeTestCase(TestCase):
         # Logging out
         users.log_out()
 
+    def test_badge_redeem_batch(self):
+        """
+        Test: Reedeem badges with a batch of offline scans
+        Path: /v0/badges/redeem/batch
+        """
+        locations = LocationTestCase()
+        location_uuid = locations.get_location()
+
+        tags = TagTestCase()
+        tag_uid = tags.get_tag(location_uuid)
+
+        users = UsersTestCase()
+        client = Client(HTTP_AUTHORIZATION=users.log_in(type='mobile',
+                                                        email="apper@test.com",
+                                                        password="test_password"))
+
+        promoter_client = Client(HTTP_AUTHORIZATION=users.log_in(type='promoters',
+                                                                 email="promoter@test.com",
+                                                                 password="test_password"))
+
+        badge_uuid = json.loads(self.__create_badge__(promoter_client, location_uuid).content)["uuid"]
+
+        admin_client = Client(HTTP_AUTHORIZATION=users.log_in_admin(email="admin@test.com",
+                                                                    password="test_password"))
+
+        # Approving Badge (and location) as an Admin
+        admin_client.patch(f'/v0/locations/{location_uuid}', {'status': "APPROVED"}, content_type="application/json")
+        admin_client.patch(f'/v0/badges/{badge_uuid}', {'status': "APPROVED"}, content_type="application/json")
+
+        def scan(counter, cmac=None):
+            return {
+                'uid': tag_uid,
+                'cmac': cmac or binascii.hexlify(
+                    crypto.calculate_cmac(tag_uid, "0b94831c5ecce72367dc70706a9bdec3", counter)).decode("utf-8"),
+                'counter': counter
+            }
+
+        # Sending a batch with out-of-order, replayed and forged scans
+        response = client.post('/v0/badges/redeem/batch', [
+            scan("0x000002"),
+            scan("0x000001"),
+            scan("0x000001"),
+            scan("0x000003", cmac="00" * 8),
+        ], content_type="application/json")
+
+        # Asserting that each scan gets its own status and the badge is redeemed once
+        self.assertEqual(response.status_code, 200)
+        content = json.loads(response.content)
+        self.assertEqual([result['status'] for result in content['scans']], [200, 200, 410, 406])
+        self.assertEqual([badge['uuid'] for badge in content['badges']], [badge_uuid])
+
+        # Sending a malformed batch
+        response = client.post('/v0/badges/redeem/batch', {'uid': tag_uid}, content_type="application/json")
+
+        # Asserting that the request fails
+        self.assertEqual(response.status_code, 400)
+
+        # Logging out
+        users.log_out()
+
     def test_badge_statistics(self):
         """
         Test: Get a statistics with badge UUID
@@ -243,3 +305,40 @@ class BadgeTestCase(TestCase):
 
         # Logging out
         users.log_out()
+
+    def test_badge_pagination(self):
+        """
+        Test: Walk every badge through the cursors of the pages
+        """
+        _, promoter, [location] = create_locations()
+        statuses = [Status.PENDING, Status.APPROVED, Status.REJECTED]
+        badges = [Badge.objects.create(name=f"Badge {i}", description="Badge", location=location, promoter=promoter,
+                                       status=statuses[i % 3]) for i in range(7)]
+
+        factory = RequestFactory()
+        path = '/v0/badges/?page_size=3'
+        pages = []
+        while path:
+            response, headers = lists_utils.paginator(factory.get(path), Badge.objects.all(), 'status')
+            self.assertEqual(headers['X-Total-Count'], 7)
+
+            pages.append([badge.id for badge in response])
+            path = headers.get('Link', '')[1:].split('>')[0].replace('http://testserver', '')
+
+        # Asserting that every badge is in exactly one page, ordered by status
+        expected = [badge.id for badge in sorted(badges, key=lambda badge: (badge.status, badge.id))]
+        self.assertEqual(pages, [expected[:3], expected[3:6], expected[6:]])
+
+        # Asserting that the count can be skipped and that the numbered pages agree with the cursors
+        _, headers = lists_utils.paginator(factory.get('/v0/badges/?include_total=false'), Badge.objects.all(),
+                                           'status')
+        self.assertNotIn('X-Total-Count', headers)
+        response, _ = lists_utils.paginator(factory.get('/v0/badges/?page_size=3&page=2'), Badge.objects.all(),
+                                            'status')
+        self.assertEqual([badge.id for badge in response], expected[3:6])
+
+        # Asserting that tampered cursors are refused
+        with self.assertRaises(lists_utils.InvalidCursor):
+            lists_utils.paginator(factory.get('/v0/badges/?cursor=tampered'), Badge.objects.all(), 'status')
+        with self.assertRaises(lists_utils.InvalidPageSize):
+            lists_utils.paginator(factory.get('/v0/badges/?page_size=0'), Badge.objects.all(), 'status')
@@ -4,7 +4,9 @@ from . import views
 
 urlpatterns = [
     path('redeem', views.redeem),
+    path('redeem/batch', views.redeem_batch),
     path('<uuid>/statistics', views.stats_badge),
+    path('<uuid>/export', views.export_badge),
     path('<uuid>', views.crud_badge),
     path('', views.badges),
 ]
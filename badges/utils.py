@@ -1,59 +1,29 @@
 import json
-from base64 import b64decode
 from datetime import datetime
-from mimetypes import guess_extension
 
-from django.core import serializers
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-
-from locations import queries as location_queries
-from users import queries as user_queries
+from lists import utils as lists_utils
 from .models import Status
 
 
-def decode_image_from_base64(base64_image, filename):
-    try:
-        # Accepted format: data:<mime_type>;base64,<encoding>
-        img_format, img_str = base64_image.split(';base64,')
-        _, mime_type = img_format.split(':')
-
-        # If MIME type is not image
-        if mime_type.split("/")[0] != "image":
-            raise NotAValidImage()
-
-        # Decoding image from base64
-        decoded_img = b64decode(img_str)
-        # Getting extension from MIME type
-        file_extension = guess_extension(mime_type)
-        # Storing image
-        return decoded_img, f'{filename}.{file_extension}'
-    except Exception as e:
-        raise NotAValidImage(e)
-
-
-def encode_badge_to_json(badges):
-    serialized_badges = json.loads(serializers.serialize("json",
-                                                         badges,
-                                                         fields=[
-                                                             'uuid', 'name',
-                                                             'description',
-                                                             'start_date', 'end_date',
-                                                             'location', 'promoter', 'status', 'image', ]))
-
-    image_serialized_badges = []
-    for serialized in serialized_badges:
-
-        badge_fields = serialized["fields"]
-
-        if badge_fields.get('location'):
-            badge_fields['location'] = location_queries.get_str_by_pk(badge_fields.get('location'))
+# The fields of a badge in its JSON, with the columns that each of them reads
+FIELDS = {
+    'uuid': ['uuid'],
+    'name': ['name'],
+    'description': ['description'],
+    'image': ['image'],
+    'status': ['status'],
+    'start_date': ['start_date'],
+    'end_date': ['end_date'],
+    'location': ['location__uuid'],
+    'promoter': ['promoter__email'],
+}
+# The fields that are related rows, identified by their string
+RELATED_FIELDS = ['location', 'promoter']
 
-        if badge_fields.get('promoter'):
-            badge_fields['promoter'] = user_queries.get_str_by_promoter_pk(badge_fields.get('promoter'))
 
-        image_serialized_badges.append(badge_fields)
-
-    return image_serialized_badges
+def encode_badge_to_json(badges, fields=tuple(FIELDS)):
+    # Building the dicts straight from the badges (select their location and promoter, or each costs a query)
+    return [{field: lists_utils.encode_field(badge, field, RELATED_FIELDS) for field in fields} for badge in badges]
 
 
 def decode_badge_from_json(data, admin):
@@ -89,22 +59,6 @@ def decode_badge_from_json(data, admin):
     return badge
 
 
-def paginator(request, f):
-    page_size = request.GET.get('page_size')
-    f = f.order_by('status')
-    pager = Paginator(f, page_size) if page_size else Paginator(f, 50)
-
-    page = request.GET.get('page')
-    try:
-        response = pager.page(page)
-    except PageNotAnInteger:
-        response = pager.page(1)
-    except EmptyPage:
-        response = pager.page(pager.num_pages)
-
-    return response
-
-
 class NotAValidStartDate(Exception):
     pass
 
@@ -115,7 +69,3 @@ class NotAValidEndDate(Exception):
 
 class InvalidJSONData(Exception):
     pass
-
-
-class NotAValidImage(Exception):
-    pass
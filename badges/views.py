@@ -1,14 +1,19 @@
 from django.contrib.auth import authenticate
 from django.http import JsonResponse, HttpResponse, HttpResponseNotAllowed
 
+import lists.utils as lists_utils
+import lists.views as lists_views
+import stats.queries as stats_queries
+import stats.utils as stats_utils
+import stats.views as stats_views
 import tags.queries as tags_queries
 import tags.utils as tags_utils
 from firebase.auth import InvalidIdToken, NoTokenProvided, FirebaseUserDoesNotExist
+from images import utils as images_utils
 from tags import crypto
 
 from . import queries, utils
 from .models import Badge, BadgeFilter
-from .utils import paginator
 
 # Views
 
@@ -79,13 +84,31 @@ def redeem(request):
         return HttpResponseNotAllowed(['POST'])
 
 
+def redeem_batch(request):
+    # Authenticating user
+    try:
+        user = authenticate(request)
+        if not user:
+            raise NoTokenProvided()
+    except (InvalidIdToken, NoTokenProvided, FirebaseUserDoesNotExist):
+        return HttpResponse(status=401,
+                            reason="Unauthorized: Operation needs authentication")
+
+    if request.method == 'POST':
+
+        return handle_redeem_badges_batch(request, user)
+
+    else:
+        return HttpResponseNotAllowed(['POST'])
+
+
 def stats_badge(request, uuid):
     # Authenticating user
     try:
         user = authenticate(request)
         if not user:
             raise NoTokenProvided()
-    except (InvalidIdToken, NoTokenProvided):
+    except (InvalidIdToken, NoTokenProvided, FirebaseUserDoesNotExist):
         return HttpResponse(status=401,
                             reason="Unauthorized: Operation needs authentication")
 
@@ -98,6 +121,25 @@ def stats_badge(request, uuid):
         return HttpResponseNotAllowed(['GET'])
 
 
+def export_badge(request, uuid):
+    # Authenticating user
+    try:
+        user = authenticate(request)
+        if not user:
+            raise NoTokenProvided()
+    except (InvalidIdToken, NoTokenProvided, FirebaseUserDoesNotExist):
+        return HttpResponse(status=401,
+                            reason="Unauthorized: Operation needs authentication")
+
+    if request.method == 'GET':
+
+        return handle_export_badge(request, uuid, user)
+
+    else:
+
+        return HttpResponseNotAllowed(['GET'])
+
+
 # Auxiliary functions for the Views
 
 def handle_create_badge(request, user):
@@ -128,7 +170,7 @@ def handle_create_badge(request, user):
 
         except queries.NotAValidLocation:
             return HttpResponse(status=400, reason="Bad Request: A valid Location UUID must be provided")
-        except utils.NotAValidImage:
+        except images_utils.NotAValidImage:
             return HttpResponse(status=400, reason="Bad Request: Invalid image provided")
         except queries.EndDateNotAfterStartDate:
             return HttpResponse(status=400, reason="Bad Request: Ending date must be later than Starting date")
@@ -147,11 +189,17 @@ def handle_get_badges(request, user):
     # Checking permissions (possibly needs the permission to see if the badge is related to this user)
     if user.has_perm('badges.view_badge'):
 
-        f = BadgeFilter(request.GET, queryset=Badge.objects.all()).qs
+        try:
+            fields = lists_utils.decode_fields_from_query(request.GET, utils.FIELDS)
+        except lists_utils.InvalidFields:
+            return HttpResponse(status=400, reason="Bad Request: Unknown field provided")
 
-        response = paginator(request, f)
+        badges = lists_utils.select_fields(Badge.objects.all(), fields, utils.FIELDS, utils.RELATED_FIELDS,
+                                           'status')
+        f = BadgeFilter(request.GET, queryset=badges).qs
 
-        return JsonResponse(utils.encode_badge_to_json(response), safe=False)
+        return lists_views.get_list_response(request, f, 'status',
+                                             lambda response: utils.encode_badge_to_json(response, fields))
 
     else:
         return HttpResponse(status=403,
@@ -204,7 +252,7 @@ def handle_patch_badge(request, uuid, user):
     try:
         updated_badge = queries.patch_badge_by_uuid(uuid, unserialized_patch_badge)
 
-    except utils.NotAValidImage:
+    except images_utils.NotAValidImage:
         return HttpResponse(status=400, reason="Bad Request: Invalid image provided")
     except queries.NotAValidLocation:
         return HttpResponse(status=400, reason="Bad Request: A valid Location UUID must be provided")
@@ -281,6 +329,57 @@ def handle_redeem_badge(request, user):
                                    " required to redeem a badge")
 
 
+def handle_redeem_badges_batch(request, user):
+    # Checking permissions
+    if user.has_perm('badges.redeem_badge'):
+
+        # Unserializing
+        try:
+            unserialized_scans = tags_utils.decode_redeem_infos_from_json(request.body)
+        except tags_utils.InvalidJSONData:
+            return HttpResponse(status=400, reason="Bad Request: Malformed JSON array of scans provided")
+
+        # Executing query
+        results, valid_badges = queries.redeem_badges_by_scans(unserialized_scans, user.id)
+
+        # Serializing
+        serialized_scans = []
+        for scan, result in zip(unserialized_scans, results):
+            status, reason = get_redeem_result_status(result)
+            serialized_scans.append({
+                'uid': scan.get('uid'),
+                'counter': scan.get('counter'),
+                'status': status,
+                'reason': reason,
+            })
+
+        return JsonResponse({
+            'scans': serialized_scans,
+            'badges': utils.encode_badge_to_json(valid_badges),
+        }, safe=False)
+
+    else:
+        return HttpResponse(status=403,
+                            reason="Forbidden: Current user does not have the permission"
+                                   " required to redeem a badge")
+
+
+def get_redeem_result_status(result):
+    # Status and reason of a scan, as they would be returned when redeeming it on its own
+    if isinstance(result, tags_queries.MissingRedeemInfo):
+        return 400, f"Bad Request: Info not sufficient to redeem tag - {result}"
+    elif isinstance(result, (crypto.InvalidUID, crypto.InvalidCounter, crypto.InvalidAppKey, crypto.InvalidCMAC)):
+        return 400, f"Bad Request: {result}"
+    elif isinstance(result, crypto.MessageAuthenticationFailed):
+        return 406, f"Not Acceptable: {result}"
+    elif isinstance(result, tags_queries.NotAValidTagUID):
+        return 404, "Not Found: No Tag by that UID"
+    elif isinstance(result, tags_queries.AlreadyRedeemedTag):
+        return 410, "Gone: The info provided refers to an already redeemed tag"
+    else:
+        return 200, "OK"
+
+
 def handle_get_stats_badge(request, uuid, user):
     try:
         badge = queries.get_badge_by_uuid(uuid)
@@ -293,10 +392,33 @@ def handle_get_stats_badge(request, uuid, user):
                             reason="Forbidden: Current user does not have the permission"
                                    " required to view statistics about this badge")
 
+    # Decoding the date range and granularity requested
+    try:
+        stats_range = stats_utils.decode_stats_range_from_query(request.GET)
+    except stats_utils.InvalidStatsRange as e:
+        return HttpResponse(status=400, reason=f"Bad Request: {e}")
+
     # Executing the query
-    statistics = queries.get_badge_stats(uuid)
+    statistics = queries.get_badge_stats(uuid, stats_range)
 
     # Serializing
     # serialized_statistics = utils.encode_statistics_to_json(statistics)
 
     return JsonResponse(statistics, safe=False)
+
+
+def handle_export_badge(request, uuid, user):
+    try:
+        badge = queries.get_badge_by_uuid(uuid)
+    except Badge.DoesNotExist:
+        return HttpResponse(status=404, reason="Not Found: No Badge by that UUID")
+
+    # Checking if it's admin or the promoter that created the badge
+    if not user.has_perm('badges.view_stats') and badge.promoter.user != user:
+        return HttpResponse(status=403,
+                            reason="Forbidden: Current user does not have the permission"
+                                   " required to export the redemptions of this badge")
+
+    return stats_views.get_export_response(
+        request, lambda stats_range: queries.get_badge_redemptions(uuid, stats_range),
+        stats_queries.BADGE_EXPORT_FIELDS, f'badge-{uuid}')
@@ -0,0 +1,23 @@
+# Generated by Django 3.1.2 on 2026-10-18 10:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Image',
+            fields=[
+                ('digest', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('content_type', models.CharField(max_length=255)),
+                ('size', models.PositiveIntegerField()),
+                ('time_created', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
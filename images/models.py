@@ -0,0 +1,12 @@
+from django.db import models
+
+
+class Image(models.Model):
+    # SHA-256 of the bytes, which name them in the store (so that identical images are stored once)
+    digest = models.CharField(max_length=64, primary_key=True)
+    content_type = models.CharField(max_length=255)
+    size = models.PositiveIntegerField()  # In bytes
+    time_created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return str(self.digest)
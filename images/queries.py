@@ -0,0 +1,85 @@
+import hashlib
+from io import BytesIO
+
+from PIL import Image as PillowImage
+from django.core.files.base import ContentFile
+
+from . import utils
+from .models import Image
+from .storage import storage
+
+
+def get_image_name(digest):
+    # Spreading the images through directories, so that none of them gets too big
+    return f'{digest[:2]}/{digest}'
+
+
+def get_thumbnail_name(digest, size):
+    return f'thumbnails/{size}/{digest[:2]}/{digest}'
+
+
+def create_image(data, content_type):
+    digest = hashlib.sha256(data).hexdigest()
+
+    # Storing the bytes once, whatever the number of badges, locations, rewards and collections showing them
+    name = get_image_name(digest)
+    if not storage.exists(name):
+        save_file(name, data)
+
+    image, _ = Image.objects.get_or_create(digest=digest, defaults={
+        'content_type': content_type,
+        'size': len(data),
+    })
+
+    return image
+
+
+def save_file(name, data):
+    # Files are named by their content, so one saved meanwhile under the same name already is this file
+    saved_name = storage.save(name, ContentFile(data))
+    if saved_name != name:
+        # The storage kept the copy under another name, which nothing would ever read
+        storage.delete(saved_name)
+
+
+def create_image_from_base64(base64_image):
+    # Attempting to decode image from base64 to check if image is valid
+    data, content_type = utils.decode_image_from_base64(base64_image)
+
+    return create_image(data, content_type)
+
+
+def get_image_by_digest(digest):
+    return Image.objects.get(digest=digest)
+
+
+def open_image(image, size=None):
+    if not size:
+        return storage.open(get_image_name(image.digest))
+
+    # Thumbnails are made the first time that they are requested, and then kept in the store
+    name = get_thumbnail_name(image.digest, size)
+    if not storage.exists(name):
+        try:
+            create_thumbnail(image, size)
+        except Exception:
+            # Pillow can't resize this image, so it is served whole (only images from before the formats were
+            # checked, such as SVGs moved into the store by the migrations, can be like this)
+            return storage.open(get_image_name(image.digest))
+
+    return storage.open(name)
+
+
+def create_thumbnail(image, size):
+    with storage.open(get_image_name(image.digest)) as original:
+        picture = PillowImage.open(original)
+        image_format = picture.format
+
+        # Fitting the image in the square, keeping its aspect ratio (it is never enlarged)
+        picture.thumbnail((size, size))
+
+        # Keeping the format, so that the thumbnail has the content type of the image
+        thumbnail = BytesIO()
+        picture.save(thumbnail, image_format)
+
+    save_file(get_thumbnail_name(image.digest, size), thumbnail.getvalue())
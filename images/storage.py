@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.files.storage import get_storage_class
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.functional import LazyObject, empty
+
+
+class ImageStorage(LazyObject):
+    # Any Django storage backend can hold the images (the local filesystem by default)
+    def _setup(self):
+        backend = get_storage_class(settings.IMAGES_STORAGE['BACKEND'])
+        self._wrapped = backend(**settings.IMAGES_STORAGE.get('OPTIONS', {}))
+
+
+storage = ImageStorage()
+
+
+@receiver(setting_changed)
+def reset_storage(setting, **kwargs):
+    if setting == 'IMAGES_STORAGE':
+        storage._wrapped = empty
@@ -0,0 +1,123 @@
+import tempfile
+from base64 import b64encode
+from io import BytesIO
+
+from PIL import Image as PillowImage
+from django.test import Client, TestCase, override_settings
+
+from . import queries, utils
+from .models import Image
+from .storage import storage
+
+
+class ImageTestCase(TestCase):
+
+    def setUp(self):
+        # Keeping the images of the tests out of the store
+        self.directory = tempfile.TemporaryDirectory()
+        self.settings = override_settings(IMAGES_STORAGE={
+            'BACKEND': 'django.core.files.storage.FileSystemStorage',
+            'OPTIONS': {'location': self.directory.name},
+        })
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        self.directory.cleanup()
+
+    @staticmethod
+    def __create_base64_image__(width, height, image_format='PNG'):
+        data = BytesIO()
+        PillowImage.new('RGB', (width, height), (0, 128, 255)).save(data, image_format)
+        return f'data:image/{image_format.lower()};base64,{b64encode(data.getvalue()).decode()}'
+
+    def test_image_store(self):
+        """
+        Test: Store identical images once
+        """
+        base64_image = self.__create_base64_image__(300, 200)
+
+        image = queries.create_image_from_base64(base64_image)
+        self.assertEqual(queries.create_image_from_base64(base64_image), image)
+        self.assertEqual(Image.objects.count(), 1)
+        self.assertEqual(image.content_type, 'image/png')
+        self.assertEqual(utils.encode_image_url(image.digest), f'/v0/images/{image.digest}')
+
+        # Asserting that other data is refused
+        with self.assertRaises(utils.NotAValidImage):
+            queries.create_image_from_base64('data:text/plain;base64,aGVsbG8=')
+
+        # Asserting that an image saved meanwhile by another request is kept once in the store
+        name = queries.get_image_name(image.digest)
+        with storage.open(name) as file:
+            data = file.read()
+        queries.save_file(name, data)
+        self.assertEqual(storage.listdir(image.digest[:2]), ([], [image.digest]))
+
+    def test_image_validation(self):
+        """
+        Test: Refuse images that are too big or not images, before decoding all of them
+        """
+        # Asserting that the type of the image is the one of its content
+        data, content_type = utils.decode_image_from_base64(
+            self.__create_base64_image__(30, 20, 'GIF').replace('image/gif', 'image/png'))
+        self.assertEqual(content_type, 'image/gif')
+        self.assertEqual(PillowImage.open(BytesIO(data)).size, (30, 20))
+
+        with override_settings(IMAGES_MAX_SIZE=1024):
+            with self.assertRaisesMessage(utils.NotAValidImage, "bytes"):
+                utils.decode_image_from_base64(f'data:image/png;base64,{"A" * 2048}')
+            for encoding in ["A" * utils.CHUNK_LENGTH * 4, "AAAA\n" * utils.CHUNK_LENGTH]:
+                with self.assertRaisesMessage(utils.NotAValidImage, "bytes"):
+                    utils.decode_image_from_base64(f'data:image/png;base64,{encoding}')
+
+        # Asserting that the dimensions are checked once the header is decoded, before the rest (invalid here)
+        data = BytesIO()
+        PillowImage.new('RGB', (300, 200)).save(data, 'PNG')
+        first_chunk = data.getvalue().ljust(utils.CHUNK_LENGTH // 4 * 3, b'\0')
+        with override_settings(IMAGES_MAX_PIXELS=100):
+            with self.assertRaisesMessage(utils.NotAValidImage, "pixels"):
+                utils.decode_image_from_base64(f'data:image/png;base64,{b64encode(first_chunk).decode()}!!!!')
+
+        # Asserting that base64 wrapped in lines is accepted, and that formats other than the common ones are refused
+        base64_image = self.__create_base64_image__(300, 200)
+        header, encoding = base64_image.split(',')
+        wrapped = '\n'.join(encoding[i:i + 76] for i in range(0, len(encoding), 76))
+        self.assertEqual(utils.decode_image_from_base64(f'{header},{wrapped}\n'),
+                         utils.decode_image_from_base64(base64_image))
+        with self.assertRaisesMessage(utils.NotAValidImage, "formats"):
+            utils.decode_image_from_base64(self.__create_base64_image__(30, 20, 'BMP'))
+
+        for base64_image in [None, 'image/png;base64,AAAA', 'data:image/png;base64,not base64',
+                             f'data:image/png;base64,{b64encode(b"not an image").decode()}']:
+            with self.assertRaises(utils.NotAValidImage):
+                utils.decode_image_from_base64(base64_image)
+
+    def test_image_get(self):
+        """
+        Test: Get an image and its thumbnails
+        Path: /v0/images/digest
+        """
+        image = queries.create_image_from_base64(self.__create_base64_image__(300, 200, 'JPEG'))
+        client = Client()
+
+        response = client.get(f'/v0/images/{image.digest}')
+
+        # Asserting that the image is served to be cached for good
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(PillowImage.open(BytesIO(b''.join(response.streaming_content))).size, (300, 200))
+
+        # Asserting that the thumbnail fits the size requested, keeping the aspect ratio
+        response = client.get(f'/v0/images/{image.digest}?size=64')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(PillowImage.open(BytesIO(b''.join(response.streaming_content))).size, (64, 43))
+
+        # Asserting that clients with the image don't get it again
+        response = client.get(f'/v0/images/{image.digest}?size=64', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        self.assertEqual(client.get(f'/v0/images/{image.digest}?size=100').status_code, 400)
+        self.assertEqual(client.get(f'/v0/images/{"0" * 64}').status_code, 404)
+        self.assertEqual(client.get(f'/v0/images/{"0" * 64}', HTTP_IF_NONE_MATCH=f'"{"0" * 64}"').status_code, 404)
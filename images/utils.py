@@ -0,0 +1,117 @@
+from base64 import b64decode
+from io import BytesIO
+
+from PIL import Image as PillowImage
+from django.conf import settings
+from django.urls import reverse
+
+# Characters of base64 decoded at a time (a multiple of 4, so that each chunk is decoded on its own)
+CHUNK_LENGTH = 64 * 1024
+# Bytes at the start of an image that its header has to be in, and characters of the data URL before the base64
+HEADER_MAX_SIZE = 256 * 1024
+HEADER_MAX_LENGTH = 255
+
+# Formats of the images accepted (the ones that every browser shows), with their content types
+IMAGE_FORMATS = {
+    'PNG': 'image/png',
+    'JPEG': 'image/jpeg',
+    'GIF': 'image/gif',
+    'WEBP': 'image/webp',
+}
+
+# Sides of the squares that the thumbnails fit in (a few, so that their cache stays small)
+THUMBNAIL_SIZES = [64, 128, 256, 512]
+
+
+def decode_image_from_base64(base64_image):
+    # Accepted format: data:<mime_type>;base64,<encoding> (only looked for at the start, not through the whole image)
+    if not isinstance(base64_image, str) or not base64_image.startswith('data:'):
+        raise NotAValidImage("Images must be data URLs")
+    header_end = base64_image.find(';base64,', 0, HEADER_MAX_LENGTH)
+    mime_type = base64_image[len('data:'):header_end]
+
+    # If MIME type is not image
+    if header_end < 0 or mime_type.split("/")[0] != "image":
+        raise NotAValidImage("Images must be data URLs of an image in base64")
+
+    # Refusing images too big before decoding them (every 4 characters of base64 are 3 bytes), allowing for as many
+    # whitespace characters as there are of base64
+    encoding_start = header_end + len(';base64,')
+    if (len(base64_image) - encoding_start) // 8 * 3 > settings.IMAGES_MAX_SIZE:
+        raise NotAValidImage(f"Images can't have more than {settings.IMAGES_MAX_SIZE} bytes")
+
+    # Decoding the image a chunk at a time, so that an invalid one is refused before decoding the rest of it
+    data = bytearray()
+    image_header = None
+    encoding = ''
+    for chunk_start in range(encoding_start, len(base64_image), CHUNK_LENGTH):
+        # Base64 wrapped in lines is still valid, so the whitespace is left out (leaving the characters past the last
+        # 4 to the next chunk, so that each chunk is decoded on its own)
+        encoding += ''.join(base64_image[chunk_start:chunk_start + CHUNK_LENGTH].split())
+        decoded_length = len(encoding) if chunk_start + CHUNK_LENGTH >= len(base64_image) else len(encoding) // 4 * 4
+        try:
+            data += b64decode(encoding[:decoded_length], validate=True)
+        except ValueError as e:  # Including binascii.Error
+            raise NotAValidImage(e)
+        encoding = encoding[decoded_length:]
+
+        if len(data) > settings.IMAGES_MAX_SIZE:
+            raise NotAValidImage(f"Images can't have more than {settings.IMAGES_MAX_SIZE} bytes")
+
+        if not image_header:
+            image_header = decode_image_header(data)
+            # The header of an image is at its start, so the image isn't valid if it wasn't found there
+            if not image_header and len(data) >= HEADER_MAX_SIZE:
+                break
+
+    if not image_header:
+        raise NotAValidImage("Images must be in a format that can be read")
+
+    # The type of the image is the one of its content, whatever the type that it was sent as
+    image_format, _ = image_header
+    return bytes(data), IMAGE_FORMATS[image_format]
+
+
+def decode_image_header(data):
+    # Reading the format and dimensions of the image, without decoding its pixels
+    try:
+        with PillowImage.open(BytesIO(data)) as picture:
+            image_format, (width, height) = picture.format, picture.size
+    except PillowImage.DecompressionBombError:  # Even more pixels than the ones that Pillow accepts
+        width, height = settings.IMAGES_MAX_PIXELS + 1, 1
+    except Exception:
+        return None  # Not decoded far enough yet (or not an image)
+
+    if image_format not in IMAGE_FORMATS:
+        raise NotAValidImage(f"Images must be in one of the formats {', '.join(IMAGE_FORMATS)}")
+    if width * height > settings.IMAGES_MAX_PIXELS:
+        raise NotAValidImage(f"Images can't have more than {settings.IMAGES_MAX_PIXELS} pixels")
+
+    return image_format, (width, height)
+
+
+def encode_image_url(digest):
+    # The URL of an image is the same for as long as it exists, so it is cached for good
+    return reverse('image', args=[digest]) if digest else None
+
+
+def decode_size_from_query(query):
+    if not query.get('size'):
+        return None
+
+    try:
+        size = int(query.get('size'))
+    except ValueError:
+        raise InvalidSize()
+    if size not in THUMBNAIL_SIZES:
+        raise InvalidSize()
+
+    return size
+
+
+class NotAValidImage(Exception):
+    pass
+
+
+class InvalidSize(Exception):
+    pass
@@ -0,0 +1,48 @@
+from django.http import FileResponse, HttpResponse, HttpResponseNotAllowed, HttpResponseNotModified
+
+from . import queries, utils
+from .models import Image
+
+# The bytes of a digest never change, so clients and proxies can keep them for a year
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Views
+
+
+def image(request, digest):
+    # Images are public (like the rest of the page that shows them), so no authentication is needed
+    if request.method == 'GET':
+
+        return handle_get_image(request, digest)
+
+    else:
+
+        return HttpResponseNotAllowed(['GET'])
+
+
+# Auxiliary functions for the Views
+
+def handle_get_image(request, digest):
+    # Decoding the size of the thumbnail requested (if any)
+    try:
+        size = utils.decode_size_from_query(request.GET)
+    except utils.InvalidSize:
+        return HttpResponse(status=400, reason="Bad Request: Size must be one of "
+                                               f"{', '.join(map(str, utils.THUMBNAIL_SIZES))}")
+
+    # Executing the query (even for clients that have the image, as it may have been removed since)
+    try:
+        selected_image = queries.get_image_by_digest(digest)
+    except Image.DoesNotExist:
+        return HttpResponse(status=404, reason="Not Found: No image by that digest")
+
+    etag = f'"{digest}-{size}"' if size else f'"{digest}"'
+    if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+        response = HttpResponseNotModified()
+    else:
+        response = FileResponse(queries.open_image(selected_image, size), content_type=selected_image.content_type)
+
+    response['Cache-Control'] = CACHE_CONTROL
+    response['ETag'] = etag
+
+    return response
@@ -0,0 +1,123 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.db.models import Q
+
+from images import utils as images_utils
+
+PAGE_SIZE = 50
+
+
+def encode_field(row, field, related_fields):
+    # The image is linked by its URL, which only needs its digest (so the image itself isn't read)
+    if field == 'image':
+        return images_utils.encode_image_url(row.image_id)
+
+    value = getattr(row, field)
+    return str(value) if field in related_fields and value is not None else value
+
+
+def decode_fields_from_query(query, all_fields):
+    # Every field, unless only some of them are requested or some are excluded
+    fields = query.get('fields').split(',') if query.get('fields') else list(all_fields)
+    excluded = query.get('exclude').split(',') if query.get('exclude') else []
+
+    if any(field not in all_fields for field in fields + excluded):
+        raise InvalidFields()
+
+    # Keeping the order of the fields in the JSON
+    return [field for field in all_fields if field in fields and field not in excluded]
+
+
+def select_fields(f, fields, all_fields, related_fields, sort_field):
+    # Reading only the columns of the fields requested (and the one that orders the pages)
+    columns = [sort_field] + [column for field in fields for column in all_fields[field]]
+    f = f.only(*columns)
+
+    # Joining the related rows requested (with no arguments, select_related would join every one of them)
+    related_fields = [field for field in related_fields if field in fields]
+    return f.select_related(*related_fields) if related_fields else f
+
+
+def paginator(request, f, sort_field):
+    try:
+        page_size = int(request.GET.get('page_size') or PAGE_SIZE)
+    except ValueError:
+        raise InvalidPageSize()
+    if page_size < 1:
+        raise InvalidPageSize()
+
+    # Ordering by a unique key, so that every row is in exactly one page
+    f = f.order_by(sort_field, 'id')
+    headers = {}
+
+    # Numbered pages are still served, though the deep ones are slow (OFFSET reads every row before them)
+    if 'page' in request.GET:
+        pager = Paginator(f, page_size)
+
+        page = request.GET.get('page')
+        try:
+            response = pager.page(page)
+        except PageNotAnInteger:
+            response = pager.page(1)
+        except EmptyPage:
+            response = pager.page(pager.num_pages)
+
+        headers['X-Total-Count'] = pager.count
+        if response.has_next():
+            headers['Link'] = get_next_link(request, page=response.next_page_number())
+
+        return response, headers
+
+    # Counting is a scan of every row filtered, so it can be skipped
+    if request.GET.get('include_total') != 'false':
+        headers['X-Total-Count'] = f.count()
+
+    # Otherwise, the page starts right after the cursor (the last row of the previous page)
+    cursor = request.GET.get('cursor')
+    if cursor:
+        value, row_id = decode_cursor(cursor)
+        f = f.filter(Q(**{f'{sort_field}__gt': value}) | Q(**{sort_field: value, 'id__gt': row_id}))
+
+    # Getting one more row to know if there is a next page
+    response = list(f[:page_size + 1])
+    if len(response) > page_size:
+        response = response[:page_size]
+        headers['Link'] = get_next_link(request, cursor=encode_cursor(response[-1], sort_field))
+
+    return response, headers
+
+
+def get_next_link(request, **params):
+    query = request.GET.copy()
+    query.pop('page', None)
+    query.pop('cursor', None)
+    for param, value in params.items():
+        query[param] = value
+
+    return f'<{request.build_absolute_uri(request.path)}?{query.urlencode()}>; rel="next"'
+
+
+def encode_cursor(row, sort_field):
+    return urlsafe_b64encode(json.dumps([getattr(row, sort_field), row.id]).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        value, row_id = json.loads(urlsafe_b64decode(cursor.encode()))
+        return str(value), int(row_id)
+    except Exception:
+        raise InvalidCursor()
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class InvalidPageSize(Exception):
+    pass
+
+
+class InvalidFields(Exception):
+    pass
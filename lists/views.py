@@ -0,0 +1,19 @@
+from django.http import JsonResponse, HttpResponse
+
+from . import utils
+
+
+def get_list_response(request, f, sort_field, encode_to_json):
+    try:
+        response, headers = utils.paginator(request, f, sort_field)
+    except utils.InvalidCursor:
+        return HttpResponse(status=400, reason="Bad Request: Invalid cursor provided")
+    except utils.InvalidPageSize:
+        return HttpResponse(status=400, reason="Bad Request: Page size must be a positive integer")
+
+    json_response = JsonResponse(encode_to_json(response), safe=False)
+    # Linking the next page and counting the total in the headers, so the body is still the list
+    for header, value in headers.items():
+        json_response[header] = value
+
+    return json_response
@@ -0,0 +1,17 @@
+# Generated by Django 3.1.2 on 2026-10-18 10:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0005_auto_20210106_0920'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='location',
+            index=models.Index(fields=['status', 'id'], name='locations_l_status_0bad8d_idx'),
+        ),
+    ]
@@ -3,6 +3,7 @@ import uuid
 import django_filters
 from django.db import models
 
+from images.models import Image
 from users.models import ManagerUser
 
 
@@ -20,7 +21,7 @@ class Location(models.Model):
     website = models.CharField(max_length=255, null=True)
     latitude = models.FloatField(null=True)
     longitude = models.FloatField(null=True)
-    image = models.TextField(null=True)
+    image = models.ForeignKey(Image, on_delete=models.PROTECT, null=True)
     status = models.CharField(max_length=255, choices=Status.choices, default=Status.PENDING)
     instagram = models.CharField(max_length=255, null=True)
     facebook = models.CharField(max_length=255, null=True)
@@ -31,6 +32,9 @@ class Location(models.Model):
         permissions = (
             ('view_stats', 'Can view statistics for a location'),
         )
+        indexes = [
+            models.Index(fields=['status', 'id']),  # Pages of the list
+        ]
 
     def __str__(self):
         return str(self.uuid)
@@ -1,8 +1,23 @@
 import json
 
+from django.http import QueryDict
 from django.test import Client, TestCase
 
+from lists import utils as lists_utils
+from users.models import ManagerUser, PromoterUser, User
 from users.tests import UsersTestCase
+from . import utils
+from .models import Location
+
+
+def create_locations(count=1, **fields):
+    # A manager with some locations, and a promoter for their badges, rewards and collections
+    manager = ManagerUser.objects.create(email="manager@test.com", user=User.objects.create_user())
+    promoter = PromoterUser.objects.create(email="promoter@test.com", user=User.objects.create_user())
+    locations = [Location.objects.create(name=f"Location {i}", description="Location", manager=manager, **fields)
+                 for i in range(count)]
+
+    return manager, promoter, locations
 
 
 class LocationTestCase(TestCase):
@@ -167,3 +182,33 @@ class LocationTestCase(TestCase):
 
         # Logging out
         users.log_out()
+
+    def test_location_fields(self):
+        """
+        Test: Encode only the fields requested of the locations
+        """
+        create_locations(3, latitude=41.55, longitude=-8.38)
+
+        def select_fields(fields):
+            locations = Location.objects.order_by('id')
+            return lists_utils.select_fields(locations, fields, utils.FIELDS, utils.RELATED_FIELDS, 'status')
+
+        # Asserting that the fields are kept in the order of the JSON, without the excluded ones
+        query = QueryDict('fields=longitude,name,latitude,image&exclude=image')
+        fields = lists_utils.decode_fields_from_query(query, utils.FIELDS)
+        self.assertEqual(fields, ['name', 'latitude', 'longitude'])
+        self.assertEqual(lists_utils.decode_fields_from_query(QueryDict('exclude=image'), utils.FIELDS),
+                         [field for field in utils.FIELDS if field != 'image'])
+        with self.assertRaises(lists_utils.InvalidFields):
+            lists_utils.decode_fields_from_query(QueryDict('fields=name,password'), utils.FIELDS)
+
+        # Asserting that only those columns are read, in a single query
+        with self.assertNumQueries(1):
+            data = utils.encode_location_to_json(select_fields(fields), fields)
+        self.assertEqual(data[0], {'name': "Location 0", 'latitude': 41.55, 'longitude': -8.38})
+
+        # Asserting that the related manager is joined when requested
+        fields = lists_utils.decode_fields_from_query(QueryDict('fields=uuid,manager'), utils.FIELDS)
+        with self.assertNumQueries(1):
+            data = utils.encode_location_to_json(select_fields(fields), fields)
+        self.assertEqual(data[2]['manager'], "manager@test.com")
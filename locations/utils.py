@@ -1,55 +1,32 @@
 import json
-from base64 import b64decode
-from mimetypes import guess_extension
 
-from django.core import serializers
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-
-from users import queries as user_queries
+from lists import utils as lists_utils
 from .models import Status
 
 
-def decode_image_from_base64(base64_image, filename):
-    try:
-        # Accepted format: data:<mime_type>;base64,<encoding>
-        img_format, img_str = base64_image.split(';base64,')
-        _, mime_type = img_format.split(':')
-
-        # If MIME type is not image
-        if mime_type.split("/")[0] != "image":
-            raise NotAValidImage()
-
-        # Decoding image from base64
-        decoded_img = b64decode(img_str)
-        # Getting extension from MIME type
-        file_extension = guess_extension(mime_type)
-        # Storing image
-        return decoded_img, f'{filename}.{file_extension}'
-    except Exception as e:
-        raise NotAValidImage(e)
-
-
-def encode_location_to_json(locations):
-    serialized_locations = json.loads(serializers.serialize("json",
-                                                            locations,
-                                                            fields=[
-                                                                'uuid', 'name',
-                                                                'description', 'website',
-                                                                'latitude', 'longitude',
-                                                                'facebook', 'instagram', 'twitter',
-                                                                'status', 'image', 'manager']))
-
-    image_serialized_locations = []
-    for serialized in serialized_locations:
-
-        location_fields = serialized["fields"]
-
-        if location_fields.get('manager'):
-            location_fields['manager'] = user_queries.get_str_by_manager_pk(location_fields.get('manager'))
+# The fields of a location in its JSON, with the columns that each of them reads
+FIELDS = {
+    'uuid': ['uuid'],
+    'name': ['name'],
+    'description': ['description'],
+    'website': ['website'],
+    'latitude': ['latitude'],
+    'longitude': ['longitude'],
+    'image': ['image'],
+    'status': ['status'],
+    'instagram': ['instagram'],
+    'facebook': ['facebook'],
+    'twitter': ['twitter'],
+    'manager': ['manager__email'],
+}
+# The fields that are related rows, identified by their string
+RELATED_FIELDS = ['manager']
 
-        image_serialized_locations.append(location_fields)
 
-    return image_serialized_locations
+def encode_location_to_json(locations, fields=tuple(FIELDS)):
+    # Building the dicts straight from the locations (select their manager, or each costs a query)
+    return [{field: lists_utils.encode_field(location, field, RELATED_FIELDS) for field in fields}
+            for location in locations]
 
 
 def decode_location_from_json(data, admin):
@@ -88,25 +65,5 @@ def encode_statistics_to_json(data):
     return json_data
 
 
-def paginator(request, f):
-    page_size = request.GET.get('page_size')
-    f = f.order_by('status')
-    pager = Paginator(f, page_size) if page_size else Paginator(f, 50)
-
-    page = request.GET.get('page')
-    try:
-        response = pager.page(page)
-    except PageNotAnInteger:
-        response = pager.page(1)
-    except EmptyPage:
-        response = pager.page(pager.num_pages)
-
-    return response
-
-
 class InvalidJSONData(Exception):
     pass
-
-
-class NotAValidImage(Exception):
-    pass
@@ -2,9 +2,14 @@ from django.contrib.auth import authenticate
 from django.http import JsonResponse, HttpResponse, HttpResponseNotAllowed
 
 from firebase.auth import InvalidIdToken, NoTokenProvided, FirebaseUserDoesNotExist
+from images import utils as images_utils
+from lists import utils as lists_utils
+from lists import views as lists_views
+from stats import queries as stats_queries
+from stats import utils as stats_utils
+from stats import views as stats_views
 from . import queries, utils
 from .models import Location, LocationFilter
-from .utils import paginator
 
 
 def locations(request):
@@ -63,7 +68,7 @@ def stats_location(request, uuid):
         user = authenticate(request)
         if not user:
             raise NoTokenProvided()
-    except (InvalidIdToken, NoTokenProvided):
+    except (InvalidIdToken, NoTokenProvided, FirebaseUserDoesNotExist):
         return HttpResponse(status=401,
                             reason="Unauthorized: Operation needs authentication")
 
@@ -76,6 +81,25 @@ def stats_location(request, uuid):
         return HttpResponseNotAllowed(['GET'])
 
 
+def export_location(request, uuid):
+    # Authenticating user
+    try:
+        user = authenticate(request)
+        if not user:
+            raise NoTokenProvided()
+    except (InvalidIdToken, NoTokenProvided, FirebaseUserDoesNotExist):
+        return HttpResponse(status=401,
+                            reason="Unauthorized: Operation needs authentication")
+
+    if request.method == 'GET':
+
+        return handle_export_location(request, uuid, user)
+
+    else:
+
+        return HttpResponseNotAllowed(['GET'])
+
+
 # Auxiliary functions for the Views
 
 
@@ -98,7 +122,7 @@ def handle_create_location(request, user):
 
             created_location = queries.create_location(unserialized_location, user.id)
 
-        except utils.NotAValidImage:
+        except images_utils.NotAValidImage:
             return HttpResponse(status=400, reason="Bad Request: Invalid image provided")
 
         # Serializing
@@ -116,11 +140,17 @@ def handle_get_locations(request, user):
     # Checking permissions (possibly needs the permission to see if the badge is related to this user)
     if user.has_perm('locations.view_location'):
 
-        f = LocationFilter(request.GET, queryset=Location.objects.all()).qs
+        try:
+            fields = lists_utils.decode_fields_from_query(request.GET, utils.FIELDS)
+        except lists_utils.InvalidFields:
+            return HttpResponse(status=400, reason="Bad Request: Unknown field provided")
 
-        response = paginator(request, f)
+        locations = lists_utils.select_fields(Location.objects.all(), fields, utils.FIELDS, utils.RELATED_FIELDS,
+                                              'status')
+        f = LocationFilter(request.GET, queryset=locations).qs
 
-        return JsonResponse(utils.encode_location_to_json(response), safe=False)
+        return lists_views.get_list_response(request, f, 'status',
+                                             lambda response: utils.encode_location_to_json(response, fields))
 
     else:
         return HttpResponse(status=403,
@@ -173,7 +203,7 @@ def handle_patch_location(request, uuid, user):
     try:
         updated_location = queries.patch_location_by_uuid(uuid, unserialized_patch_location)
 
-    except utils.NotAValidImage as e:
+    except images_utils.NotAValidImage as e:
         return HttpResponse(status=400, reason=f"Bad Request: Invalid image provided {e}")
 
     # Serializing
@@ -215,10 +245,33 @@ def handle_get_stats_location(request, uuid, user):
                             reason="Forbidden: Current user does not have the permission"
                                    " required to view statistics about this location")
 
+    # Decoding the date range and granularity requested
+    try:
+        stats_range = stats_utils.decode_stats_range_from_query(request.GET)
+    except stats_utils.InvalidStatsRange as e:
+        return HttpResponse(status=400, reason=f"Bad Request: {e}")
+
     # Executing the query
-    statistics = queries.get_location_stats(uuid)
+    statistics = queries.get_location_stats(uuid, stats_range)
 
     # Serializing
     # serialized_statistics = utils.encode_statistics_to_json(statistics)
 
     return JsonResponse(statistics, safe=False)
+
+
+def handle_export_location(request, uuid, user):
+    try:
+        location = queries.get_location_by_uuid(uuid)
+    except Location.DoesNotExist:
+        return HttpResponse(status=404, reason="Not Found: No Location by that UUID")
+
+    # Checking if it's admin or the manager that created the location
+    if not user.has_perm('locations.view_stats') and location.manager.user != user:
+        return HttpResponse(status=403,
+                            reason="Forbidden: Current user does not have the permission"
+                                   " required to export the redemptions of this location")
+
+    return stats_views.get_export_response(
+        request, lambda stats_range: queries.get_location_redemptions(uuid, stats_range),
+        stats_queries.BADGE_EXPORT_FIELDS, f'location-{uuid}')
@@ -0,0 +1,17 @@
+# Generated by Django 3.1.2 on 2026-10-18 09:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rewards', '0004_auto_20210106_0920'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='redeemedreward',
+            index=models.Index(fields=['reward', 'time_awarded'], name='rewards_red_reward__d78395_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.1.2 on 2026-10-18 10:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rewards', '0005_redeemedreward_reward_time_awarded_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reward',
+            index=models.Index(fields=['status', 'id'], name='rewards_rew_status_825c22_idx'),
+        ),
+    ]
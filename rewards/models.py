@@ -3,6 +3,7 @@ import uuid
 from django.db import models
 
 import django_filters
+from images.models import Image
 from locations.models import Location
 from users.models import AppUser, PromoterUser
 
@@ -17,7 +18,7 @@ class Reward(models.Model):
     uuid = models.UUIDField(unique=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=255)
     description = models.TextField()
-    image = models.TextField(null=True)
+    image = models.ForeignKey(Image, on_delete=models.PROTECT, null=True)
     status = models.CharField(max_length=255, choices=Status.choices, default=Status.PENDING)
     time_redeem = models.IntegerField(null=True)  # Time to redeem in seconds
     promoter = models.ForeignKey(PromoterUser, on_delete=models.RESTRICT)
@@ -31,6 +32,9 @@ class Reward(models.Model):
             ('redeem_reward', 'Can redeem Reward'),
             ('view_stats', 'Can view statistics for a Reward'),
         )
+        indexes = [
+            models.Index(fields=['status', 'id']),  # Pages of the list
+        ]
 
 
 class RedeemedReward(models.Model):
@@ -40,6 +44,11 @@ class RedeemedReward(models.Model):
     reward = models.ForeignKey(Reward, on_delete=models.RESTRICT)
     redeemed = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['reward', 'time_awarded']),
+        ]
+
 
 class RewardFilter(django_filters.FilterSet):
     created_by = django_filters.CharFilter(field_name='promoter__email')
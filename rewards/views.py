@@ -2,9 +2,14 @@ from django.contrib.auth import authenticate
 from django.http import JsonResponse, HttpResponse, HttpResponseNotAllowed
 
 from firebase.auth import InvalidIdToken, NoTokenProvided, FirebaseUserDoesNotExist
+from images import utils as images_utils
+from lists import utils as lists_utils
+from lists import views as lists_views
+from stats import queries as stats_queries
+from stats import utils as stats_utils
+from stats import views as stats_views
 from . import queries, utils
 from .models import Reward, RewardFilter
-from .utils import paginator
 
 
 # Views
@@ -81,7 +86,7 @@ def stats_reward(request, uuid):
         user = authenticate(request)
         if not user:
             raise NoTokenProvided()
-    except (InvalidIdToken, NoTokenProvided):
+    except (InvalidIdToken, NoTokenProvided, FirebaseUserDoesNotExist):
         return HttpResponse(status=401,
                             reason="Unauthorized: Operation needs authentication")
 
@@ -94,6 +99,25 @@ def stats_reward(request, uuid):
         return HttpResponseNotAllowed(['GET'])
 
 
+def export_reward(request, uuid):
+    # Authenticating user
+    try:
+        user = authenticate(request)
+        if not user:
+            raise NoTokenProvided()
+    except (InvalidIdToken, NoTokenProvided, FirebaseUserDoesNotExist):
+        return HttpResponse(status=401,
+                            reason="Unauthorized: Operation needs authentication")
+
+    if request.method == 'GET':
+
+        return handle_export_reward(request, uuid, user)
+
+    else:
+
+        return HttpResponseNotAllowed(['GET'])
+
+
 # Auxiliary functions for the Views
 
 def handle_create_reward(request, user):
@@ -116,7 +140,7 @@ def handle_create_reward(request, user):
 
             created_reward = queries.create_reward(unserialized_reward, user.id)
 
-        except utils.NotAValidImage:
+        except images_utils.NotAValidImage:
             return HttpResponse(status=400, reason="Bad Request: Invalid image provided")
 
         # Serializing
@@ -133,11 +157,17 @@ def handle_get_rewards(request, user):
     # Checking permissions (possibly needs the permission to see if the reward is related to this user)
     if user.has_perm('rewards.view_reward'):
 
-        f = RewardFilter(request.GET, queryset=Reward.objects.all()).qs
+        try:
+            fields = lists_utils.decode_fields_from_query(request.GET, utils.FIELDS)
+        except lists_utils.InvalidFields:
+            return HttpResponse(status=400, reason="Bad Request: Unknown field provided")
 
-        response = paginator(request, f)
+        rewards = lists_utils.select_fields(Reward.objects.all(), fields, utils.FIELDS, utils.RELATED_FIELDS,
+                                            'status')
+        f = RewardFilter(request.GET, queryset=rewards).qs
 
-        return JsonResponse(utils.encode_rewards_to_json(response), safe=False)
+        return lists_views.get_list_response(request, f, 'status',
+                                             lambda response: utils.encode_rewards_to_json(response, fields))
 
     else:
         return HttpResponse(status=403,
@@ -189,7 +219,7 @@ def handle_patch_reward(request, uuid, user):
     # Executing query
     try:
         updated_reward = queries.patch_reward_by_uuid(uuid, unserialized_patch_reward)
-    except utils.NotAValidImage:
+    except images_utils.NotAValidImage:
         return HttpResponse(status=400, reason="Bad Request: Invalid image provided")
 
     # Serializing
@@ -271,10 +301,33 @@ def handle_get_stats_reward(request, uuid, user):
                             reason="Forbidden: Current user does not have the permission"
                                    " required to view statistics about this reward")
 
+    # Decoding the date range and granularity requested
+    try:
+        stats_range = stats_utils.decode_stats_range_from_query(request.GET)
+    except stats_utils.InvalidStatsRange as e:
+        return HttpResponse(status=400, reason=f"Bad Request: {e}")
+
     # Executing the query
-    statistics = queries.get_reward_stats(uuid)
+    statistics = queries.get_reward_stats(uuid, stats_range)
 
     # Serializing
     # serialized_statistics = utils.encode_statistics_to_json(statistics)
 
     return JsonResponse(statistics, safe=False)
+
+
+def handle_export_reward(request, uuid, user):
+    try:
+        reward = queries.get_reward_by_uuid(uuid)
+    except Reward.DoesNotExist:
+        return HttpResponse(status=404, reason="Not Found: No Reward by that UUID")
+
+    # Checking if it's admin or the promoter that created the reward
+    if not user.has_perm('rewards.view_stats') and reward.promoter.user != user:
+        return HttpResponse(status=403,
+                            reason="Forbidden: Current user does not have the permission"
+                                   " required to export the redemptions of this reward")
+
+    return stats_views.get_export_response(
+        request, lambda stats_range: queries.get_reward_redemptions(uuid, stats_range),
+        stats_queries.REWARD_EXPORT_FIELDS, f'reward-{uuid}')
@@ -48,6 +48,9 @@ INSTALLED_APPS = [
     'badge_collections',
     'rewards',
     'users',
+    'stats',
+    'images',
+    'lists',
     'firebase',
     'groupadmin_users',
 ]
@@ -155,6 +158,36 @@ PYREBASE_API_KEY = {
 # Max Request Size
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10485760
 
+# Decoded Tag keys kept in memory for redeeming (number of tags and seconds)
+TAG_KEY_CACHE_SIZE = int(os.environ.get('TAG_KEY_CACHE_SIZE') or 4096)
+TAG_KEY_CACHE_TTL = int(os.environ.get('TAG_KEY_CACHE_TTL') or 3600)
+
+# Statistics computed for the dashboards (in memory by default, any Django cache backend can be used)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'stats': {
+        'BACKEND': os.environ.get('STATS_CACHE_BACKEND') or 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': os.environ.get('STATS_CACHE_LOCATION') or 'stats',
+        'TIMEOUT': int(os.environ.get('STATS_CACHE_TTL') or 300),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('STATS_CACHE_SIZE') or 1000),
+        },
+    },
+}
+
+# Images, stored once under their SHA-256 (on the local filesystem by default, any Django storage backend can be used)
+IMAGES_STORAGE = {
+    'BACKEND': os.environ.get('IMAGES_STORAGE_BACKEND') or 'django.core.files.storage.FileSystemStorage',
+    'OPTIONS': {
+        'location': os.environ.get('IMAGES_STORAGE_LOCATION') or os.path.join(BASE_DIR, 'media', 'images'),
+    },
+}
+# Largest images accepted (in bytes and pixels)
+IMAGES_MAX_SIZE = int(os.environ.get('IMAGES_MAX_SIZE') or 5 * 1024 * 1024)
+IMAGES_MAX_PIXELS = int(os.environ.get('IMAGES_MAX_PIXELS') or 4096 * 4096)
+
 # Lets TestCases print to stdout
 NOSE_ARGS = ['--nocapture',
              '--nologcapture', ]
@@ -194,6 +227,11 @@ CORS_ALLOW_HEADERS = (
     'access-control-allow-origin'
 )
 
+CORS_EXPOSE_HEADERS = (
+    'link',
+    'x-total-count'
+)
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/3.1/howto/static-files/
 STATIC_URL = '/static/'
@@ -8,5 +8,7 @@ urlpatterns = [
     path('v0/collections/', include('badge_collections.urls')),
     path('v0/tags/', include('tags.urls')),
     path('v0/rewards/', include('rewards.urls')),
-    path('v0/users/', include('users.urls'))
+    path('v0/users/', include('users.urls')),
+    path('v0/statistics/', include('stats.urls')),
+    path('v0/images/', include('images.urls'))
 ]
@@ -0,0 +1,122 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db import transaction
+
+from . import engine
+
+STATS_CACHE = 'stats'
+GLOBAL_VERSION = 'stats:version'
+
+# Lookups in this process (the backend may be shared by several)
+counters = {'hits': 0, 'misses': 0}
+counters_lock = threading.Lock()
+# Timeout of the statistics looked up while warming the cache (see the warmstats command)
+warm_timeout = None
+
+
+def get_version_key(kind, entity_id):
+    return f'stats:version:{kind}:{entity_id}'
+
+
+def get_versions(version_keys):
+    cache = caches[STATS_CACHE]
+    versions = cache.get_many(version_keys)
+
+    # Versions that were never set (or were evicted) start at the current time so that they are never reused
+    for version_key in version_keys:
+        if version_key not in versions:
+            cache.add(version_key, time.time_ns(), timeout=None)
+            versions[version_key] = cache.get(version_key)
+
+    return [versions[version_key] for version_key in version_keys]
+
+
+def get_stats(kind, entity_id, compute, stats_range):
+    cache = caches[STATS_CACHE]
+
+    # Results are stored under the current versions, so bumping a version leaves the old results to expire
+    global_version, version = get_versions([GLOBAL_VERSION, get_version_key(kind, entity_id)])
+    key = f'stats:{kind}:{entity_id}:{global_version}:{version}:{get_range_key(stats_range)}'
+
+    # Warming always recomputes, so that it never keeps statistics that are about to expire for longer
+    if warm_timeout:
+        stats = compute()
+        cache.set(key, stats, timeout=warm_timeout)
+        return stats
+
+    stats = cache.get(key)
+    with counters_lock:
+        counters['hits' if stats is not None else 'misses'] += 1
+
+    if stats is None:
+        stats = compute()
+        cache.set(key, stats, timeout=DEFAULT_TIMEOUT)
+
+    return stats
+
+
+@contextmanager
+def warming(timeout):
+    # Keeping the statistics looked up meanwhile for longer than usual
+    global warm_timeout
+    warm_timeout = timeout
+
+    try:
+        yield
+    finally:
+        warm_timeout = None
+
+
+def get_range_key(stats_range):
+    # Open ranges end now, so they are kept apart by the day they were computed for
+    bounded_range = engine.get_bounded_range(stats_range)
+    start, end = bounded_range['start'], bounded_range['end']
+    end_key = end.isoformat() if stats_range['end'] else end.date().isoformat()
+
+    return f"{start.isoformat()}:{end_key}:{stats_range['bucket']}:{stats_range['split'] or ''}"
+
+
+def bump_versions(kind, entity_ids):
+    cache = caches[STATS_CACHE]
+
+    for entity_id in set(entity_ids):
+        try:
+            cache.incr(get_version_key(kind, entity_id))
+        except ValueError:
+            pass  # Not cached yet, so there is nothing to invalidate
+
+
+def invalidate(kind, entity_ids):
+    # Only after committing, or a concurrent request could cache the old statistics under the new version
+    transaction.on_commit(lambda: bump_versions(kind, entity_ids))
+
+
+def invalidate_all():
+    def bump_global_version():
+        try:
+            caches[STATS_CACHE].incr(GLOBAL_VERSION)
+        except ValueError:
+            pass
+
+    transaction.on_commit(bump_global_version)
+
+
+def get_cache_info():
+    cache_settings = settings.CACHES[STATS_CACHE]
+
+    with counters_lock:
+        hits, misses = counters['hits'], counters['misses']
+
+    return {
+        'backend': cache_settings['BACKEND'],
+        'ttl': cache_settings.get('TIMEOUT'),
+        'max_entries': cache_settings.get('OPTIONS', {}).get('MAX_ENTRIES'),
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / (hits + misses) if hits + misses else None,
+    }
@@ -0,0 +1,448 @@
+from datetime import datetime, timedelta
+
+from django.db.models import Case, CharField, Count, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import ExtractHour, ExtractWeekDay, TruncDate, TruncMonth, TruncWeek
+
+from users.models import AgeBucket, Gender
+from . import hyperloglog
+
+DAYS_PER_YEAR = 365.2425
+ADULT_AGE = 18
+ELDER_AGE = 65
+HOUR = 'hour'
+DAY = 'day'
+WEEK = 'week'
+MONTH = 'month'
+BUCKETS = [HOUR, DAY, WEEK, MONTH]
+SPLITS = {'gender': 'gender_code', 'country': 'country__name', 'age': 'age_bucket'}  # Demographic splits of the heatmap
+WEEKDAYS = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']  # As numbered by SQL
+
+
+def get_age_bucket(date_birth, date):
+    if not date_birth:
+        return AgeBucket.UNKNOWN
+
+    datetime_birth = datetime.combine(date_birth, datetime.min.time())
+    delta = date - datetime_birth
+    delta_years = delta.days / DAYS_PER_YEAR
+
+    if delta_years < ADULT_AGE:
+        return AgeBucket.YOUNG
+    elif delta_years < ELDER_AGE:
+        return AgeBucket.ADULT
+    else:
+        return AgeBucket.ELDER
+
+
+def get_age_bucket_expression(date_birth_field, date_field):
+    # Same buckets as get_age_bucket, where ages are counted in whole days
+    def born_after(years):
+        return {f'{date_birth_field}__gt': F(date_field) - timedelta(days=int(years * DAYS_PER_YEAR) + 1)}
+
+    return Case(When(**{f'{date_birth_field}__isnull': True}, then=Value(AgeBucket.UNKNOWN)),
+                When(**born_after(ADULT_AGE), then=Value(AgeBucket.YOUNG)),
+                When(**born_after(ELDER_AGE), then=Value(AgeBucket.ADULT)),
+                default=Value(AgeBucket.ELDER),
+                output_field=IntegerField())
+
+
+def get_gender_expression(gender_code_field):
+    # Label of the normalized gender, or empty if unknown
+    return Case(*[When(**{gender_code_field: gender}, then=Value(gender.label))
+                  for gender in Gender if gender != Gender.UNKNOWN],
+                default=Value(''),
+                output_field=CharField())
+
+
+def group_redemptions(redemptions, entity_field, date_field):
+    # Counting redemptions by entity and rollup key (see stats.queries.get_rollup_key) in the database
+    return redemptions.values(entity_field,
+                              day=TruncDate(date_field),
+                              hour=ExtractHour(date_field),
+                              gender_code=F('app_user__gender_code'),
+                              country_id=F('app_user__normalized_country'),
+                              age_bucket=get_age_bucket_expression('app_user__date_birth', date_field)) \
+        .annotate(count=Count('pk')).order_by()
+
+
+def get_stats_range(start=None, end=None, bucket=DAY, split=None):
+    return {
+        'start': start,
+        'end': end,
+        'bucket': bucket,
+        'split': split,
+    }
+
+
+def get_bounded_range(stats_range):
+    # Ranges without an end go up to now, and without a start cover the week
+    end = stats_range['end'] or datetime.now()
+    start = stats_range['start'] or datetime.combine(end.date() - timedelta(days=6), datetime.min.time())
+
+    return get_stats_range(start, end, stats_range['bucket'], stats_range['split'])
+
+
+def get_previous_range(stats_range):
+    # The same number of hours right before a bounded range (rollups are kept by the hour)
+    start = stats_range['start'].replace(minute=0, second=0, microsecond=0)
+    end = stats_range['end'].replace(minute=0, second=0, microsecond=0)
+    previous_end = start - timedelta(hours=1)
+
+    return get_stats_range(previous_end - (end - start), previous_end, stats_range['bucket'], stats_range['split'])
+
+
+def filter_rollups(rollups, stats_range):
+    start, end = stats_range['start'], stats_range['end']
+
+    # Rollups are kept by the hour, so that is the finest range
+    if start:
+        rollups = rollups.filter(Q(day__gt=start.date()) | Q(day=start.date(), hour__gte=start.hour))
+    if end:
+        rollups = rollups.filter(Q(day__lt=end.date()) | Q(day=end.date(), hour__lte=end.hour))
+
+    return rollups
+
+
+def get_week(stats_range):
+    # The 7 days up to the end of the range (or today)
+    last_day = (stats_range['end'] or datetime.now()).date()
+
+    return last_day - timedelta(days=6), last_day
+
+
+def filter_range(redemptions, date_field, stats_range):
+    start, end = stats_range['start'], stats_range['end']
+
+    if start:
+        redemptions = redemptions.filter(**{f'{date_field}__gte': start})
+    if end:
+        redemptions = redemptions.filter(**{f'{date_field}__lte': end})
+
+    return redemptions
+
+
+def filter_week(redemptions, date_field, stats_range):
+    first_day, last_day = get_week(stats_range)
+
+    redemptions = redemptions.filter(**{
+        f'{date_field}__gte': datetime.combine(first_day, datetime.min.time()),
+        f'{date_field}__lt': datetime.combine(last_day + timedelta(days=1), datetime.min.time()),
+    })
+
+    return filter_range(redemptions, date_field, stats_range)
+
+
+def get_bucket_fields(bucket):
+    # Annotations and fields that identify a bucket
+    if bucket == HOUR:
+        return {}, ['day', 'hour']
+    elif bucket == WEEK:
+        return {'period': TruncWeek('day')}, ['period']
+    elif bucket == MONTH:
+        return {'period': TruncMonth('day')}, ['period']
+    else:
+        return {}, ['day']
+
+
+def get_bucket_label(group, bucket):
+    if bucket == HOUR:
+        return f"{group['day']:%Y-%m-%d} {group['hour']:02d}:00"
+    elif bucket == WEEK:
+        return f"{group['period']:%Y-%m-%d}"  # Monday of the week
+    elif bucket == MONTH:
+        return f"{group['period']:%Y-%m}"
+    else:
+        return f"{group['day']:%Y-%m-%d}"
+
+
+def get_stats(rollups, redeemed_rewards=0, counts_rewards=False, stats_range=None):
+    stats_range = stats_range or get_stats_range()
+    rollups = filter_rollups(rollups, stats_range)
+
+    stats_week = get_weekly_report(rollups, stats_range, redeemed_rewards, counts_rewards)
+    stats_chart_1 = get_main_chart(rollups, stats_range['bucket'])
+    stats_chart_2 = get_secondary_chart(rollups, stats_range['bucket'])
+
+    return [stats_week, stats_chart_1, stats_chart_2]
+
+
+def get_rollup_groups(rollups, stats_range, *fields):
+    # Rollups grouped in a single query by bucket, hour, weekday of the week and demographics (and any other fields),
+    # so that every chart can be derived from the same groups
+    bucket_annotations, bucket_fields = get_bucket_fields(stats_range['bucket'])
+    first_day, last_day = get_week(stats_range)
+    # Only the days of the week have a weekday, as only those are in the weekly report
+    weekday = Case(When(day__gte=first_day, day__lte=last_day, then=ExtractWeekDay('day')),
+                   output_field=IntegerField())
+    group_fields = bucket_fields if 'hour' in bucket_fields else [*bucket_fields, 'hour']
+
+    return list(filter_rollups(rollups, stats_range).annotate(**bucket_annotations)
+                .values(*group_fields, 'gender_code', 'country__name', 'age_bucket', *fields, weekday=weekday)
+                .annotate(total=Sum('count')).order_by(*group_fields))
+
+
+def get_stats_by_groups(groups, redeemed_rewards=0, counts_rewards=False, stats_range=None):
+    stats_range = stats_range or get_stats_range()
+
+    stats_week = get_weekly_report_by_groups([group for group in groups if group['weekday']], stats_range,
+                                             redeemed_rewards, counts_rewards)
+    stats_chart_1 = get_main_chart_by_groups(groups, stats_range['bucket'])
+    stats_chart_2 = get_secondary_chart_by_groups(groups, stats_range['bucket'])
+
+    return [stats_week, stats_chart_1, stats_chart_2]
+
+
+def get_unique_visitors(sketches, stats_range):
+    start, end = stats_range['start'], stats_range['end']
+    # Visitors are sketched by day, so hours are counted by day
+    bucket = DAY if stats_range['bucket'] == HOUR else stats_range['bucket']
+
+    if start:
+        sketches = sketches.filter(day__gte=start.date())
+    if end:
+        sketches = sketches.filter(day__lte=end.date())
+
+    bucket_annotations, bucket_fields = get_bucket_fields(bucket)
+
+    # Merging the daily sketches of each bucket, and of the whole range
+    registers_by_date = {}
+    for group in sketches.annotate(**bucket_annotations).values(*bucket_fields, 'registers').order_by('day'):
+        date = get_bucket_label(group, bucket)
+        registers = bytes(group['registers'])
+        if date in registers_by_date:
+            registers = hyperloglog.merge(registers_by_date[date], registers)
+        registers_by_date[date] = registers
+
+    unique_visitors = {'Total unique visitors': hyperloglog.count(hyperloglog.merge(*registers_by_date.values()))}
+    for date, registers in registers_by_date.items():
+        unique_visitors[date] = hyperloglog.count(registers)
+
+    return unique_visitors
+
+
+def get_map_stats():
+    return {
+        'General': {},
+        'Young': {},
+        'Adult': {},
+        'Elder': {},
+        'Countries': {},
+    }
+
+
+def get_weekly_report(rollups, stats_range, redeemed_rewards=0, counts_rewards=False):
+    first_day, last_day = get_week(stats_range)
+
+    weekly_groups = rollups.filter(day__gte=first_day, day__lte=last_day) \
+        .values('gender_code', 'country__name', 'age_bucket', weekday=ExtractWeekDay('day')) \
+        .annotate(total=Sum('count')).order_by()
+
+    return get_weekly_report_by_groups(weekly_groups, stats_range, redeemed_rewards, counts_rewards)
+
+
+def get_weekly_report_by_groups(groups, stats_range, redeemed_rewards=0, counts_rewards=False):
+    map_stats = get_map_stats()
+    first_day, _ = get_week(stats_range)
+    first_weekday = first_day.isoweekday() % 7 + 1
+
+    # Reporting the weekdays in the order of the week
+    for group in sorted(groups, key=lambda group: (group['weekday'] - first_weekday) % 7):
+        weekday = WEEKDAYS[group['weekday'] - 1]
+
+        get_all_stats(group, weekday, map_stats)
+
+    return get_weekly_stats(map_stats, redeemed_rewards, counts_rewards)
+
+
+def get_main_chart(rollups, bucket=DAY):
+    bucket_annotations, bucket_fields = get_bucket_fields(bucket)
+
+    groups = rollups.annotate(**bucket_annotations) \
+        .values(*bucket_fields, 'gender_code', 'country__name', 'age_bucket').annotate(total=Sum('count')) \
+        .order_by(*bucket_fields)
+
+    return get_main_chart_by_groups(groups, bucket)
+
+
+def get_main_chart_by_groups(groups, bucket=DAY):
+    map_stats = get_map_stats()
+
+    # Groups come ordered by bucket, so every bucket is charted in order
+    for group in groups:
+        date = get_bucket_label(group, bucket)
+
+        get_all_stats(group, date, map_stats)
+
+    return map_stats
+
+
+def get_secondary_chart(rollups, bucket=DAY):
+    # Hours are already on their own axis, so those are charted by day
+    bucket_annotations, bucket_fields = get_bucket_fields(DAY if bucket == HOUR else bucket)
+
+    groups = rollups.annotate(**bucket_annotations) \
+        .values(*bucket_fields, 'hour').annotate(total=Sum('count')).order_by(*bucket_fields, 'hour')
+
+    return get_secondary_chart_by_groups(groups, bucket)
+
+
+def get_secondary_chart_by_groups(groups, bucket=DAY):
+    map_stats = {}
+    # Hours are already on their own axis, so those are charted by day
+    bucket = DAY if bucket == HOUR else bucket
+
+    # Groups come ordered by bucket and hour, so every bucket is charted in order
+    for group in groups:
+        date = get_bucket_label(group, bucket)
+
+        get_secondary_chart_stats(group, date, map_stats)
+
+    return map_stats
+
+
+def get_heatmap(rollups, stats_range):
+    # Redemptions by weekday and hour over the whole range, optionally split by a demographic
+    heatmap = {'General': get_empty_heatmap()}
+    split = stats_range['split']
+    split_fields = [SPLITS[split]] if split else []
+
+    groups = filter_rollups(rollups, stats_range) \
+        .values('hour', *split_fields, weekday=ExtractWeekDay('day')).annotate(total=Sum('count')).order_by()
+
+    for group in groups:
+        weekday = WEEKDAYS[group['weekday'] - 1]
+        heatmap['General'][weekday][group['hour']] += group['total']
+
+        value = group[SPLITS[split]] if split else None
+        if value:  # Unknown demographics are only counted in general
+            label = get_split_label(split, value)
+            if label not in heatmap:
+                heatmap[label] = get_empty_heatmap()
+            heatmap[label][weekday][group['hour']] += group['total']
+
+    return heatmap
+
+
+def get_empty_heatmap():
+    return {weekday: [0] * 24 for weekday in WEEKDAYS}
+
+
+def get_split_label(split, value):
+    # Rollups keep the codes of the demographics, labelled only when charted
+    if split == 'gender':
+        return Gender(value).label
+    elif split == 'age':
+        return AgeBucket(value).label
+    else:
+        return value
+
+
+def get_all_stats(group, date, map_stats):
+    general = 'General'
+    countries = 'Countries'
+    gender = get_split_label('gender', group['gender_code']) if group['gender_code'] != Gender.UNKNOWN else None
+    country = group['country__name']
+
+    if gender:
+        if gender not in map_stats:
+            map_stats[gender] = {}
+        if date not in map_stats[gender]:
+            map_stats[gender][date] = 0
+        map_stats[gender][date] += group['total']
+
+    if country:
+        if country not in map_stats:
+            map_stats[country] = {}
+            map_stats[countries][country] = 0
+        if date not in map_stats[country]:
+            map_stats[country][date] = 0
+        map_stats[country][date] += group['total']
+        map_stats[countries][country] += group['total']
+
+    if date not in map_stats[general]:
+        map_stats[general][date] = 0
+    map_stats[general][date] += group['total']
+
+    if group['age_bucket'] != AgeBucket.UNKNOWN:
+        age_range = AgeBucket(group['age_bucket']).label
+        if date not in map_stats[age_range]:
+            map_stats[age_range][date] = 0
+        map_stats[age_range][date] += group['total']
+
+
+def get_secondary_chart_stats(group, date, map_stats):
+    total_hour_visitors = 'Total hour visitors'
+    hour = f"{group['hour']:02d}"
+
+    if hour not in map_stats:
+        map_stats[hour] = {}
+    if date not in map_stats[hour]:
+        map_stats[hour][date] = 0
+    if total_hour_visitors not in map_stats[hour]:
+        map_stats[hour][total_hour_visitors] = 0
+    map_stats[hour][date] += group['total']
+    map_stats[hour][total_hour_visitors] += group['total']
+
+
+def get_weekly_stats(map_stats, redeemed_rewards=0, counts_rewards=False):
+    total_visitors = 0
+    young = 'Young'
+    adult = 'Adult'
+    elder = 'Elder'
+    general = 'General'
+    busiest_day = None
+    countries = 'Countries'
+    other_gender = 'Other'
+    female_gender = 'Female'
+    male_gender = 'Male'
+    most_common_country = None
+    stats = {}
+
+    for weekday in map_stats[general]:
+        stats[weekday] = map_stats[general][weekday]
+        total_visitors += map_stats[general][weekday]
+        if not busiest_day or map_stats[general][weekday] > map_stats[general][busiest_day]:
+            busiest_day = weekday
+
+    # Reward statistics count rewards redeemed instead of visitors
+    if counts_rewards:
+        total_visitors, redeemed_rewards = 0, total_visitors
+
+    for country in map_stats[countries]:
+        if not most_common_country or map_stats[countries][country] > map_stats[countries][most_common_country]:
+            most_common_country = country
+
+    number_female_gender = len(map_stats[female_gender]) if female_gender in map_stats else 0
+    number_male_gender = len(map_stats[male_gender]) if male_gender in map_stats else 0
+    number_other_gender = len(map_stats[other_gender]) if other_gender in map_stats else 0
+
+    if number_male_gender > number_female_gender and number_male_gender > number_other_gender:
+        most_common_gender = male_gender
+    elif number_female_gender > number_male_gender and number_female_gender > number_other_gender:
+        most_common_gender = female_gender
+    elif number_other_gender != 0:
+        most_common_gender = other_gender
+    else:
+        most_common_gender = None
+
+    young_visitors = len(map_stats[young])
+    adult_visitors = len(map_stats[adult])
+    elder_visitors = len(map_stats[elder])
+
+    if young_visitors > adult_visitors and young_visitors > elder_visitors:
+        most_common_age_range = young
+    elif adult_visitors > young_visitors and adult_visitors > elder_visitors:
+        most_common_age_range = adult
+    elif elder_visitors != 0:
+        most_common_age_range = elder
+    else:
+        most_common_age_range = None
+
+    stats['Total_visitors'] = total_visitors
+    stats['Busiest_day'] = busiest_day
+    stats['Most_common_age_range'] = most_common_age_range
+    stats['Most_common_country'] = most_common_country
+    stats['Most_common_gender'] = most_common_gender
+    stats['Redeemed_rewards'] = redeemed_rewards
+
+    return stats
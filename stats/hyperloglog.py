@@ -0,0 +1,58 @@
+import hashlib
+import math
+
+# 2^11 registers of one byte each, for a standard error of about 2.3%
+PRECISION = 11
+REGISTERS = 1 << PRECISION
+HASH_BITS = 64
+
+
+def get_empty_registers():
+    return bytes(REGISTERS)
+
+
+def get_register(value):
+    hashed = int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=HASH_BITS // 8).digest(), 'big')
+
+    # The first bits pick the register, which keeps the position of the first 1 in the remaining bits
+    index = hashed >> (HASH_BITS - PRECISION)
+    remaining = hashed & ((1 << (HASH_BITS - PRECISION)) - 1)
+    rank = HASH_BITS - PRECISION - remaining.bit_length() + 1
+
+    return index, rank
+
+
+def get_registers(values):
+    return add(get_empty_registers(), values)
+
+
+def add(registers, values):
+    registers = bytearray(registers)
+
+    for value in values:
+        index, rank = get_register(value)
+        registers[index] = max(registers[index], rank)
+
+    return bytes(registers)
+
+
+def merge(*sketches):
+    registers = get_empty_registers()
+
+    # The union of the sketches keeps the highest rank of each register
+    for sketch in sketches:
+        registers = bytes(map(max, registers, sketch))
+
+    return registers
+
+
+def count(registers):
+    alpha = 0.7213 / (1 + 1.079 / REGISTERS)
+    estimate = alpha * REGISTERS ** 2 / sum(2.0 ** -rank for rank in registers)
+
+    # Linear counting is more accurate while many registers are still empty
+    zeros = registers.count(0)
+    if estimate <= 2.5 * REGISTERS and zeros:
+        estimate = REGISTERS * math.log(REGISTERS / zeros)
+
+    return round(estimate)
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ... import cache, queries
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the statistics rollups and sketches from every redemption ' \
+           '(redemptions made meanwhile may be miscounted)'
+
+    def handle(self, *args, **options):
+
+        # Rebuilding the rollups of the badges redeemed
+        with transaction.atomic():
+            badge_rollups = queries.backfill_badge_rollups()
+
+        self.stdout.write(f'Rebuilt {len(badge_rollups)} badge rollups')
+
+        # Rebuilding the rollups of the rewards redeemed
+        with transaction.atomic():
+            reward_rollups = queries.backfill_reward_rollups()
+
+        self.stdout.write(f'Rebuilt {len(reward_rollups)} reward rollups')
+
+        # Rebuilding the sketches of the visitors of badges and locations
+        with transaction.atomic():
+            badge_sketches, location_sketches = queries.backfill_sketches()
+
+        self.stdout.write(f'Rebuilt {badge_sketches} badge sketches and {location_sketches} location sketches')
+
+        # Invalidating every statistic computed from the previous rollups
+        cache.invalidate_all()
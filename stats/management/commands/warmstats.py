@@ -0,0 +1,89 @@
+import os
+import time
+from multiprocessing import Pool
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils.dateparse import parse_date
+
+from badge_collections import queries as badge_collections_queries
+from badges import queries as badges_queries
+from locations import queries as locations_queries
+from rewards import queries as rewards_queries
+from ... import cache, engine, queries
+
+GET_STATS = {
+    'badge': badges_queries.get_badge_stats,
+    'location': locations_queries.get_location_stats,
+    'collection': badge_collections_queries.get_collection_stats,
+    'reward': rewards_queries.get_reward_stats,
+    'overview': lambda _: queries.get_overview(engine.get_stats_range()),
+}
+WARM_TIMEOUT = 24 * 60 * 60
+
+
+def warm_stats(job):
+    kind, uuid, timeout = job
+    start = time.monotonic()
+
+    try:
+        with cache.warming(timeout):
+            GET_STATS[kind](uuid)
+        error = None
+    except Exception as e:  # Deleted meanwhile, for instance
+        error = e
+
+    return kind, uuid, time.monotonic() - start, error
+
+
+class Command(BaseCommand):
+    help = 'Precomputes the statistics of every approved badge, location, collection and reward into the stats cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=str,
+                            help='Only the ones redeemed since this date (YYYY-MM-DD)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Number of worker processes')
+        parser.add_argument('--timeout', type=int, default=WARM_TIMEOUT,
+                            help='Seconds to keep the statistics cached for (the ones up to now only last the day)')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_date(options['since'])
+            if not since:
+                raise CommandError(f"'{options['since']}' is not a valid date")
+
+        if options['workers'] < 1:
+            raise CommandError("There must be at least one worker")
+
+        # A cache in local memory would only be warmed for the processes of this command
+        if settings.CACHES[cache.STATS_CACHE]['BACKEND'].endswith('LocMemCache'):
+            self.stderr.write('The stats cache is in local memory, so it is not shared with the server processes')
+
+        # Listing the statistics to compute
+        entities = queries.get_stats_entities(since)
+        jobs = [(kind, uuid, options['timeout']) for kind, uuids in entities.items() for uuid in uuids]
+        jobs.append(('overview', None, options['timeout']))
+
+        start = time.monotonic()
+        if options['workers'] == 1:
+            results = map(warm_stats, jobs)
+            self.report(results, len(jobs))
+        else:
+            # Each worker opens its own connection to the database
+            connections.close_all()
+            with Pool(options['workers']) as pool:
+                self.report(pool.imap_unordered(warm_stats, jobs), len(jobs))
+
+        self.stdout.write(f'Warmed {len(jobs)} statistics in {time.monotonic() - start:.1f}s')
+
+    def report(self, results, total):
+        for done, (kind, uuid, seconds, error) in enumerate(results, start=1):
+            entity = f'{kind} {uuid}' if uuid else kind
+
+            if error:
+                self.stderr.write(f'[{done}/{total}] {entity} failed after {seconds:.2f}s: {error}')
+            else:
+                self.stdout.write(f'[{done}/{total}] {entity} in {seconds:.2f}s')
@@ -0,0 +1,51 @@
+# Generated by Django 3.1.2 on 2026-10-18 09:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('badges', '0007_redeemedbadge_unique_redeemed_badge'),
+        ('rewards', '0004_auto_20210106_0920'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RewardRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('gender', models.CharField(default='', max_length=255)),
+                ('country', models.CharField(default='', max_length=255)),
+                ('age_bucket', models.PositiveSmallIntegerField(choices=[(0, 'Unknown'), (1, 'Young'), (2, 'Adult'), (3, 'Elder')], default=0)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('reward', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='rewards.reward')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BadgeRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('hour', models.PositiveSmallIntegerField()),
+                ('gender', models.CharField(default='', max_length=255)),
+                ('country', models.CharField(default='', max_length=255)),
+                ('age_bucket', models.PositiveSmallIntegerField(choices=[(0, 'Unknown'), (1, 'Young'), (2, 'Adult'), (3, 'Elder')], default=0)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('badge', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='badges.badge')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='rewardrollup',
+            constraint=models.UniqueConstraint(fields=('reward', 'day', 'hour', 'gender', 'country', 'age_bucket'), name='unique_reward_rollup'),
+        ),
+        migrations.AddConstraint(
+            model_name='badgerollup',
+            constraint=models.UniqueConstraint(fields=('badge', 'day', 'hour', 'gender', 'country', 'age_bucket'), name='unique_badge_rollup'),
+        ),
+    ]
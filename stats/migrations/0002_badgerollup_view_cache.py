@@ -0,0 +1,17 @@
+# Generated by Django 3.1.2 on 2026-10-18 09:57
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='badgerollup',
+            options={'permissions': (('view_cache', 'Can view usage of the statistics cache'),)},
+        ),
+    ]
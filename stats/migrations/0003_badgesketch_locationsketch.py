@@ -0,0 +1,42 @@
+# Generated by Django 3.1.2 on 2026-10-18 10:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0005_auto_20210106_0920'),
+        ('badges', '0008_redeemedbadge_badge_time_redeemed_index'),
+        ('stats', '0002_badgerollup_view_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocationSketch',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('registers', models.BinaryField()),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='locations.location')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BadgeSketch',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('registers', models.BinaryField()),
+                ('badge', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='badges.badge')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='locationsketch',
+            constraint=models.UniqueConstraint(fields=('location', 'day'), name='unique_location_sketch'),
+        ),
+        migrations.AddConstraint(
+            model_name='badgesketch',
+            constraint=models.UniqueConstraint(fields=('badge', 'day'), name='unique_badge_sketch'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.1.2 on 2026-10-18 10:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats', '0003_badgesketch_locationsketch'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='badgerollup',
+            options={'permissions': (('view_cache', 'Can view usage of the statistics cache'), ('view_overview', 'Can view statistics of the whole platform'))},
+        ),
+    ]
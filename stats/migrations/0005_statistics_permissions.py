@@ -0,0 +1,51 @@
+# Generated by Django 3.1.2 on 2026-10-18 10:36
+
+from django.db import migrations, models
+
+PERMISSIONS = ['view_cache', 'view_overview']
+
+
+def move_permissions(apps, old_model, new_model):
+    # Moving the permissions (with the groups and users that have them) instead of creating them again
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    Permission = apps.get_model('auth', 'Permission')
+
+    content_type, _ = ContentType.objects.get_or_create(app_label='stats', model=new_model)
+    Permission.objects.filter(content_type__app_label='stats', content_type__model=old_model,
+                              codename__in=PERMISSIONS).update(content_type=content_type)
+
+
+def move_permissions_to_statistics(apps, schema_editor):
+    move_permissions(apps, 'badgerollup', 'statistics')
+
+
+def move_permissions_to_badge_rollup(apps, schema_editor):
+    move_permissions(apps, 'statistics', 'badgerollup')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('stats', '0004_badgerollup_view_overview'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Statistics',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+            ],
+            options={
+                'permissions': (('view_cache', 'Can view usage of the statistics cache'), ('view_overview', 'Can view statistics of the whole platform')),
+                'managed': False,
+                'default_permissions': (),
+            },
+        ),
+        migrations.AlterModelOptions(
+            name='badgerollup',
+            options={},
+        ),
+        migrations.RunPython(move_permissions_to_statistics, move_permissions_to_badge_rollup),
+    ]
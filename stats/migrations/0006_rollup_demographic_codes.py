@@ -0,0 +1,55 @@
+# Generated by Django 3.1.2 on 2026-10-18 11:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_appuser_demographics'),
+        ('stats', '0005_statistics_permissions'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='badgerollup',
+            name='unique_badge_rollup',
+        ),
+        migrations.RemoveConstraint(
+            model_name='rewardrollup',
+            name='unique_reward_rollup',
+        ),
+        migrations.RenameField(
+            model_name='badgerollup',
+            old_name='country',
+            new_name='country_name',
+        ),
+        migrations.RenameField(
+            model_name='rewardrollup',
+            old_name='country',
+            new_name='country_name',
+        ),
+        migrations.AddField(
+            model_name='badgerollup',
+            name='gender_code',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Unknown'), (1, 'Male'), (2, 'Female'), (3, 'Other')],
+                                                   default=0),
+        ),
+        migrations.AddField(
+            model_name='rewardrollup',
+            name='gender_code',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Unknown'), (1, 'Male'), (2, 'Female'), (3, 'Other')],
+                                                   default=0),
+        ),
+        migrations.AddField(
+            model_name='badgerollup',
+            name='country',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='users.country'),
+        ),
+        migrations.AddField(
+            model_name='rewardrollup',
+            name='country',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='users.country'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 3.1.2 on 2026-10-18 11:02
+
+from django.db import migrations
+
+ROLLUP_MODELS = ['BadgeRollup', 'RewardRollup']
+GENDER_CODES = {'Male': 1, 'Female': 2, 'Other': 3}  # As in users.models.Gender (unknown is 0)
+
+
+def store_codes(apps, schema_editor):
+    Country = apps.get_model('users', 'Country')
+
+    for model_name in ROLLUP_MODELS:
+        rollup_model = apps.get_model('stats', model_name)
+
+        for gender, gender_code in GENDER_CODES.items():
+            rollup_model.objects.filter(gender=gender).update(gender_code=gender_code)
+
+        # Rollups kept the names of the normalized countries, keyed without case or extra whitespace
+        for name in rollup_model.objects.exclude(country_name='').values_list('country_name', flat=True).distinct():
+            key = ' '.join(name.split()).casefold()
+            country, _ = Country.objects.get_or_create(key=key, defaults={'name': name})
+            rollup_model.objects.filter(country_name=name).update(country=country)
+
+
+def store_labels(apps, schema_editor):
+    Country = apps.get_model('users', 'Country')
+
+    for model_name in ROLLUP_MODELS:
+        rollup_model = apps.get_model('stats', model_name)
+
+        for gender, gender_code in GENDER_CODES.items():
+            rollup_model.objects.filter(gender_code=gender_code).update(gender=gender)
+
+        for country in Country.objects.filter(id__in=rollup_model.objects.values('country')):
+            rollup_model.objects.filter(country=country).update(country_name=country.name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats', '0006_rollup_demographic_codes'),
+    ]
+
+    operations = [
+        migrations.RunPython(store_codes, store_labels),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 3.1.2 on 2026-10-18 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Apart from 0007, as Postgres can't alter the rollups in the same transaction that updated them
+
+    dependencies = [
+        ('stats', '0007_rollup_demographic_codes_data'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='badgerollup',
+            name='gender',
+        ),
+        migrations.RemoveField(
+            model_name='rewardrollup',
+            name='gender',
+        ),
+        migrations.RemoveField(
+            model_name='badgerollup',
+            name='country_name',
+        ),
+        migrations.RemoveField(
+            model_name='rewardrollup',
+            name='country_name',
+        ),
+        migrations.AddConstraint(
+            model_name='badgerollup',
+            constraint=models.UniqueConstraint(fields=('badge', 'day', 'hour', 'gender_code', 'country', 'age_bucket'),
+                                               name='unique_badge_rollup'),
+        ),
+        migrations.AddConstraint(
+            model_name='badgerollup',
+            constraint=models.UniqueConstraint(condition=models.Q(country__isnull=True),
+                                               fields=('badge', 'day', 'hour', 'gender_code', 'age_bucket'),
+                                               name='unique_badge_rollup_without_country'),
+        ),
+        migrations.AddConstraint(
+            model_name='rewardrollup',
+            constraint=models.UniqueConstraint(fields=('reward', 'day', 'hour', 'gender_code', 'country', 'age_bucket'),
+                                               name='unique_reward_rollup'),
+        ),
+        migrations.AddConstraint(
+            model_name='rewardrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(country__isnull=True),
+                                               fields=('reward', 'day', 'hour', 'gender_code', 'age_bucket'),
+                                               name='unique_reward_rollup_without_country'),
+        ),
+    ]
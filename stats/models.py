@@ -0,0 +1,84 @@
+from django.db import models
+
+from badges.models import Badge
+from locations.models import Location
+from rewards.models import Reward
+from users.models import AgeBucket, Country, Gender
+
+
+class Statistics(models.Model):
+    # No table, only the permissions over the statistics of the whole platform
+
+    class Meta:
+        managed = False
+        default_permissions = ()
+        permissions = (
+            ('view_cache', 'Can view usage of the statistics cache'),
+            ('view_overview', 'Can view statistics of the whole platform'),
+        )
+
+
+class RedemptionRollup(models.Model):
+    day = models.DateField()
+    hour = models.PositiveSmallIntegerField()
+    gender_code = models.PositiveSmallIntegerField(choices=Gender.choices, default=Gender.UNKNOWN)
+    country = models.ForeignKey(Country, null=True, on_delete=models.PROTECT)  # Null if unknown
+    age_bucket = models.PositiveSmallIntegerField(choices=AgeBucket.choices, default=AgeBucket.UNKNOWN)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class BadgeRollup(RedemptionRollup):
+    badge = models.ForeignKey(Badge, on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['badge', 'day', 'hour', 'gender_code', 'country', 'age_bucket'],
+                                    name='unique_badge_rollup'),
+            # Nulls are never equal in the one above, so unknown countries need their own
+            models.UniqueConstraint(fields=['badge', 'day', 'hour', 'gender_code', 'age_bucket'],
+                                    condition=models.Q(country__isnull=True),
+                                    name='unique_badge_rollup_without_country'),
+        ]
+
+
+class RewardRollup(RedemptionRollup):
+    reward = models.ForeignKey(Reward, on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['reward', 'day', 'hour', 'gender_code', 'country', 'age_bucket'],
+                                    name='unique_reward_rollup'),
+            # Nulls are never equal in the one above, so unknown countries need their own
+            models.UniqueConstraint(fields=['reward', 'day', 'hour', 'gender_code', 'age_bucket'],
+                                    condition=models.Q(country__isnull=True),
+                                    name='unique_reward_rollup_without_country'),
+        ]
+
+
+class VisitorSketch(models.Model):
+    day = models.DateField()
+    registers = models.BinaryField()  # HyperLogLog registers of the app users that visited (see stats.hyperloglog)
+
+    class Meta:
+        abstract = True
+
+
+class BadgeSketch(VisitorSketch):
+    badge = models.ForeignKey(Badge, on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['badge', 'day'], name='unique_badge_sketch'),
+        ]
+
+
+class LocationSketch(VisitorSketch):
+    location = models.ForeignKey(Location, on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['location', 'day'], name='unique_location_sketch'),
+        ]
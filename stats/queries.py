@@ -0,0 +1,338 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDate
+
+from badge_collections.models import Collection, CollectionBadge
+from badge_collections.models import Status as CollectionStatus
+from badges.models import Badge, RedeemedBadge
+from badges.models import Status as BadgeStatus
+from locations.models import Location
+from locations.models import Status as LocationStatus
+from rewards.models import RedeemedReward, Reward
+from rewards.models import Status as RewardStatus
+from users.models import AgeBucket
+from . import cache, engine, hyperloglog
+from .models import BadgeRollup, BadgeSketch, LocationSketch, RewardRollup
+
+ROLLUP_BATCH_SIZE = 1000
+EXPORT_CHUNK_SIZE = 2000
+OVERVIEW_LIMIT = 10
+OVERVIEW_MAX_LIMIT = 100  # Rankings are cached at this size, and cut to the limit requested
+OVERVIEW_ID = 'platform'
+# Columns of the exports, in order
+BADGE_EXPORT_FIELDS = ['redeemed_at', 'badge_uuid', 'badge_name', 'location_uuid', 'location_name',
+                       'gender', 'country', 'age_range']
+REWARD_EXPORT_FIELDS = ['awarded_at', 'reward_uuid', 'reward_name', 'location_uuid', 'location_name',
+                        'redeemed_reward', 'gender', 'country', 'age_range']
+
+
+def get_rollup_key(app_user, date):
+    # Every redemption is counted in the hour it happened, along with the demographics of the user at that time
+    return {
+        'day': date.date(),
+        'hour': date.hour,
+        'gender_code': app_user.gender_code,
+        'country_id': app_user.normalized_country_id,
+        'age_bucket': engine.get_age_bucket(app_user.date_birth, date),
+    }
+
+
+def record_badge_redemptions(redeemed_badges):
+    if not redeemed_badges:
+        return
+
+    # Grouping the badges redeemed by rollup key (badges redeemed in the same tap share the key)
+    badges_by_key = {}
+    for redeemed_badge in redeemed_badges:
+        key = get_rollup_key(redeemed_badge.app_user, redeemed_badge.time_redeemed)
+        badges_by_key.setdefault(tuple(key.items()), []).append(redeemed_badge.badge_id)
+
+    for key, badge_ids in badges_by_key.items():
+        increment_rollups(BadgeRollup, 'badge', badge_ids, dict(key))
+
+    record_visitors(redeemed_badges)
+
+    # Invalidating the statistics of the badges, their locations and their collections
+    badge_ids = [redeemed_badge.badge_id for redeemed_badge in redeemed_badges]
+    cache.invalidate('badge', badge_ids)
+    cache.invalidate('location', [redeemed_badge.badge.location_id for redeemed_badge in redeemed_badges])
+    cache.invalidate('collection', list(CollectionBadge.objects.filter(badge__in=badge_ids)
+                                        .values_list('collection', flat=True)))
+    cache.invalidate('overview', [OVERVIEW_ID])
+
+
+def record_reward_redemption(redeemed_reward):
+    key = get_rollup_key(redeemed_reward.app_user, redeemed_reward.time_awarded)
+    increment_rollups(RewardRollup, 'reward', [redeemed_reward.reward_id], key)
+
+    cache.invalidate('reward', [redeemed_reward.reward_id])
+    cache.invalidate('overview', [OVERVIEW_ID])
+
+
+def increment_rollups(rollup_model, entity_field, entity_ids, key):
+    entity_id_field = f'{entity_field}_id'
+
+    # Incrementing the rollups that already exist
+    existing_ids = set(rollup_model.objects.filter(**{f'{entity_id_field}__in': entity_ids}, **key)
+                       .values_list(entity_id_field, flat=True))
+    if existing_ids:
+        rollup_model.objects.filter(**{f'{entity_id_field}__in': existing_ids}, **key) \
+            .update(count=F('count') + 1)
+
+    # Creating the missing ones
+    missing_ids = [entity_id for entity_id in entity_ids if entity_id not in existing_ids]
+    if not missing_ids:
+        return
+
+    try:
+        with transaction.atomic():
+            rollup_model.objects.bulk_create([rollup_model(**{entity_id_field: entity_id}, **key, count=1)
+                                              for entity_id in missing_ids])
+    except IntegrityError:
+        # Some were created concurrently, so falling back to one upsert per rollup
+        for entity_id in missing_ids:
+            increment_rollup(rollup_model, {entity_id_field: entity_id, **key})
+
+
+def increment_rollup(rollup_model, key):
+    if rollup_model.objects.filter(**key).update(count=F('count') + 1):
+        return
+
+    try:
+        with transaction.atomic():
+            rollup_model.objects.create(**key, count=1)
+    except IntegrityError:
+        rollup_model.objects.filter(**key).update(count=F('count') + 1)
+
+
+def record_visitors(redeemed_badges):
+    # Grouping the app users by the badges and locations they visited each day
+    badge_visitors = {}
+    location_visitors = {}
+    for redeemed_badge in redeemed_badges:
+        day = redeemed_badge.time_redeemed.date()
+        badge_visitors.setdefault((redeemed_badge.badge_id, day), set()).add(redeemed_badge.app_user_id)
+        location_visitors.setdefault((redeemed_badge.badge.location_id, day), set()).add(redeemed_badge.app_user_id)
+
+    # Only after committing, so that the sketches aren't locked for the rest of the redemption
+    transaction.on_commit(lambda: add_visitors(BadgeSketch, 'badge', badge_visitors))
+    transaction.on_commit(lambda: add_visitors(LocationSketch, 'location', location_visitors))
+
+
+def add_visitors(sketch_model, entity_field, visitors_by_key):
+    entity_id_field = f'{entity_field}_id'
+    entity_ids = {entity_id for entity_id, _ in visitors_by_key}
+    days = {day for _, day in visitors_by_key}
+
+    sketches = sketch_model.objects.filter(**{f'{entity_id_field}__in': entity_ids}, day__in=days)
+    sketches_by_key = {(getattr(sketch, entity_id_field), sketch.day): sketch for sketch in sketches}
+
+    # Updating the sketches that already exist, unless they were updated concurrently since they were read
+    for key, sketch in sketches_by_key.items():
+        if key not in visitors_by_key:
+            continue
+
+        registers = hyperloglog.add(sketch.registers, visitors_by_key[key])
+        if registers == bytes(sketch.registers):  # Unchanged if every app user was already counted
+            continue
+        if not sketch_model.objects.filter(id=sketch.id, registers=bytes(sketch.registers)).update(registers=registers):
+            add_visitor_sketch(sketch_model, {'id': sketch.id}, visitors_by_key[key])
+
+    # Creating the missing ones
+    missing_keys = [key for key in visitors_by_key if key not in sketches_by_key]
+    if not missing_keys:
+        return
+
+    try:
+        with transaction.atomic():
+            sketch_model.objects.bulk_create([
+                sketch_model(**{entity_id_field: entity_id}, day=day,
+                             registers=hyperloglog.get_registers(visitors_by_key[entity_id, day]))
+                for entity_id, day in missing_keys])
+    except IntegrityError:
+        # Some were created concurrently, so falling back to one update per sketch
+        for entity_id, day in missing_keys:
+            add_visitor_sketch(sketch_model, {entity_id_field: entity_id, 'day': day}, visitors_by_key[entity_id, day])
+
+
+def add_visitor_sketch(sketch_model, key, visitors):
+    with transaction.atomic():
+        sketch, created = sketch_model.objects.select_for_update().get_or_create(
+            **key, defaults={'registers': hyperloglog.get_registers(visitors)})
+
+        if not created:
+            sketch.registers = hyperloglog.add(sketch.registers, visitors)
+            sketch.save(update_fields=['registers'])
+
+
+def backfill_badge_rollups():
+    return backfill_rollups(BadgeRollup, 'badge', RedeemedBadge.objects.all(), 'time_redeemed')
+
+
+def backfill_reward_rollups():
+    return backfill_rollups(RewardRollup, 'reward', RedeemedReward.objects.filter(redeemed=True), 'time_awarded')
+
+
+def backfill_rollups(rollup_model, entity_field, redemptions, date_field):
+    entity_id_field = f'{entity_field}_id'
+
+    # Counting every redemption by entity and rollup key
+    groups = engine.group_redemptions(redemptions, entity_field, date_field)
+
+    # Replacing the previous rollups
+    rollup_model.objects.all().delete()
+    return rollup_model.objects.bulk_create([
+        rollup_model(**{entity_id_field: group.pop(entity_field)}, **group)
+        for group in groups.iterator(chunk_size=ROLLUP_BATCH_SIZE)], batch_size=ROLLUP_BATCH_SIZE)
+
+
+def backfill_sketches():
+    # Replacing the previous sketches
+    BadgeSketch.objects.all().delete()
+    LocationSketch.objects.all().delete()
+
+    visits = RedeemedBadge.objects.annotate(day=TruncDate('time_redeemed')) \
+        .values_list('day', 'badge', 'badge__location', 'app_user').order_by('day')
+
+    # Building the sketches of one day at a time
+    badge_sketches = 0
+    location_sketches = 0
+    current_day = None
+    badge_visitors = {}
+    location_visitors = {}
+    for day, badge_id, location_id, app_user_id in visits.iterator(chunk_size=ROLLUP_BATCH_SIZE):
+        if day != current_day:
+            badge_sketches += create_sketches(BadgeSketch, 'badge', current_day, badge_visitors)
+            location_sketches += create_sketches(LocationSketch, 'location', current_day, location_visitors)
+            current_day, badge_visitors, location_visitors = day, {}, {}
+
+        badge_visitors.setdefault(badge_id, set()).add(app_user_id)
+        location_visitors.setdefault(location_id, set()).add(app_user_id)
+
+    badge_sketches += create_sketches(BadgeSketch, 'badge', current_day, badge_visitors)
+    location_sketches += create_sketches(LocationSketch, 'location', current_day, location_visitors)
+
+    return badge_sketches, location_sketches
+
+
+def create_sketches(sketch_model, entity_field, day, visitors_by_entity):
+    return len(sketch_model.objects.bulk_create([
+        sketch_model(**{f'{entity_field}_id': entity_id}, day=day,
+                     registers=hyperloglog.get_registers(visitors))
+        for entity_id, visitors in visitors_by_entity.items()], batch_size=ROLLUP_BATCH_SIZE))
+
+
+def get_badge_redemptions(redeemed_badges, stats_range):
+    # Every badge redeemed, with the demographics of the user at that time
+    return engine.filter_range(redeemed_badges, 'time_redeemed', stats_range) \
+        .order_by('time_redeemed', 'id') \
+        .annotate(redeemed_at=F('time_redeemed'),
+                  badge_uuid=F('badge__uuid'),
+                  badge_name=F('badge__name'),
+                  location_uuid=F('badge__location__uuid'),
+                  location_name=F('badge__location__name'),
+                  gender=engine.get_gender_expression('app_user__gender_code'),
+                  country=F('app_user__normalized_country__name'),
+                  age_range=engine.get_age_bucket_expression('app_user__date_birth', 'time_redeemed')) \
+        .values(*BADGE_EXPORT_FIELDS)
+
+
+def get_reward_redemptions(redeemed_rewards, stats_range):
+    # Every reward awarded, with the demographics of the user at that time
+    return engine.filter_range(redeemed_rewards, 'time_awarded', stats_range) \
+        .order_by('time_awarded', 'reward_code') \
+        .annotate(awarded_at=F('time_awarded'),
+                  reward_uuid=F('reward__uuid'),
+                  reward_name=F('reward__name'),
+                  location_uuid=F('reward__location__uuid'),
+                  location_name=F('reward__location__name'),
+                  redeemed_reward=F('redeemed'),
+                  gender=engine.get_gender_expression('app_user__gender_code'),
+                  country=F('app_user__normalized_country__name'),
+                  age_range=engine.get_age_bucket_expression('app_user__date_birth', 'time_awarded')) \
+        .values(*REWARD_EXPORT_FIELDS)
+
+
+def iterate_redemptions(redemptions):
+    # Streaming the rows from a server-side cursor
+    for redemption in redemptions.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        age_bucket = redemption['age_range']
+        redemption['age_range'] = AgeBucket(age_bucket).label if age_bucket != AgeBucket.UNKNOWN else None
+        redemption['gender'] = redemption['gender'] or None
+        yield redemption
+
+
+def get_overview(stats_range, limit=OVERVIEW_LIMIT):
+    def compute():
+        current_range = engine.get_bounded_range(stats_range)
+        previous_range = engine.get_previous_range(current_range)
+
+        badge_rollups = engine.filter_rollups(BadgeRollup.objects.all(), current_range)
+        previous_badge_rollups = engine.filter_rollups(BadgeRollup.objects.all(), previous_range)
+        reward_rollups = engine.filter_rollups(RewardRollup.objects.all(), current_range)
+        previous_reward_rollups = engine.filter_rollups(RewardRollup.objects.all(), previous_range)
+
+        return {
+            'from': current_range['start'],
+            'to': current_range['end'],
+            'totals': {
+                'badges': get_growth(get_total(badge_rollups), get_total(previous_badge_rollups)),
+                'rewards': get_growth(get_total(reward_rollups), get_total(previous_reward_rollups)),
+            },
+            'top_locations': get_top(badge_rollups, previous_badge_rollups, 'badge__location'),
+            'top_badges': get_top(badge_rollups, previous_badge_rollups, 'badge'),
+            'top_collections': get_top(badge_rollups, previous_badge_rollups, 'badge__collectionbadge__collection'),
+            'top_rewards': get_top(reward_rollups, previous_reward_rollups, 'reward'),
+        }
+
+    overview = cache.get_stats('overview', OVERVIEW_ID, compute, stats_range)
+
+    return {key: value[:limit] if key.startswith('top_') else value for key, value in overview.items()}
+
+
+def get_total(rollups):
+    return rollups.aggregate(total=Sum('count'))['total'] or 0
+
+
+def get_top(rollups, previous_rollups, entity_field):
+    # Ranking the entities by redemptions in the database
+    top = list(rollups.filter(**{f'{entity_field}__isnull': False})
+               .values(uuid=F(f'{entity_field}__uuid'), name=F(f'{entity_field}__name'))
+               .annotate(total=Sum('count')).order_by('-total', 'name')[:OVERVIEW_MAX_LIMIT])
+
+    # Counting the previous redemptions of the ranked ones only
+    previous_totals = dict(previous_rollups.filter(**{f'{entity_field}__uuid__in': [entity['uuid'] for entity in top]})
+                           .values_list(f'{entity_field}__uuid').annotate(total=Sum('count')).order_by())
+
+    return [{'uuid': entity['uuid'], 'name': entity['name'],
+             **get_growth(entity['total'], previous_totals.get(entity['uuid'], 0))} for entity in top]
+
+
+def get_growth(redemptions, previous_redemptions):
+    return {
+        'redemptions': redemptions,
+        'previous_redemptions': previous_redemptions,
+        'growth': (redemptions - previous_redemptions) / previous_redemptions if previous_redemptions else None,
+    }
+
+
+def get_stats_entities(since=None):
+    badges = Badge.objects.filter(status=BadgeStatus.APPROVED)
+    locations = Location.objects.filter(status=LocationStatus.APPROVED)
+    collections = Collection.objects.filter(status=CollectionStatus.APPROVED)
+    rewards = Reward.objects.filter(status=RewardStatus.APPROVED)
+
+    # Only the ones redeemed since then (the statistics of the others did not change)
+    if since:
+        badge_rollups = BadgeRollup.objects.filter(day__gte=since)
+        badges = badges.filter(id__in=badge_rollups.values('badge'))
+        locations = locations.filter(id__in=badge_rollups.values('badge__location'))
+        collections = collections.filter(id__in=badge_rollups.values('badge__collectionbadge__collection'))
+        rewards = rewards.filter(id__in=RewardRollup.objects.filter(day__gte=since).values('reward'))
+
+    return {
+        'badge': list(badges.values_list('uuid', flat=True)),
+        'location': list(locations.values_list('uuid', flat=True)),
+        'collection': list(collections.values_list('uuid', flat=True)),
+        'reward': list(rewards.values_list('uuid', flat=True)),
+    }
@@ -0,0 +1,308 @@
+import gzip
+import json
+from datetime import date, datetime, timedelta
+from io import StringIO
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+
+from badge_collections import queries as badge_collections_queries
+from badge_collections.models import Collection, CollectionBadge
+from badges import queries as badges_queries
+from badges.models import Badge, RedeemedBadge, Status
+from locations import queries as locations_queries
+from locations.tests import create_locations
+from users import queries as users_queries
+from users.models import User, AppUser, AgeBucket, Country, Gender
+from . import cache, engine, hyperloglog, queries, utils
+from .models import BadgeRollup, LocationSketch
+
+
+class StatsTestCase(TestCase):
+
+    def test_age_bucket(self):
+        """
+        Test: Get the age bucket of a user at the time of a redemption
+        """
+        redeemed = datetime(2021, 1, 1, 12)
+
+        self.assertEqual(engine.get_age_bucket(None, redeemed), AgeBucket.UNKNOWN)
+        self.assertEqual(engine.get_age_bucket(date(2010, 1, 1), redeemed), AgeBucket.YOUNG)
+        self.assertEqual(engine.get_age_bucket(date(1990, 1, 1), redeemed), AgeBucket.ADULT)
+        self.assertEqual(engine.get_age_bucket(date(1950, 1, 1), redeemed), AgeBucket.ELDER)
+
+    def test_age_bucket_expression(self):
+        """
+        Test: Get the same age buckets in the database around the age thresholds
+        """
+        _, promoter, [location] = create_locations()
+        badge = Badge.objects.create(name="Badge", description="Badge", location=location, promoter=promoter)
+        redeemed = datetime(2021, 1, 1, 12)
+
+        # Redeeming the badge with users born a few days around each threshold
+        for age in [engine.ADULT_AGE, engine.ELDER_AGE]:
+            threshold = (redeemed - timedelta(days=int(age * engine.DAYS_PER_YEAR))).date()
+            for days in range(-2, 3):
+                date_birth = threshold + timedelta(days=days)
+                apper = AppUser.objects.create(email=f"apper{age}{days}@test.com", user=User.objects.create_user(),
+                                               date_birth=date_birth)
+                redeemed_badge = RedeemedBadge.objects.create(app_user=apper, badge=badge)
+                RedeemedBadge.objects.filter(id=redeemed_badge.id).update(time_redeemed=redeemed)
+
+                # Asserting that the database and python agree on the bucket
+                group = engine.group_redemptions(RedeemedBadge.objects.filter(id=redeemed_badge.id),
+                                                 'badge', 'time_redeemed').get()
+                self.assertEqual(group['age_bucket'], engine.get_age_bucket(date_birth, redeemed))
+
+    def test_stats_range(self):
+        """
+        Test: Decode the date range and granularity of the statistics
+        """
+        stats_range = utils.decode_stats_range_from_query({'from': '2021-01-01', 'to': '2021-01-31T12:00:00',
+                                                           'bucket': 'week'})
+        self.assertEqual(stats_range, engine.get_stats_range(datetime(2021, 1, 1), datetime(2021, 1, 31, 12),
+                                                             engine.WEEK))
+
+        # Asserting that invalid dates, ranges and buckets are refused
+        for query in [{'from': '2021-02-30'}, {'from': '2021-02-01', 'to': '2021-01-01'}, {'bucket': 'year'},
+                      {'split': 'height'}]:
+            with self.assertRaises(utils.InvalidStatsRange):
+                utils.decode_stats_range_from_query(query)
+
+    def test_export_encoding(self):
+        """
+        Test: Encode redemptions as NDJSON or CSV in chunks and compress them with gzip
+        """
+        redemptions = [{'redeemed_at': datetime(2021, 1, 1, 12), 'badge_name': f"Badge {i}", 'age_range': None}
+                       for i in range(5)]
+
+        # Asserting that the rows are sent in chunks
+        fields = ['redeemed_at', 'badge_name', 'age_range']
+        chunks = list(utils.encode_redemptions_to_ndjson(iter(redemptions), fields, 2))
+        self.assertEqual(len(chunks), 3)
+        lines = b''.join(chunks).decode().splitlines()
+        self.assertEqual(json.loads(lines[0]), {'redeemed_at': '2021-01-01T12:00:00', 'badge_name': "Badge 0",
+                                                'age_range': None})
+
+        # Asserting that the CSV starts with a header
+        csv = b''.join(utils.encode_redemptions_to_csv(iter(redemptions), fields, 2)).decode().splitlines()
+        self.assertEqual(csv[0], 'redeemed_at,badge_name,age_range')
+        self.assertEqual(csv[1], '2021-01-01 12:00:00,Badge 0,')
+        self.assertEqual(len(csv), len(redemptions) + 1)
+        self.assertEqual(b''.join(utils.encode_redemptions_to_csv(iter([]), fields, 2)).decode().splitlines(),
+                         ['redeemed_at,badge_name,age_range'])
+
+        # Asserting that gzip is only sent to the clients that accept it
+        self.assertTrue(utils.accepts_gzip('gzip, deflate, br'))
+        self.assertTrue(utils.accepts_gzip('deflate;q=1.0, *;q=0.5'))
+        self.assertFalse(utils.accepts_gzip('gzip;q=0, deflate'))
+        self.assertFalse(utils.accepts_gzip('x-gzip'))
+        self.assertFalse(utils.accepts_gzip(''))
+
+        # Asserting that the compressed chunks make up the same content
+        self.assertEqual(gzip.decompress(b''.join(utils.compress_to_gzip(iter(chunks)))), b''.join(chunks))
+
+    def test_hyperloglog(self):
+        """
+        Test: Estimate the number of distinct values in merged HyperLogLog sketches
+        """
+        first = hyperloglog.get_registers(range(0, 6000))
+        second = hyperloglog.get_registers(range(3000, 9000))
+
+        # Asserting that small counts are exact and large ones are within the expected error
+        self.assertEqual(hyperloglog.count(hyperloglog.get_empty_registers()), 0)
+        self.assertEqual(hyperloglog.count(hyperloglog.get_registers(["apper", "apper"])), 1)
+        self.assertAlmostEqual(hyperloglog.count(first), 6000, delta=6000 * 0.05)
+        self.assertAlmostEqual(hyperloglog.count(hyperloglog.merge(first, second)), 9000, delta=9000 * 0.05)
+
+    def test_badge_rollups(self):
+        """
+        Test: Count badge redemptions in the rollups and rebuild them from every redemption
+        """
+        _, promoter, [location] = create_locations()
+        badges = [Badge.objects.create(name=f"Badge {i}", description="Badge", location=location,
+                                       promoter=promoter, status=Status.APPROVED) for i in range(3)]
+
+        # Entering the same demographics in different ways
+        appers = [AppUser(email=f"apper{i}@test.com", user=User.objects.create_user(),
+                          gender=gender, country=country, date_birth=date(1990, 1, 1))
+                  for i, (gender, country) in enumerate([("Female", "Portugal"), (" female", "portugal ")])]
+        for apper in appers:
+            users_queries.update_demographics(apper)
+            apper.save()
+        self.assertEqual(Country.objects.count(), 1)
+
+        # Redeeming every badge of the location with every app user
+        for apper in appers:
+            badges_queries.redeem_badges_by_location(location.id, apper.user_id)
+
+        # Asserting that users with the same demographics share the rollup of each badge
+        rollups = BadgeRollup.objects.all()
+        self.assertEqual(len(rollups), len(badges))
+        for rollup in rollups:
+            self.assertEqual((rollup.gender_code, rollup.country.name, rollup.age_bucket, rollup.count),
+                             (Gender.FEMALE, "Portugal", AgeBucket.ADULT, len(appers)))
+
+        # Asserting that the backfill rebuilds the same rollups
+        rollup_fields = ['badge', 'day', 'hour', 'gender_code', 'country', 'age_bucket', 'count']
+        incremental_rollups = sorted(rollups.values_list(*rollup_fields))
+        queries.backfill_badge_rollups()
+        self.assertEqual(sorted(BadgeRollup.objects.values_list(*rollup_fields)), incremental_rollups)
+
+        # Asserting that the redemptions are counted in the weekday and hour they happened, by gender
+        redeemed = RedeemedBadge.objects.filter(badge=badges[0]).first().time_redeemed
+        weekday = engine.WEEKDAYS[redeemed.isoweekday() % 7]
+        heatmap = badges_queries.get_badge_stats(badges[0].uuid, engine.get_stats_range(split='gender'))[-1]
+        self.assertEqual(list(heatmap), ['General', "Female"])
+        self.assertEqual(heatmap['General'][weekday][redeemed.hour], len(appers))
+        self.assertEqual(heatmap["Female"][weekday][redeemed.hour], len(appers))
+        self.assertEqual(sum(map(sum, heatmap['General'].values())), len(appers))
+
+    def test_range_key(self):
+        """
+        Test: Key cached statistics of open ranges by the day they were computed for
+        """
+        today = date.today()
+
+        # Asserting that open ranges cover the week up to today
+        range_key = cache.get_range_key(engine.get_stats_range())
+        self.assertEqual(range_key, f'{today - timedelta(days=6)}T00:00:00:{today}:day:')
+        self.assertEqual(cache.get_range_key(engine.get_stats_range()), range_key)
+
+        # Asserting that bounded ranges are kept as they are
+        stats_range = engine.get_stats_range(datetime(2021, 1, 1), datetime(2021, 1, 7, 12), engine.WEEK, 'gender')
+        self.assertEqual(cache.get_range_key(stats_range), '2021-01-01T00:00:00:2021-01-07T12:00:00:week:gender')
+
+    def test_overview(self):
+        """
+        Test: Rank the badges and locations of the platform by redemptions and compare them to the previous period
+        """
+        caches[cache.STATS_CACHE].clear()
+
+        _, promoter, [location] = create_locations()
+        badges = [Badge.objects.create(name=f"Badge {i}", description="Badge", location=location,
+                                       promoter=promoter, status=Status.APPROVED) for i in range(3)]
+
+        # Redeeming the last badges the most, and twice as much as in the previous week
+        for i, badge in enumerate(badges):
+            BadgeRollup.objects.create(badge=badge, day=date(2021, 1, 1), hour=0, count=i + 1)
+            BadgeRollup.objects.create(badge=badge, day=date(2021, 1, 14), hour=23, count=2 * (i + 1))
+
+        overview = queries.get_overview(utils.decode_stats_range_from_query({'from': '2021-01-08', 'to': '2021-01-14'}),
+                                        limit=2)
+
+        self.assertEqual(overview['totals']['badges'], {'redemptions': 12, 'previous_redemptions': 6, 'growth': 1})
+        self.assertEqual([badge['name'] for badge in overview['top_badges']], ["Badge 2", "Badge 1"])
+        self.assertEqual(overview['top_badges'][0]['previous_redemptions'], 3)
+        self.assertEqual(overview['top_locations'][0]['redemptions'], 12)
+        self.assertEqual(overview['top_rewards'], [])
+
+    def test_collection_stats(self):
+        """
+        Test: Get every chart and the table of a collection from a single query over its rollups
+        """
+        caches[cache.STATS_CACHE].clear()
+
+        _, promoter, locations = create_locations(2)
+        badges = [Badge.objects.create(name=f"Badge {i}", description="Badge", location=locations[i % 2],
+                                       promoter=promoter, status=Status.APPROVED) for i in range(3)]
+        collection = Collection.objects.create(name="Collection", description="Collection", promoter=promoter)
+        for badge in badges:
+            CollectionBadge.objects.create(collection=collection, badge=badge)
+
+        apper = AppUser(email="apper@test.com", user=User.objects.create_user(),
+                        gender="Male", country="Portugal", date_birth=date(1990, 1, 1))
+        users_queries.update_demographics(apper)
+        apper.save()
+        for location in locations:
+            badges_queries.redeem_badges_by_location(location.id, apper.user_id)
+
+        # Asserting that the collection, its redeemed rewards and its rollups are each read once
+        with self.assertNumQueries(3):
+            stats = badge_collections_queries.get_collection_stats(collection.uuid)
+
+        self.assertEqual(stats[1]['Total_visitors'], len(badges))
+        self.assertEqual(stats[1]['Most_common_country'], "Portugal")
+        self.assertEqual(stats[4], {"Location 0": 2, "Location 1": 1})
+
+
+class StatsVisitorsTestCase(TransactionTestCase):
+
+    def test_unique_visitors(self):
+        """
+        Test: Count the unique visitors of a location once the redemptions are committed
+        """
+        caches[cache.STATS_CACHE].clear()
+
+        _, promoter, [location] = create_locations()
+        for i in range(2):
+            Badge.objects.create(name=f"Badge {i}", description="Badge", location=location,
+                                 promoter=promoter, status=Status.APPROVED)
+        appers = [AppUser.objects.create(email=f"apper{i}@test.com", user=User.objects.create_user())
+                  for i in range(3)]
+
+        # Redeeming every badge of the location with every app user, the first one twice
+        for apper in [*appers, appers[0]]:
+            badges_queries.redeem_badges_by_location(location.id, apper.user_id)
+
+        # Asserting that every app user is counted once as a visitor of the location
+        location_stats = locations_queries.get_location_stats(location.uuid)
+        self.assertEqual(location_stats[4]['Total unique visitors'], len(appers))
+        self.assertEqual(LocationSketch.objects.count(), 1)
+
+        # Asserting that the backfill rebuilds the same sketches
+        incremental_sketches = sorted((sketch.location_id, sketch.day, bytes(sketch.registers))
+                                      for sketch in LocationSketch.objects.all())
+        queries.backfill_sketches()
+        self.assertEqual(sorted((sketch.location_id, sketch.day, bytes(sketch.registers))
+                                for sketch in LocationSketch.objects.all()), incremental_sketches)
+
+
+class StatsCacheTestCase(TransactionTestCase):
+
+    def test_stats_cache(self):
+        """
+        Test: Get cached statistics of a badge until the badge is redeemed again
+        """
+        caches[cache.STATS_CACHE].clear()
+
+        _, promoter, [location] = create_locations()
+        badge = Badge.objects.create(name="Badge", description="Badge", location=location,
+                                     promoter=promoter, status=Status.APPROVED)
+        appers = [AppUser.objects.create(email=f"apper{i}@test.com", user=User.objects.create_user())
+                  for i in range(3)]
+
+        badges_queries.redeem_badges_by_location(location.id, appers[0].user_id)
+
+        # Asserting that the statistics are only computed once
+        misses = cache.get_cache_info()['misses']
+        stats = badges_queries.get_badge_stats(badge.uuid)
+        self.assertEqual(badges_queries.get_badge_stats(badge.uuid), stats)
+        self.assertEqual(cache.get_cache_info()['misses'], misses + 1)
+
+        # Asserting that a redemption of the badge invalidates them
+        badges_queries.redeem_badges_by_location(location.id, appers[1].user_id)
+        stats = badges_queries.get_badge_stats(badge.uuid)
+        self.assertEqual(cache.get_cache_info()['misses'], misses + 2)
+        self.assertEqual(stats[1]['Total_visitors'], 2)
+
+        # Asserting that warming the cache computes the statistics that are not cached anymore
+        badges_queries.redeem_badges_by_location(location.id, appers[2].user_id)
+        call_command('warmstats', workers=1, stdout=StringIO(), stderr=StringIO())
+        misses = cache.get_cache_info()['misses']
+        badges_queries.get_badge_stats(badge.uuid)
+        self.assertEqual(cache.get_cache_info()['misses'], misses)
+
+        # Asserting that warming recomputes the statistics that are still cached
+        stats_range = engine.get_stats_range()
+        with cache.warming(60):
+            self.assertEqual(cache.get_stats('badge', badge.id, lambda: ['Warmed'], stats_range), ['Warmed'])
+        self.assertEqual(cache.get_stats('badge', badge.id, lambda: ['Computed'], stats_range), ['Warmed'])
+
+        # Asserting that the statistics can be bucketed by month and limited to a range
+        month = datetime.now().strftime('%Y-%m')
+        stats = badges_queries.get_badge_stats(badge.uuid, engine.get_stats_range(bucket=engine.MONTH))
+        self.assertEqual(stats[2]['General'], {month: len(appers)})
+        stats = badges_queries.get_badge_stats(badge.uuid, engine.get_stats_range(end=datetime(2021, 1, 1)))
+        self.assertEqual(stats[2]['General'], {})
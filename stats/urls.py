@@ -0,0 +1,8 @@
+from django.urls import path
+
+from . import views
+
+urlpatterns = [
+    path('cache', views.cache_info),
+    path('overview', views.overview),
+]
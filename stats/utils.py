@@ -0,0 +1,147 @@
+import csv
+import json
+import zlib
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import engine
+
+
+def decode_stats_range_from_query(query):
+    start = decode_datetime(query.get('from'), datetime.min.time())
+    end = decode_datetime(query.get('to'), datetime.max.time())
+
+    if start and end and start > end:
+        raise InvalidStatsRange("'from' must not be after 'to'")
+
+    bucket = query.get('bucket') or engine.DAY
+    if bucket not in engine.BUCKETS:
+        raise InvalidStatsRange(f"'bucket' must be one of {', '.join(engine.BUCKETS)}")
+
+    split = query.get('split') or None
+    if split and split not in engine.SPLITS:
+        raise InvalidStatsRange(f"'split' must be one of {', '.join(engine.SPLITS)}")
+
+    return engine.get_stats_range(start, end, bucket, split)
+
+
+def decode_limit_from_query(query, default, maximum):
+    value = query.get('limit')
+    if not value:
+        return default
+
+    try:
+        limit = int(value)
+    except ValueError:
+        limit = 0
+
+    if not 0 < limit <= maximum:
+        raise InvalidLimit(f"'limit' must be a number from 1 to {maximum}")
+
+    return limit
+
+
+def decode_datetime(value, default_time):
+    if not value:
+        return None
+
+    try:
+        # Accepted formats: YYYY-MM-DD (from the start or up to the end of the day) or an ISO 8601 datetime
+        date_time = parse_datetime(value)
+        if not date_time:
+            date = parse_date(value)
+            date_time = datetime.combine(date, default_time) if date else None
+    except ValueError:
+        date_time = None
+
+    if not date_time:
+        raise InvalidStatsRange(f"'{value}' is not a valid date")
+
+    # Datetimes are stored without timezone
+    if timezone.is_aware(date_time):
+        date_time = timezone.make_naive(date_time)
+
+    return date_time
+
+
+def encode_redemptions_to_ndjson(redemptions, fields, rows_per_chunk):
+    lines = []
+    for redemption in redemptions:
+        lines.append(json.dumps({field: redemption[field] for field in fields}, cls=DjangoJSONEncoder) + '\n')
+
+        # Sending the rows in chunks rather than one by one
+        if len(lines) >= rows_per_chunk:
+            yield ''.join(lines).encode()
+            lines = []
+
+    if lines:
+        yield ''.join(lines).encode()
+
+
+def encode_redemptions_to_csv(redemptions, fields, rows_per_chunk):
+    buffer = CSVBuffer()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    writer.writeheader()  # Even if there are no rows
+    for redemption in redemptions:
+        writer.writerow(redemption)
+
+        if len(buffer.lines) >= rows_per_chunk:
+            yield buffer.flush()
+
+    if buffer.lines:
+        yield buffer.flush()
+
+
+def accepts_gzip(accept_encoding):
+    # Quality of each coding accepted, where a quality of 0 refuses it
+    qualities = {}
+    for coding in accept_encoding.split(','):
+        name, *params = [part.strip() for part in coding.split(';')]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.lower()] = quality
+
+    return qualities.get('gzip', qualities.get('*', 0.0)) > 0
+
+
+def compress_to_gzip(chunks):
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)  # gzip header and trailer
+
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+
+    yield compressor.flush()
+
+
+class CSVBuffer:
+    # File-like object collecting the lines written by a csv writer
+
+    def __init__(self):
+        self.lines = []
+
+    def write(self, line):
+        self.lines.append(line)
+
+    def flush(self):
+        data = ''.join(self.lines).encode()
+        self.lines = []
+        return data
+
+
+class InvalidStatsRange(Exception):
+    pass
+
+
+class InvalidLimit(Exception):
+    pass
@@ -0,0 +1,114 @@
+from django.contrib.auth import authenticate
+from django.http import JsonResponse, HttpResponse, HttpResponseNotAllowed, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+
+from firebase.auth import InvalidIdToken, NoTokenProvided, FirebaseUserDoesNotExist
+from . import cache, queries, utils
+
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', utils.encode_redemptions_to_ndjson),
+    'csv': ('text/csv', utils.encode_redemptions_to_csv),
+}
+
+# Views
+
+
+def cache_info(request):
+    # Authenticating user
+    try:
+        user = authenticate(request)
+        if not user:
+            raise NoTokenProvided()
+    except (InvalidIdToken, NoTokenProvided, FirebaseUserDoesNotExist):
+        return HttpResponse(status=401,
+                            reason="Unauthorized: Operation needs authentication")
+
+    if request.method == 'GET':
+
+        return handle_get_cache_info(request, user)
+
+    else:
+
+        return HttpResponseNotAllowed(['GET'])
+
+
+def overview(request):
+    # Authenticating user
+    try:
+        user = authenticate(request)
+        if not user:
+            raise NoTokenProvided()
+    except (InvalidIdToken, NoTokenProvided, FirebaseUserDoesNotExist):
+        return HttpResponse(status=401,
+                            reason="Unauthorized: Operation needs authentication")
+
+    if request.method == 'GET':
+
+        return handle_get_overview(request, user)
+
+    else:
+
+        return HttpResponseNotAllowed(['GET'])
+
+
+# Auxiliary functions for the Views
+
+def handle_get_cache_info(request, user):
+    # Checking permissions
+    if user.has_perm('stats.view_cache'):
+
+        return JsonResponse(cache.get_cache_info())
+
+    else:
+        return HttpResponse(status=403,
+                            reason="Forbidden: Current user does not have the permission"
+                                   " required to view the statistics cache")
+
+
+def handle_get_overview(request, user):
+    # Checking permissions
+    if not user.has_perm('stats.view_overview'):
+        return HttpResponse(status=403,
+                            reason="Forbidden: Current user does not have the permission"
+                                   " required to view statistics of the platform")
+
+    # Decoding the date range and the size of the rankings requested
+    try:
+        stats_range = utils.decode_stats_range_from_query(request.GET)
+        limit = utils.decode_limit_from_query(request.GET, queries.OVERVIEW_LIMIT, queries.OVERVIEW_MAX_LIMIT)
+    except (utils.InvalidStatsRange, utils.InvalidLimit) as e:
+        return HttpResponse(status=400, reason=f"Bad Request: {e}")
+
+    # Executing the query
+    statistics = queries.get_overview(stats_range, limit)
+
+    return JsonResponse(statistics)
+
+
+def get_export_response(request, get_redemptions, fields, filename):
+    # Decoding the format and date range requested
+    export_format = request.GET.get('format') or 'ndjson'
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponse(status=400, reason=f"Bad Request: 'format' must be one of {', '.join(EXPORT_FORMATS)}")
+
+    try:
+        stats_range = utils.decode_stats_range_from_query(request.GET)
+    except utils.InvalidStatsRange as e:
+        return HttpResponse(status=400, reason=f"Bad Request: {e}")
+
+    # Streaming the rows as they are read
+    content_type, encode_redemptions = EXPORT_FORMATS[export_format]
+    redemptions = queries.iterate_redemptions(get_redemptions(stats_range))
+    content = encode_redemptions(redemptions, fields, queries.EXPORT_CHUNK_SIZE)
+
+    gzipped = utils.accepts_gzip(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    if gzipped:
+        content = utils.compress_to_gzip(content)
+
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    patch_vary_headers(response, ['Accept-Encoding'])
+    if gzipped:
+        response['Content-Encoding'] = 'gzip'
+
+    return response
@@ -0,0 +1,31 @@
+import threading
+
+from cachetools import TTLCache
+from django.conf import settings
+
+from . import crypto
+
+# Decoded keys (with their CMAC state) of the most recently scanned tags, by UID
+sdm_keys = TTLCache(maxsize=settings.TAG_KEY_CACHE_SIZE, ttl=settings.TAG_KEY_CACHE_TTL)
+sdm_keys_lock = threading.Lock()
+
+
+def get_sdm_key(tag):
+    with sdm_keys_lock:
+        cached = sdm_keys.get(tag.uid)
+
+    # The app key is compared as it may have been changed by another process
+    if cached and cached[0] == tag.app_key:
+        return cached[1]
+
+    sdm_key = crypto.SDMKey.from_app_key(tag.app_key)
+
+    with sdm_keys_lock:
+        sdm_keys[tag.uid] = (tag.app_key, sdm_key)
+
+    return sdm_key
+
+
+def invalidate_sdm_key(tag_uid):
+    with sdm_keys_lock:
+        sdm_keys.pop(tag_uid, None)
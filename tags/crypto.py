@@ -21,10 +21,14 @@
 # SOFTWARE.
 
 import binascii
-import io
 
-from pycryptodome.Cipher import AES
-from Crypto.Hash import CMAC
+from Crypto.Cipher import AES
+from Crypto.Util.strxor import strxor
+
+SV2_PREFIX = b"\x3C\xC3\x00\x01\x00\x80"
+ZERO_BLOCK = bytes(AES.block_size)
+# Padding of an empty message (NIST SP 800-38B)
+EMPTY_PADDING = b"\x80" + bytes(AES.block_size - 1)
 
 
 def calculate_sdmmac(sdm_file_read_key: bytes,
@@ -35,19 +39,65 @@ def calculate_sdmmac(sdm_file_read_key: bytes,
     :param picc_data: [ UID ][ SDMReadCtr ]
     :return: calculated SDMMAC (8 bytes)
     """
-    sv2stream = io.BytesIO()
-    sv2stream.write(b"\x3C\xC3\x00\x01\x00\x80")
-    sv2stream.write(picc_data)
+    return SDMKey(sdm_file_read_key).calculate_sdmmac(picc_data)
+
+
+def double_subkey(block: bytes) -> bytes:
+    """
+    Doubling in GF(2^128), used to derive the CMAC subkeys (NIST SP 800-38B)
+    """
+    doubled = int.from_bytes(block, "big") << 1
+    if doubled >> 128:
+        doubled = (doubled ^ 0x87) & ((1 << 128) - 1)
+
+    return doubled.to_bytes(AES.block_size, "big")
 
-    while sv2stream.getbuffer().nbytes % AES.block_size != 0:
+
+class SDMKey:
+    """
+    MAC calculation key of a tag with its AES key schedule and CMAC subkey already derived,
+    so that it can be reused to authenticate any number of messages
+    """
+
+    def __init__(self, sdm_file_read_key: bytes):
+        self.key = sdm_file_read_key
+        self.cipher = AES.new(sdm_file_read_key, AES.MODE_ECB)
+        self.subkey = double_subkey(self.cipher.encrypt(ZERO_BLOCK))
+
+    @classmethod
+    def from_app_key(cls, app_key):
+        return cls(validate_app_key(app_key))
+
+    def calculate_sdmmac(self, picc_data: bytes) -> bytes:
+        sv2 = SV2_PREFIX + picc_data
         # zero padding till the end of the block
-        sv2stream.write(b"\x00")
+        sv2 += b"\x00" * (-len(sv2) % AES.block_size)
+
+        # CMAC of SV2 (its last block is always complete so only the first subkey is used)
+        mac = ZERO_BLOCK
+        for i in range(0, len(sv2) - AES.block_size, AES.block_size):
+            mac = self.cipher.encrypt(strxor(mac, sv2[i:i + AES.block_size]))
+        session_key = self.cipher.encrypt(strxor(mac, strxor(sv2[-AES.block_size:], self.subkey)))
+
+        # CMAC of an empty message with the session key (uses the second subkey)
+        session_cipher = AES.new(session_key, AES.MODE_ECB)
+        session_subkey = double_subkey(double_subkey(session_cipher.encrypt(ZERO_BLOCK)))
+        sdmmac = session_cipher.encrypt(strxor(EMPTY_PADDING, session_subkey))
+
+        return sdmmac[1::2]
 
-    c2 = CMAC.new(sdm_file_read_key, ciphermod=AES)
-    c2.update(sv2stream.getvalue())
-    sdmmac = CMAC.new(c2.digest(), ciphermod=AES)
+    def calculate_cmac(self, uid, counter):
+        return self.calculate_sdmmac(get_picc_data(uid, counter))
 
-    return bytes(bytearray([sdmmac.digest()[i] for i in range(16) if i % 2 == 1]))
+    def validate_cmac(self, uid, counter, cmac):
+        unhexed_cmac = unhexlify_cmac(cmac)
+
+        valid_cmac = self.calculate_cmac(uid, counter)
+
+        if unhexed_cmac != valid_cmac:
+            raise MessageAuthenticationFailed("CMAC sent does not match Server-side CMAC calculation.")
+
+        return valid_cmac
 
 
 def validate_uid(uid):
@@ -59,7 +109,7 @@ def validate_uid(uid):
     # Turning hexadecimal number to binary
     try:
         unhexed_uid = binascii.unhexlify(uid)
-    except binascii.Error:
+    except ValueError:  # Not hexadecimal, or not even ASCII
         raise InvalidUID("UID must be an hexadecimal number of length 14")
 
     return unhexed_uid
@@ -74,7 +124,7 @@ def validate_app_key(app_key):
     # Turning hexadecimal number to binary
     try:
         unhexed_app_key = binascii.unhexlify(app_key)
-    except binascii.Error:
+    except ValueError:  # Not hexadecimal, or not even ASCII
         raise InvalidAppKey("UID must be an hexadecimal number of length 32")
 
     return unhexed_app_key
@@ -89,41 +139,60 @@ def validate_counter(counter):
     # Turning hexadecimal number to binary
     try:
         unhexed_counter = binascii.unhexlify(counter)
-    except binascii.Error:
+    except ValueError:  # Not hexadecimal, or not even ASCII
         raise InvalidCounter("Counter must be an hexadecimal number of length 6")
 
     return unhexed_counter
 
 
-def calculate_cmac(uid, app_key, counter):
+def get_picc_data(uid, counter):
     unhexed_uid = validate_uid(uid)
-    unhexed_app_key = validate_app_key(app_key)
     unhexed_ctr = validate_counter(counter)
 
-    unhexed_ctr_ba = bytearray(unhexed_ctr)
-    unhexed_ctr_ba.reverse()
+    # The counter is sent MSB first but the tag reads it LSB first
+    return unhexed_uid + unhexed_ctr[::-1]
 
-    datastream = io.BytesIO()
-    datastream.write(unhexed_uid)
-    datastream.write(unhexed_ctr_ba)
 
-    valid_cmac = calculate_sdmmac(unhexed_app_key, datastream.getvalue())
-
-    return valid_cmac
+def calculate_cmac(uid, app_key, counter):
+    return SDMKey.from_app_key(app_key).calculate_cmac(uid, counter)
 
 
-def validate_cmac(uid, app_key, counter, cmac):
+def unhexlify_cmac(cmac):
     try:
-        unhexed_cmac = binascii.unhexlify(cmac)
-    except binascii.Error:
+        return binascii.unhexlify(cmac)
+    except ValueError:  # Not hexadecimal, or not even ASCII
         raise InvalidCMAC("CMAC must be an hexadecimal number.")
 
-    valid_cmac = calculate_cmac(uid, app_key, counter)
 
-    if unhexed_cmac != valid_cmac:
-        raise MessageAuthenticationFailed("CMAC sent does not match Server-side CMAC calculation.")
+def validate_cmac(uid, app_key, counter, cmac):
+    return SDMKey.from_app_key(app_key).validate_cmac(uid, counter, cmac)
+
+
+def validate_cmacs(scans, app_keys):
+    """
+    Validate a batch of scans, setting up the CMAC of each tag only once
+    :param scans: iterable of (uid, counter, cmac)
+    :param app_keys: app key of every tag scanned, by UID
+    :return: for each scan, None if valid or the exception that invalidates it
+    """
+    sdm_keys = {}
+    results = []
+
+    for uid, counter, cmac in scans:
+        try:
+            if uid not in sdm_keys:
+                # A tag without a key fails its own scans only, not the rest of the batch
+                if not app_keys.get(uid):
+                    raise InvalidUID("There is no key for a tag with that UID")
+                sdm_keys[uid] = SDMKey.from_app_key(app_keys[uid])
+
+            sdm_keys[uid].validate_cmac(uid, counter, cmac)
+
+            results.append(None)
+        except (InvalidUID, InvalidCounter, InvalidAppKey, InvalidCMAC, MessageAuthenticationFailed) as e:
+            results.append(e)
 
-    return valid_cmac
+    return results
 
 
 class InvalidUID(Exception):
@@ -0,0 +1,47 @@
+import binascii
+import os
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from ... import crypto
+
+
+class Command(BaseCommand):
+    help = 'Compares the throughput of single and batch CMAC validation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scans', type=int, default=10000)
+        parser.add_argument('--tags', type=int, default=10)
+
+    def handle(self, *args, **options):
+        # Generating random tags
+        app_keys = {binascii.hexlify(os.urandom(7)).decode(): binascii.hexlify(os.urandom(16)).decode()
+                    for _ in range(options["tags"])}
+
+        # Generating valid scans for those tags
+        scans = []
+        for counter in range(options["scans"]):
+            uid = random.choice(list(app_keys))
+            hex_counter = f'{counter:06x}'
+            cmac = binascii.hexlify(crypto.calculate_cmac(uid, app_keys[uid], hex_counter)).decode()
+            scans.append((uid, hex_counter, cmac))
+
+        # Validating every scan on its own
+        start = time.perf_counter()
+        for uid, counter, cmac in scans:
+            crypto.validate_cmac(uid, app_keys[uid], counter, cmac)
+        single_time = time.perf_counter() - start
+
+        # Validating every scan at once
+        start = time.perf_counter()
+        results = crypto.validate_cmacs(scans, app_keys)
+        batch_time = time.perf_counter() - start
+
+        if any(results):
+            self.stderr.write("Batch validation rejected valid scans")
+
+        self.stdout.write(f"Single: {len(scans) / single_time:.0f} scans/s ({single_time:.3f}s)")
+        self.stdout.write(f"Batch: {len(scans) / batch_time:.0f} scans/s ({batch_time:.3f}s)")
+        self.stdout.write(f"Speedup: {single_time / batch_time:.2f}x")
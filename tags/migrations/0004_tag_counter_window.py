@@ -0,0 +1,49 @@
+# Generated by Django 3.1.2 on 2026-10-18 09:38
+
+from django.db import migrations, models
+
+COUNTER_WINDOW_SIZE = 1024
+
+
+def move_redeemed_counters_to_window(apps, schema_editor):
+    Tag = apps.get_model('tags', 'Tag')
+    RedeemedCounter = apps.get_model('tags', 'RedeemedCounter')
+
+    for tag in Tag.objects.filter(id__in=RedeemedCounter.objects.values('tag')):
+        counters = RedeemedCounter.objects.filter(tag=tag, counter__gt=tag.last_counter).values_list('counter',
+                                                                                                     flat=True)
+        if not counters:
+            continue
+
+        # Keeping only the most recent counters if they do not fit in the window
+        base = max(tag.last_counter, max(counters) - COUNTER_WINDOW_SIZE)
+        window = 0
+        for counter in counters:
+            if counter > base:
+                window |= 1 << (counter - base - 1)
+
+        # Updating the last counter with every redeemed counter that follows it
+        consecutive = (window ^ (window + 1)).bit_length() - 1
+        tag.last_counter = base + consecutive
+        window >>= consecutive
+        tag.counter_window = window.to_bytes((window.bit_length() + 7) // 8, 'little')
+        tag.save(update_fields=['last_counter', 'counter_window'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tags', '0003_auto_20201222_0124'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='counter_window',
+            field=models.BinaryField(default=b''),
+        ),
+        migrations.RunPython(move_redeemed_counters_to_window, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name='RedeemedCounter',
+        ),
+    ]
@@ -5,10 +5,16 @@ from locations.models import Location
 from users.models import AdminUser
 
 
+# Number of counters after the last counter that can be redeemed out of order
+COUNTER_WINDOW_SIZE = 1024
+
+
 class Tag(models.Model):
     uid = models.CharField(max_length=255, unique=True, editable=False)
     app_key = models.CharField(max_length=255)
     last_counter = models.IntegerField(default=-1)
+    # Bitset of the counters redeemed out of order (bit i is the counter last_counter + 1 + i)
+    counter_window = models.BinaryField(default=b'')
     location = models.ForeignKey(Location, on_delete=models.SET_NULL, null=True)
     admin = models.ForeignKey(AdminUser, on_delete=models.RESTRICT, editable=False)
 
@@ -16,11 +22,6 @@ class Tag(models.Model):
         return str(self.uid)
 
 
-class RedeemedCounter(models.Model):
-    counter = models.IntegerField()
-    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
-
-
 class TagFilter(django_filters.FilterSet):
     created_by = django_filters.CharFilter(field_name='admin__email')
 
@@ -1,8 +1,13 @@
+import uuid
+from enum import Enum
+
+from django.db import IntegrityError, transaction
+
 from locations.models import Location
 from locations.queries import get_location_by_uuid
 from users.models import AdminUser
-from . import crypto
-from .models import Tag, RedeemedCounter
+from . import cache, crypto
+from .models import Tag, COUNTER_WINDOW_SIZE
 
 
 def create_tag(tag, user_id):
@@ -27,12 +32,106 @@ def create_tag(tag, user_id):
     return tag_created
 
 
+BULK_BATCH_SIZE = 1000
+
+
+def create_tags_in_bulk(tags, user_id):
+    admin = AdminUser.objects.get(user_id=user_id)
+
+    created = 0
+    errors = []
+    batch = []
+    for row, tag in enumerate(tags, start=1):
+        batch.append((row, tag))
+        if len(batch) == BULK_BATCH_SIZE:
+            created += create_tags_batch(batch, admin, errors)
+            batch = []
+    if batch:
+        created += create_tags_batch(batch, admin, errors)
+
+    return created, sorted(errors, key=lambda error: error['row'])
+
+
+def create_tags_batch(batch, admin, errors):
+    tags_to_create = []
+    for row, tag in batch:
+        # Validating the tag on its own
+        if tag is None:
+            errors.append({'row': row, 'error': "Malformed row provided"})
+            continue
+        if not (tag.get("uid") and tag.get("app_key")):
+            errors.append({'row': row, 'uid': tag.get('uid'), 'error': "UID and App Key must be provided"})
+            continue
+        # NDJSON rows keep their JSON types
+        if not all(isinstance(tag.get(field), str) for field in ['uid', 'app_key', 'counter'] if tag.get(field)):
+            errors.append({'row': row, 'uid': tag.get('uid'), 'error': "UID, App Key and Counter must be strings"})
+            continue
+        try:
+            crypto.validate_uid(tag.get('uid'))
+            crypto.validate_app_key(tag.get('app_key'))
+            if tag.get('counter'):
+                crypto.validate_counter(tag.get('counter'))
+        except (crypto.InvalidUID, crypto.InvalidCounter, crypto.InvalidAppKey) as e:
+            errors.append({'row': row, 'uid': tag.get('uid'), 'error': str(e)})
+            continue
+        try:
+            uuid.UUID(str(tag.get('location')))
+        except ValueError:
+            errors.append({'row': row, 'uid': tag.get('uid'), 'error': "A valid Location UUID must be provided"})
+            continue
+
+        tags_to_create.append((row, tag))
+
+    # Getting every location and already existing tag of the batch at once
+    locations = dict(Location.objects.filter(uuid__in={tag.get('location') for _, tag in tags_to_create})
+                     .values_list('uuid', 'id'))
+    existing_uids = set(Tag.objects.filter(uid__in=[tag.get('uid') for _, tag in tags_to_create])
+                        .values_list('uid', flat=True))
+
+    tags_created = []
+    for row, tag in tags_to_create:
+        location_id = locations.get(uuid.UUID(str(tag.get('location'))))
+        if not location_id:
+            errors.append({'row': row, 'uid': tag.get('uid'), 'error': "A valid Location UUID must be provided"})
+        elif tag.get('uid') in existing_uids:
+            errors.append({'row': row, 'uid': tag.get('uid'), 'error': "A tag with that UID already exists"})
+        else:
+            existing_uids.add(tag.get('uid'))
+            tags_created.append((row, Tag(uid=tag.get('uid'),
+                                          app_key=tag.get('app_key'),
+                                          last_counter=int(tag.get('counter'), 16) if tag.get('counter') else -1,
+                                          location_id=location_id,
+                                          admin=admin)))
+
+    try:
+        with transaction.atomic():
+            Tag.objects.bulk_create([tag for _, tag in tags_created])
+    except IntegrityError:
+        # Some were created concurrently, so falling back to one insert per tag
+        return create_tags_one_by_one(tags_created, errors)
+
+    return len(tags_created)
+
+
+def create_tags_one_by_one(tags_created, errors):
+    created = 0
+    for row, tag in tags_created:
+        try:
+            with transaction.atomic():
+                tag.save()
+            created += 1
+        except IntegrityError:
+            errors.append({'row': row, 'uid': tag.uid, 'error': "A tag with that UID already exists"})
+
+    return created
+
+
 def get_tags():
     return Tag.objects.all()
 
 
 def get_tag_by_uid(tag_uid):
-    return Tag.objects.get(uid=tag_uid)
+    return Tag.objects.select_related('location').get(uid=tag_uid)
 
 
 def get_str_by_pk(pk):
@@ -40,7 +139,11 @@ def get_str_by_pk(pk):
 
 
 def delete_tag_by_uid(tag_uid):
-    return get_tag_by_uid(tag_uid).delete()
+    deleted = get_tag_by_uid(tag_uid).delete()
+    # Forgetting the key of the deleted tag
+    cache.invalidate_sdm_key(tag_uid)
+
+    return deleted
 
 
 def patch_tag_by_uid(tag_uid, tag):
@@ -59,6 +162,8 @@ def patch_tag_by_uid(tag_uid, tag):
                 raise NotAValidLocation()
 
     tag_update.save()
+    # Forgetting the previous key of the tag
+    cache.invalidate_sdm_key(tag_uid)
 
     return tag_update
 
@@ -74,36 +179,121 @@ def redeem_tag(redeem_info):
         raise NotAValidTagUID()
 
     # Checking if Tag is valid through CMAC
-    crypto.validate_cmac(redeem_info.get('uid'), tag.app_key, redeem_info.get('counter'), redeem_info.get('cmac'))
+    cache.get_sdm_key(tag).validate_cmac(redeem_info.get('uid'), redeem_info.get('counter'), redeem_info.get('cmac'))
 
     counter = int(redeem_info.get('counter'), 16)
-    # Updating last_counter if it's the next in line
-    if counter == tag.last_counter + 1:
-        # Updating last counter
-        tag.last_counter = counter
-        tag.save()
-        # Further updating the last counter with redeemed tags that came out of order
-        for redeemed in RedeemedCounter.objects.filter(tag_id=tag.id).order_by('counter'):
-            if redeemed.counter == tag.last_counter + 1:
-                tag.last_counter = redeemed.counter
-                tag.save()
-                redeemed.delete()
-            else:
-                break
-    # If the counter is superior to the last stored counter and has not been redeemed yet, we store it
-    elif counter > tag.last_counter:
-        redeemed, created = RedeemedCounter.objects.get_or_create(tag=tag, counter=counter)
-        if created:
-            redeemed.save()
-        else:
-            raise AlreadyRedeemedTag()
-    # If the counter is lower than the last_counter, then it has already been redeemed
-    else:
+    # Marking the counter as redeemed (if it has not been redeemed yet)
+    if redeem_tag_counter(tag, counter) == Redemption.REPLAYED:
         raise AlreadyRedeemedTag()
 
     return tag.location_id
 
 
+class Redemption(Enum):
+    ADVANCED = "advanced"  # The last counter moved past the counter
+    BUFFERED = "buffered"  # The counter was stored in the window, ahead of the last counter
+    REPLAYED = "replayed"  # The counter had already been redeemed
+
+
+def redeem_tag_counter(tag, counter):
+    return redeem_tag_counters(tag, [counter])[0]
+
+
+def redeem_tag_counters(tag, counters):
+    while True:
+        last_counter, counter_window = tag.last_counter, tag.counter_window
+        replayed = set()
+        for index, counter in enumerate(counters):
+            try:
+                last_counter, counter_window = redeem_counter(last_counter, counter_window, counter)
+            except AlreadyRedeemedTag:
+                replayed.add(index)
+
+        if len(replayed) == len(counters):
+            return [Redemption.REPLAYED] * len(counters)
+
+        # Updating the counters only if no other redemption changed them since they were read
+        updated = Tag.objects.filter(id=tag.id,
+                                     last_counter=tag.last_counter,
+                                     counter_window=tag.counter_window).update(last_counter=last_counter,
+                                                                               counter_window=counter_window)
+        if updated:
+            tag.last_counter, tag.counter_window = last_counter, counter_window
+            return [Redemption.REPLAYED if index in replayed else
+                    Redemption.ADVANCED if counter <= last_counter else
+                    Redemption.BUFFERED for index, counter in enumerate(counters)]
+
+        # Reading the counters stored by the concurrent redemption and trying again
+        tag.last_counter, tag.counter_window = Tag.objects.filter(id=tag.id) \
+            .values_list('last_counter', 'counter_window').get()
+
+
+def redeem_tags(scans):
+    """
+    Redeem a batch of scans, updating the counters of each tag only once
+    :param scans: list of redeem info (uid, counter and cmac)
+    :return: for each scan, the id of the location of the tag or the exception that prevented its redemption
+    """
+    results = [None] * len(scans)
+    tags = Tag.objects.in_bulk({scan.get('uid') for scan in scans if isinstance(scan.get('uid'), str)},
+                               field_name='uid')
+
+    # Checking every scan on its own
+    counters_by_tag = {}
+    for index, scan in enumerate(scans):
+        try:
+            if not all(isinstance(scan.get(field), str) for field in ['uid', 'counter', 'cmac']):
+                raise MissingRedeemInfo("UID, Counter and CMAC must be provided")
+
+            tag = tags.get(scan.get('uid'))
+            if not tag:
+                raise NotAValidTagUID()
+
+            # Checking if Tag is valid through CMAC
+            cache.get_sdm_key(tag).validate_cmac(scan.get('uid'), scan.get('counter'), scan.get('cmac'))
+
+            counters_by_tag.setdefault(tag.uid, []).append((int(scan.get('counter'), 16), index))
+        except (MissingRedeemInfo, NotAValidTagUID, crypto.InvalidUID, crypto.InvalidCounter, crypto.InvalidAppKey,
+                crypto.InvalidCMAC, crypto.MessageAuthenticationFailed) as e:
+            results[index] = e
+
+    # Marking the counters of each tag as redeemed, in order
+    for uid, counters in counters_by_tag.items():
+        tag = tags[uid]
+        counters.sort()
+        outcomes = redeem_tag_counters(tag, [counter for counter, _ in counters])
+        for (_, index), outcome in zip(counters, outcomes):
+            results[index] = AlreadyRedeemedTag() if outcome == Redemption.REPLAYED else tag.location_id
+
+    return results
+
+
+def redeem_counter(last_counter, counter_window, counter):
+    # Counters up to the last counter have all been redeemed, the ones after it are in the window
+    offset = counter - last_counter - 1
+    window = int.from_bytes(counter_window, 'little')
+
+    # If the counter is lower than the last_counter or in the window, then it has already been redeemed
+    if offset < 0 or (offset < COUNTER_WINDOW_SIZE and window >> offset & 1):
+        raise AlreadyRedeemedTag()
+
+    # Sliding the window when the counter is too far ahead (the counters left behind can no longer be redeemed)
+    if offset >= COUNTER_WINDOW_SIZE:
+        shift = offset - COUNTER_WINDOW_SIZE + 1
+        last_counter += shift
+        window >>= shift
+        offset -= shift
+
+    window |= 1 << offset
+
+    # Updating the last counter with every redeemed counter that follows it
+    consecutive = (window ^ (window + 1)).bit_length() - 1
+    last_counter += consecutive
+    window >>= consecutive
+
+    return last_counter, window.to_bytes((window.bit_length() + 7) // 8, 'little')
+
+
 class NotAValidLocation(Exception):
     pass
 
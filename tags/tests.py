@@ -1,9 +1,15 @@
+import binascii
 import json
+import threading
 
-from django.test import Client, TestCase
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase
 
-from locations.tests import LocationTestCase
+from locations.tests import LocationTestCase, create_locations
+from users.models import User, AdminUser
 from users.tests import UsersTestCase
+from . import cache, crypto, queries
+from .models import Tag, COUNTER_WINDOW_SIZE
 
 
 class TagTestCase(TestCase):
@@ -67,6 +73,34 @@ class TagTestCase(TestCase):
         # Logging out
         users.log_out()
 
+    def test_app_tag_bulk_create(self):
+        """
+        Test: Create tags in bulk
+        Path: /v0/tags/bulk
+        """
+        # Logging in
+        users = UsersTestCase()
+        client = Client(HTTP_AUTHORIZATION=users.log_in_admin(email="admin@test.com",
+                                                              password="test_password"))
+
+        locations = LocationTestCase()
+        location = locations.get_location()
+
+        # Sending request to create two Tags, one of them with an invalid App Key
+        response = client.post('/v0/tags/bulk', "\n".join([
+            json.dumps({'uid': "04626f222a6208", 'app_key': "0b94831c5ecce72367dc70706a9bdec3",
+                        'counter': "0x000000", 'location': location}),
+            json.dumps({'uid': "04626f222a6209", 'app_key': "0b94831c", 'location': location}),
+        ]), content_type="application/x-ndjson")
+
+        # Asserting the success of the valid tag creation and the error of the invalid one
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(json.loads(response.content)['created'], 1)
+        self.assertEqual(json.loads(response.content)['errors'][0]['row'], 2)
+
+        # Logging out
+        users.log_out()
+
     def test_app_tag_get_with_uuid(self):
         """
         Test: Get a tag with uid
@@ -132,3 +166,159 @@ class TagTestCase(TestCase):
 
         # Logging out
         users.log_out()
+
+    def test_crypto_validate_cmacs(self):
+        """
+        Test: Validate a batch of scans at once
+        """
+        uid = "04626f222a6208"
+        app_key = "0b94831c5ecce72367dc70706a9bdec3"
+
+        scans = [
+            (uid, "0x000001", "4ff0be99845c33b0"),  # Valid
+            (uid, "0x000002", "4ff0be99845c33b0"),  # CMAC of another counter
+            (uid, "0x000003", "not hexadecimal"),
+            (uid, "0x000004", binascii.hexlify(crypto.calculate_cmac(uid, app_key, "0x000004")).decode("utf-8")),
+            ("04626f222a6209", "0x000001", "4ff0be99845c33b0"),  # Tag without a key
+        ]
+
+        results = crypto.validate_cmacs(scans, {uid: app_key})
+
+        # Asserting that every scan is validated just like it would be on its own
+        self.assertIsNone(results[0])
+        self.assertIsInstance(results[1], crypto.MessageAuthenticationFailed)
+        self.assertIsInstance(results[2], crypto.InvalidCMAC)
+        self.assertIsNone(results[3])
+        self.assertIsInstance(results[4], crypto.InvalidUID)
+
+    def test_cache_sdm_key(self):
+        """
+        Test: Reuse the decoded key of a tag until it changes
+        """
+        tag = Tag(uid="04626f222a6208", app_key="0b94831c5ecce72367dc70706a9bdec3")
+
+        sdm_key = cache.get_sdm_key(tag)
+
+        # Asserting that the key is reused while the app key is the same
+        self.assertIs(cache.get_sdm_key(tag), sdm_key)
+
+        # Asserting that the key is decoded again once the app key changes
+        tag.app_key = "616d2a2c78995fa84e031e8ec1e4cadb"
+        self.assertIsNot(cache.get_sdm_key(tag), sdm_key)
+
+        # Asserting that the key is decoded again once invalidated
+        sdm_key = cache.get_sdm_key(tag)
+        cache.invalidate_sdm_key(tag.uid)
+        self.assertIsNot(cache.get_sdm_key(tag), sdm_key)
+
+    def test_redeem_counter_window(self):
+        """
+        Test: Redeem counters in and out of order
+        """
+        last_counter, counter_window = 0, b''
+
+        # Redeeming counters ahead of the last counter
+        for counter in [2, 4, 5]:
+            last_counter, counter_window = queries.redeem_counter(last_counter, counter_window, counter)
+        self.assertEqual(last_counter, 0)
+
+        # Asserting that counters can't be redeemed twice
+        for counter in [0, 2, 4, 5]:
+            with self.assertRaises(queries.AlreadyRedeemedTag):
+                queries.redeem_counter(last_counter, counter_window, counter)
+
+        # Asserting that the last counter advances over the counters redeemed out of order once the gap closes
+        last_counter, counter_window = queries.redeem_counter(last_counter, counter_window, 1)
+        self.assertEqual(last_counter, 2)
+        last_counter, counter_window = queries.redeem_counter(last_counter, counter_window, 3)
+        self.assertEqual((last_counter, counter_window), (5, b''))
+
+        # Asserting that a counter too far ahead slides the window
+        last_counter, counter_window = queries.redeem_counter(last_counter, counter_window, 10 + COUNTER_WINDOW_SIZE)
+        self.assertEqual(last_counter, 10)
+        with self.assertRaises(queries.AlreadyRedeemedTag):
+            queries.redeem_counter(last_counter, counter_window, 10)
+        queries.redeem_counter(last_counter, counter_window, 11)
+
+
+class TagRedemptionTestCase(TransactionTestCase):
+
+    def test_concurrent_redeem(self):
+        """
+        Test: Redeem the same counters of a tag from several threads at once
+        """
+        uid = "04626f222a6208"
+        app_key = "0b94831c5ecce72367dc70706a9bdec3"
+
+        _, _, [location] = create_locations()
+        admin = AdminUser.objects.create(email="admin@test.com", user=User.objects.create_user())
+        Tag.objects.create(uid=uid, app_key=app_key, last_counter=0, location=location, admin=admin)
+
+        # Every counter (in no particular order) is sent by every thread
+        counters = [f"{counter:06x}" for counter in [3, 1, 2, 7, 5, 4, 6, 10, 9, 8]]
+        scans = [{
+            'uid': uid,
+            'counter': counter,
+            'cmac': binascii.hexlify(crypto.calculate_cmac(uid, app_key, counter)).decode("utf-8"),
+        } for counter in counters]
+        accepted = []
+
+        def redeem_scans():
+            try:
+                for scan in scans:
+                    try:
+                        queries.redeem_tag(scan)
+                        accepted.append(scan['counter'])
+                    except queries.AlreadyRedeemedTag:
+                        pass
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=redeem_scans) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Asserting that every counter was accepted exactly once
+        self.assertEqual(sorted(accepted), sorted(counters))
+
+        # Asserting that the last counter advanced over every counter
+        tag = Tag.objects.get(uid=uid)
+        self.assertEqual((tag.last_counter, bytes(tag.counter_window)), (10, b''))
+
+    def test_bulk_create_errors(self):
+        """
+        Test: Create tags in bulk, reporting the rows that can't be created
+        """
+        app_key = "0b94831c5ecce72367dc70706a9bdec3"
+
+        _, _, [location] = create_locations()
+        admin = AdminUser.objects.create(email="admin@test.com", user=User.objects.create_user())
+        Tag.objects.create(uid="04626f222a6200", app_key=app_key, location=location, admin=admin)
+
+        created, errors = queries.create_tags_in_bulk([
+            {'uid': "04626f222a6208", 'app_key': app_key, 'location': str(location.uuid)},
+            {'uid': 4626, 'app_key': app_key, 'location': str(location.uuid)},
+            {'uid': "04626f222a620é", 'app_key': app_key, 'location': str(location.uuid)},
+            {'uid': "04626f222a6209", 'app_key': app_key, 'location': "location"},
+            {'uid': "04626f222a6200", 'app_key': app_key, 'location': str(location.uuid)},
+        ], admin.user_id)
+
+        # Asserting that only the valid tag was created and every other row has its own error
+        self.assertEqual(created, 1)
+        self.assertEqual([(error['row'], error['error']) for error in errors], [
+            (2, "UID, App Key and Counter must be strings"),
+            (3, "UID must be an hexadecimal number of length 14"),
+            (4, "A valid Location UUID must be provided"),
+            (5, "A tag with that UID already exists"),
+        ])
+
+        # Asserting that tags created concurrently are reported as duplicates
+        errors = []
+        created = queries.create_tags_one_by_one([
+            (1, Tag(uid="04626f222a6208", app_key=app_key, location=location, admin=admin)),
+            (2, Tag(uid="04626f222a6210", app_key=app_key, location=location, admin=admin)),
+        ], errors)
+        self.assertEqual(created, 1)
+        self.assertEqual(errors, [{'row': 1, 'uid': "04626f222a6208", 'error': "A tag with that UID already exists"}])
@@ -3,6 +3,7 @@ from django.urls import path
 from . import views
 
 urlpatterns = [
+    path('bulk', views.bulk_tags),
     path('<uid>', views.crud_tag),
     path('', views.tags),
 ]
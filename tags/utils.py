@@ -1,33 +1,15 @@
+import codecs
+import csv
 import json
 
-from django.core import serializers
-
-from locations import queries as location_queries
-from users import queries as user_queries
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-
 
 def encode_tag_to_json(tags):
-    serialized_tags = json.loads(serializers.serialize("json",
-                                                       tags,
-                                                       fields=[
-                                                           'uid', 'last_counter',
-                                                           'location', ]))
-
-    tweaked_serialized_tags = []
-    for serialized in serialized_tags:
-
-        reward_fields = serialized['fields']
-
-        if reward_fields.get('location'):
-            reward_fields['location'] = location_queries.get_str_by_pk(reward_fields.get('location'))
-
-        if reward_fields.get('admin'):
-            reward_fields['admin'] = user_queries.get_str_by_admin_pk(reward_fields.get('admin'))
-
-        tweaked_serialized_tags.append(reward_fields)
-
-    return tweaked_serialized_tags
+    # Building the dicts straight from the tags (select their location, or each costs a query)
+    return [{
+        'uid': tag.uid,
+        'last_counter': tag.last_counter,
+        'location': str(tag.location) if tag.location_id else None,
+    } for tag in tags]
 
 
 def decode_tag_from_json(data):
@@ -46,6 +28,31 @@ def decode_tag_from_json(data):
     return tag
 
 
+def decode_tags_from_ndjson(stream):
+    # Decoding one tag per line, without reading the whole stream
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            yield decode_tag_from_json(line)
+        except (InvalidJSONData, AttributeError, UnicodeDecodeError):  # Not a JSON object
+            yield None
+
+
+def decode_tags_from_csv(stream):
+    # Decoding one tag per row (the header names the columns), without reading the whole stream
+    for row in csv.DictReader(codecs.iterdecode(stream, 'utf-8')):
+        if None in row:  # More values than columns
+            yield None
+            continue
+        yield {
+            'uid': row.get("uid"),
+            'counter': row.get("counter"),
+            'app_key': row.get("app_key"),
+            'location': row.get("location"),
+        }
+
+
 def decode_redeem_info_from_json(data):
     try:
         json_data = json.loads(data)
@@ -61,20 +68,19 @@ def decode_redeem_info_from_json(data):
     return info
 
 
-def paginator(request, f):
-    page_size = request.GET.get('page_size')
-    f = f.order_by('uid')
-    pager = Paginator(f, page_size) if page_size else Paginator(f, 50)
-
-    page = request.GET.get('page')
+def decode_redeem_infos_from_json(data):
     try:
-        response = pager.page(page)
-    except PageNotAnInteger:
-        response = pager.page(1)
-    except EmptyPage:
-        response = pager.page(pager.num_pages)
+        json_data = json.loads(data)
+        infos = [{
+            'uid': scan.get("uid"),
+            'counter': scan.get("counter"),
+            'cmac': scan.get("cmac"),
+        } for scan in json_data]
+
+    except (json.JSONDecodeError, TypeError, AttributeError):
+        raise InvalidJSONData()
 
-    return response
+    return infos
 
 
 class InvalidJSONData(Exception):
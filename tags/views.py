@@ -2,9 +2,9 @@ from django.contrib.auth import authenticate
 from django.http import JsonResponse, HttpResponse, HttpResponseNotAllowed
 
 from firebase.auth import InvalidIdToken, NoTokenProvided, FirebaseUserDoesNotExist
+from lists import views as lists_views
 from . import queries, utils, crypto
 from .models import Tag, TagFilter
-from .utils import paginator
 
 
 # Views
@@ -33,6 +33,25 @@ def tags(request):
         return HttpResponseNotAllowed(['POST', 'GET'])
 
 
+def bulk_tags(request):
+    # Authenticating user
+    try:
+        user = authenticate(request)
+        if not user:
+            raise NoTokenProvided()
+    except (InvalidIdToken, NoTokenProvided, FirebaseUserDoesNotExist):
+        return HttpResponse(status=401,
+                            reason="Unauthorized: Operation needs authentication")
+
+    if request.method == 'POST':
+
+        return handle_create_tags_in_bulk(request, user)
+
+    else:
+
+        return HttpResponseNotAllowed(['POST'])
+
+
 def crud_tag(request, uid):
     # Authenticating user
     try:
@@ -95,15 +114,40 @@ def handle_create_tag(request, user):
                                    " required to add a tag")
 
 
+def handle_create_tags_in_bulk(request, user):
+    # Checking permissions
+    if user.has_perm('tags.add_tag'):
+
+        # Unserializing (one row at a time, as the body is read)
+        if request.content_type in ('application/x-ndjson', 'application/ndjson'):
+            tags_to_create = utils.decode_tags_from_ndjson(request)
+        elif request.content_type == 'text/csv':
+            tags_to_create = utils.decode_tags_from_csv(request)
+        else:
+            return HttpResponse(status=415,
+                                reason="Unsupported Media Type: Tags must be sent as NDJSON or CSV")
+
+        # Executing the query
+        try:
+            created, errors = queries.create_tags_in_bulk(tags_to_create, user.id)
+        except UnicodeDecodeError:
+            return HttpResponse(status=400, reason="Bad Request: CSV must be UTF-8 encoded")
+
+        return JsonResponse({'created': created, 'errors': errors}, status=201 if created else 400)
+
+    else:
+        return HttpResponse(status=403,
+                            reason="Forbidden: Current user does not have the permission"
+                                   " required to add tags")
+
+
 def handle_get_tags(request, user):
     # Checking permissions
     if user.has_perm('tags.view_tag'):
 
-        f = TagFilter(request.GET, queryset=Tag.objects.all()).qs
-
-        response = paginator(request, f)
+        f = TagFilter(request.GET, queryset=Tag.objects.select_related('location')).qs
 
-        return JsonResponse(utils.encode_tag_to_json(response), safe=False)
+        return lists_views.get_list_response(request, f, 'uid', utils.encode_tag_to_json)
 
     else:
         return HttpResponse(status=403,
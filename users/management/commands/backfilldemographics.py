@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ... import queries
+
+
+class Command(BaseCommand):
+    help = 'Derives the gender and country codes of every App User ' \
+           '(run backfillstats afterwards to regroup the statistics by them)'
+
+    def handle(self, *args, **options):
+
+        # Recomputing the derived columns from what the App Users entered
+        with transaction.atomic():
+            updated = queries.backfill_demographics()
+
+        self.stdout.write(f'Updated the demographics of {updated} App Users')
@@ -128,6 +128,9 @@ class Command(BaseCommand):
             'view_collection',
             'change_collection',
             'delete_collection',
+            # Statistics of the whole platform (declared on stats.models.Statistics)
+            'view_cache',
+            'view_overview',
         ]
 
         # Clearing previous permissions
@@ -0,0 +1,17 @@
+# Generated by Django 3.1.2 on 2026-10-18 10:43
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_appuser_demographics'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='appuser',
+            name='birth_year',
+        ),
+    ]
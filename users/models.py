@@ -27,6 +27,29 @@ class User(AbstractUser):
         return str(self.id)
 
 
+class AgeBucket(models.IntegerChoices):
+    UNKNOWN = 0, "Unknown"
+    YOUNG = 1, "Young"  # Under 18
+    ADULT = 2, "Adult"  # Under 65
+    ELDER = 3, "Elder"
+
+
+class Gender(models.IntegerChoices):
+    UNKNOWN = 0, "Unknown"
+    MALE = 1, "Male"
+    FEMALE = 2, "Female"
+    OTHER = 3, "Other"
+
+
+class Country(models.Model):
+    id = models.SmallAutoField(primary_key=True)
+    key = models.CharField(max_length=255, unique=True)  # Name without case or extra whitespace
+    name = models.CharField(max_length=255)
+
+    def __str__(self):
+        return str(self.name)
+
+
 class AppUser(models.Model):
     email = models.EmailField(max_length=255, unique=True)
     name = models.CharField(max_length=255, null=True)
@@ -35,6 +58,10 @@ class AppUser(models.Model):
     country = models.CharField(max_length=255, null=True)
     city = models.CharField(max_length=255, null=True)
     gender = models.CharField(max_length=255, null=True)
+    # Derived from the fields entered by the App User (see users.queries.update_demographics)
+    gender_code = models.PositiveSmallIntegerField(choices=Gender.choices, default=Gender.UNKNOWN, db_index=True,
+                                                   editable=False)
+    normalized_country = models.ForeignKey(Country, null=True, on_delete=models.PROTECT, editable=False)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, editable=False)
 
     def __str__(self):
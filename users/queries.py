@@ -2,10 +2,23 @@ from django.contrib.auth.models import Group
 
 from firebase.auth import FirebaseBackend
 from firebase.models import FirebaseUser
-from .models import User, AppUser, PromoterUser, ManagerUser, AdminUser
+from .models import User, AppUser, PromoterUser, ManagerUser, AdminUser, Country, Gender
 
 firebase_backend = FirebaseBackend()
 
+DEMOGRAPHICS_BATCH_SIZE = 1000
+# Genders entered by App Users (without case or extra whitespace)
+GENDERS = {
+    'male': Gender.MALE,
+    'm': Gender.MALE,
+    'man': Gender.MALE,
+    'masculino': Gender.MALE,
+    'female': Gender.FEMALE,
+    'f': Gender.FEMALE,
+    'woman': Gender.FEMALE,
+    'feminino': Gender.FEMALE,
+}
+
 
 def create_user(email, password, admin):
     # Select auth method based on version
@@ -67,6 +80,7 @@ def create_app_user(app_user_info):
         if "gender" in app_user_info:
             app_user.gender = app_user_info.get("gender")
 
+        update_demographics(app_user)
         app_user.save()
 
         # Set the App User permissions
@@ -256,9 +270,66 @@ def patch_app_user(app_user_info, user):
     if "gender" in app_user_info:
         app_user.gender = app_user_info.get("gender")
 
+    update_demographics(app_user)
     app_user.save()
 
 
+def update_demographics(app_user, countries=None):
+    # Deriving the columns that statistics group on from what the App User entered
+    app_user.gender_code = get_gender_code(app_user.gender)
+    app_user.normalized_country = get_normalized_country(app_user.country, countries)
+
+
+def get_gender_code(gender):
+    gender = ' '.join((gender or '').split()).casefold()
+    if not gender:
+        return Gender.UNKNOWN
+
+    return GENDERS.get(gender, Gender.OTHER)
+
+
+def get_normalized_country(country, countries=None):
+    name = ' '.join((country or '').split())
+    if not name:
+        return None
+
+    # Capitalizing names entered in lower case (others may be acronyms)
+    if name.islower():
+        name = name.title()
+    key = name.casefold()
+
+    if countries is not None and key in countries:
+        return countries[key]
+
+    normalized_country, _ = Country.objects.get_or_create(key=key, defaults={'name': name})
+    if countries is not None:
+        countries[key] = normalized_country
+
+    return normalized_country
+
+
+def backfill_demographics():
+    countries = {country.key: country for country in Country.objects.all()}
+
+    # Updating the App Users in batches
+    app_users = []
+    updated = 0
+    for app_user in AppUser.objects.order_by('id').iterator(chunk_size=DEMOGRAPHICS_BATCH_SIZE):
+        update_demographics(app_user, countries)
+        app_users.append(app_user)
+
+        if len(app_users) >= DEMOGRAPHICS_BATCH_SIZE:
+            AppUser.objects.bulk_update(app_users, ['gender_code', 'normalized_country'])
+            updated += len(app_users)
+            app_users = []
+
+    if app_users:
+        AppUser.objects.bulk_update(app_users, ['gender_code', 'normalized_country'])
+        updated += len(app_users)
+
+    return updated
+
+
 def patch_manager_user(manager_user_info, user):
     # Getting AppUser
     manager_user = get_manager_user(user)
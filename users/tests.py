@@ -8,7 +8,7 @@ from firebase_admin import auth
 
 from firebase.auth import FirebaseBackend
 from firebase.models import FirebaseUser
-from .models import AppUser, ManagerUser, PromoterUser, User, AdminUser
+from .models import AppUser, ManagerUser, PromoterUser, User, AdminUser, Gender
 
 
 class UsersTestCase(TestCase):
@@ -89,6 +89,10 @@ class UsersTestCase(TestCase):
         user_id = app_user.user_id
         self.assertIsNotNone(user_id)
 
+        # Assert the demographics were normalized
+        self.assertEqual(app_user.gender_code, Gender.FEMALE)
+        self.assertEqual(app_user.normalized_country.name, "Portugal")
+
         # Assert a firebase user was created
         firebase_user = FirebaseUser.objects.get(user_id=user_id)
 